@@ -0,0 +1,107 @@
+"""
+agtype 解码基准
+比较 age 的 parseAgeValue（再转换为字典）与 decode_agtype 解码大结果集的耗时。
+默认使用合成的 `MATCH p=(t)-[r]->(c) RETURN t, r, c, p` 结果，
+--live 时从 settings.yaml 配置的 AGE 图读取原始 agtype 文本。
+
+    python benchmarks/agtype_decode.py --rows 20000
+    python benchmarks/agtype_decode.py --live --rows 5000
+"""
+import json
+import sys
+import time
+from pathlib import Path
+
+import click
+
+ROOT = Path(__file__).parent.parent
+sys.path.append(str(ROOT / "src"))
+RESULTS = ROOT / "benchmarks" / "results" / "agtype_decode.jsonl"
+
+# pylint: disable=wrong-import-position
+from age import parseAgeValue
+from bot.graph.agtype import decode_agtype, from_age
+
+LIVE_CYPHER = "MATCH p=(t:PhysicalTable)-[r:HAS_COLUMN]->(c:Column) RETURN t, r, c, p LIMIT {rows}"
+
+
+def _vertex(id_: int, label: str, properties: dict) -> str:
+    return json.dumps({"id": id_, "label": label, "properties": properties},
+                      ensure_ascii=False) + "::vertex"
+
+
+def _edge(id_: int, label: str, start_id: int, end_id: int) -> str:
+    return json.dumps({"id": id_, "label": label, "end_id": end_id, "start_id": start_id,
+                       "properties": {}}) + "::edge"
+
+
+def synthetic_rows(rows: int) -> list[tuple[str, ...]]:
+    """合成的物理表-字段路径结果"""
+    data = []
+    for i in range(rows):
+        table_id, column_id, edge_id = 844424930131969 + i // 20, 1407374883553281 + i, \
+            1688849860263937 + i
+        t = _vertex(table_id, "PhysicalTable",
+                    {"name": f"表{i // 20}", "schema": "ods", "table_name": f"t_{i // 20}",
+                     "full_table_name": f"ods.t_{i // 20}", "nid": f"{table_id:x}"})
+        c = _vertex(column_id, "Column",
+                    {"name": f"col_{i}", "data_type": "varchar(64)", "comment": f"字段 {i}",
+                     "nid": f"{column_id:x}"})
+        r = _edge(edge_id, "HAS_COLUMN", table_id, column_id)
+        data.append((t, r, c, f"[{t}, {r}, {c}]::path"))
+    return data
+
+
+def live_rows(rows: int) -> list[tuple[str, ...]]:
+    """从 AGE 图读取原始 agtype 文本（不注册 agtype 类型）"""
+    # pylint: disable=import-outside-toplevel
+    import psycopg2
+    from bot.settings import settings
+    from bot.graph.age_graph import compile_query
+    compiled = compile_query(LIVE_CYPHER.format(rows=rows), settings.get_setting("age.graph"))
+    with psycopg2.connect(settings.get_setting("age.dsn")) as conn, conn.cursor() as curs:
+        curs.execute("LOAD 'age'")
+        curs.execute("SET search_path = ag_catalog, '$user', public")
+        curs.execute(compiled.sql)
+        return curs.fetchall()
+
+
+def measure(decode, data: list[tuple[str, ...]], repeat: int) -> float:
+    """最好一次的解码耗时（秒）"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for row in data:
+            [decode(v) for v in row] # pylint: disable=expression-not-assigned
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+@click.command()
+@click.option("--rows", default=20000, show_default=True, help="结果行数")
+@click.option("--repeat", default=3, show_default=True, help="重复次数，取最好一次")
+@click.option("--live/--synthetic", default=False, help="从 AGE 图读取或使用合成结果")
+@click.option("--save/--no-save", default=True, help="是否追加到结果文件")
+def main(rows: int, repeat: int, live: bool, save: bool):
+    """比较 agtype 解码"""
+    data = live_rows(rows) if live else synthetic_rows(rows)
+    # 两种解码的结果必须一致
+    for row in data[:100]:
+        assert [decode_agtype(v) for v in row] == [from_age(parseAgeValue(v)) for v in row]
+    record = {"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "rows": len(data),
+              "source": "live" if live else "synthetic"}
+    for name, decode in (("parseAgeValue", lambda v: from_age(parseAgeValue(v))),
+                         ("decode_agtype", decode_agtype)):
+        seconds = measure(decode, data, repeat)
+        record[name] = {"seconds": seconds, "rows_per_s": len(data) / seconds}
+        print(f"{name:14s} {seconds:8.3f}s  {len(data) / seconds:10.0f} rows/s")
+    print(f"speedup        {record['parseAgeValue']['seconds'] / record['decode_agtype']['seconds']:8.1f}x")
+
+    if save:
+        RESULTS.parent.mkdir(parents=True, exist_ok=True)
+        with RESULTS.open("a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+
+
+if __name__ == "__main__":
+    main()
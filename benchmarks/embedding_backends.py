@@ -0,0 +1,116 @@
+"""
+向量化后端基准
+从 names 集合抽样名称，比较各后端的单条延迟、批量吞吐，
+以及以 modelscope pipeline 为基准的近邻召回率（recall@k）。
+
+    python benchmarks/embedding_backends.py --sample 2000 --backend torch --backend quantized
+"""
+import json
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import chromadb
+import click
+import numpy as np
+
+ROOT = Path(__file__).parent.parent
+sys.path.append(str(ROOT / "src"))
+RESULTS = ROOT / "benchmarks" / "results" / "embedding_backends.jsonl"
+
+# pylint: disable=wrong-import-position
+from bot.settings import settings
+from bot.models.embedding import BACKENDS, load_embedder
+
+
+def sample_names(n: int, seed: int) -> list[str]:
+    """从 names 集合抽样文档"""
+    client = chromadb.PersistentClient(path=settings.get_setting("chromadb.persist_directory"))
+    collection = client.get_collection(settings.get_setting("chromadb.names_collection"))
+    docs = collection.get(include=["documents"])["documents"] or []
+    random.Random(seed).shuffle(docs)
+    return docs[:n]
+
+
+def _normalized(vectors) -> np.ndarray:
+    arr = np.asarray(vectors, dtype=np.float32)
+    return arr / np.maximum(np.linalg.norm(arr, axis=1, keepdims=True), 1e-12)
+
+
+def recall_at_k(baseline: np.ndarray, candidate: np.ndarray, queries: int, k: int) -> float:
+    """前 queries 条作为查询，比较两组向量在全部样本上的 top-k 近邻重合率"""
+    def top_k(vectors: np.ndarray) -> np.ndarray:
+        scores = vectors[:queries] @ vectors.T
+        # 排除自身
+        scores[np.arange(queries), np.arange(queries)] = -np.inf
+        return np.argsort(-scores, axis=1)[:, :k]
+    expected, actual = top_k(baseline), top_k(candidate)
+    hits = sum(len(set(e) & set(a)) for e, a in zip(expected, actual))
+    return hits / (queries * k)
+
+
+def measure(embed, texts: list[str], batch_size: int, single: int) -> tuple[dict, np.ndarray]:
+    """测量单条延迟和批量吞吐，返回 (指标, 全部样本的向量)"""
+    embed(texts[:1]) # 预热
+    latencies = []
+    for text in texts[:single]:
+        start = time.perf_counter()
+        embed([text])
+        latencies.append((time.perf_counter() - start) * 1000)
+    vectors = []
+    start = time.perf_counter()
+    for i in range(0, len(texts), batch_size):
+        vectors.extend(embed(texts[i:i + batch_size]))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+        "throughput": len(texts) / elapsed,
+    }, _normalized(vectors)
+
+
+@click.command()
+@click.option("--sample", default=2000, show_default=True, help="抽样名称数")
+@click.option("--single", default=200, show_default=True, help="单条延迟的测量次数")
+@click.option("--batch-size", default=32, show_default=True, help="吞吐测试的批次大小")
+@click.option("--queries", default=200, show_default=True, help="召回率测试的查询数")
+@click.option("--k", default=10, show_default=True, help="recall@k")
+@click.option("--backend", "backends", multiple=True, type=click.Choice(BACKENDS[1:]),
+              default=BACKENDS[1:], show_default=True, help="参与比较的后端")
+@click.option("--seed", default=0, show_default=True, help="抽样随机种子")
+@click.option("--save/--no-save", default=True, help="是否追加到结果文件")
+def main(sample: int, single: int, batch_size: int, queries: int, k: int,
+         backends: tuple[str, ...], seed: int, save: bool):
+    """比较向量化后端"""
+    texts = sample_names(sample, seed)
+    queries = min(queries, len(texts))
+    print(f"{len(texts)} names sampled")
+    record = {"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "sample": len(texts), "k": k}
+
+    baseline = None
+    for backend in ("modelscope", *backends):
+        start = time.perf_counter()
+        embed = load_embedder(backend)
+        load_time = time.perf_counter() - start
+        metrics, vectors = measure(embed, texts, batch_size, single)
+        metrics["load_s"] = load_time
+        if baseline is None:
+            baseline = vectors
+        else:
+            metrics[f"recall@{k}"] = recall_at_k(baseline, vectors, queries, k)
+        record[backend] = metrics
+        print(f"{backend:12s} load {load_time:6.1f}s  p50 {metrics['p50_ms']:7.1f}ms  "
+              f"p95 {metrics['p95_ms']:7.1f}ms  {metrics['throughput']:8.1f} texts/s"
+              + (f"  recall@{k} {metrics[f'recall@{k}']:.3f}" if f"recall@{k}" in metrics else ""))
+
+    if save:
+        RESULTS.parent.mkdir(parents=True, exist_ok=True)
+        with RESULTS.open("a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+冷启动耗时基准
+在独立的子进程中导入 chat_app / mcp_cypher_server，并统计测试用例收集耗时，
+结果追加到 benchmarks/results/import_time.jsonl 以便跟踪变化。
+
+    python benchmarks/import_time.py --repeat 3
+"""
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import click
+
+ROOT = Path(__file__).parent.parent
+RESULTS = ROOT / "benchmarks" / "results" / "import_time.jsonl"
+
+TARGETS = {
+    "chat_app": [sys.executable, "-X", "importtime", "-c", "import bot.chat_app"],
+    "mcp_cypher_server": [sys.executable, "-X", "importtime", "-c", "import bot.mcp_cypher_server"],
+    "pytest_collect": [sys.executable, "-m", "pytest", "--collect-only", "-q"],
+}
+
+_IMPORTTIME = re.compile(r"import time:\s+\d+\s+\|\s+(\d+)\s+\| (.*)$")
+
+
+def _top_imports(stderr: str, n: int) -> list[tuple[str, float]]:
+    """-X importtime 输出中累计耗时最长的模块（顶层及其直接导入）"""
+    top = []
+    for line in stderr.splitlines():
+        m = _IMPORTTIME.match(line)
+        # 每深一层缩进两个空格
+        if m and not m.group(2).startswith("    "):
+            top.append((m.group(2).strip(), int(m.group(1)) / 1e6))
+    return sorted(top, key=lambda x: -x[1])[:n]
+
+
+def run_once(cmd: list[str]) -> tuple[float, bool, str]:
+    """执行一次，返回 (耗时秒, 是否成功, stderr)"""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(ROOT / "src"), env.get("PYTHONPATH")]))
+    start = time.perf_counter()
+    proc = subprocess.run(cmd, cwd=ROOT, env=env, capture_output=True, text=True, check=False)
+    return time.perf_counter() - start, proc.returncode == 0, proc.stderr
+
+
+@click.command()
+@click.option("--repeat", default=3, show_default=True, help="每个目标执行次数")
+@click.option("--top", default=5, show_default=True, help="显示耗时最长的顶层导入数")
+@click.option("--save/--no-save", default=True, help="是否追加到结果文件")
+def main(repeat: int, top: int, save: bool):
+    """统计冷启动耗时"""
+    record = {"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": sys.version.split()[0]}
+    for name, cmd in TARGETS.items():
+        samples = []
+        ok = True
+        stderr = ""
+        for _ in range(repeat):
+            elapsed, success, stderr = run_once(cmd)
+            samples.append(elapsed)
+            ok = ok and success
+        record[name] = {"median": statistics.median(samples), "min": min(samples), "ok": ok}
+        print(f"{name:20s} median {statistics.median(samples):6.2f}s  "
+              f"min {min(samples):6.2f}s  {'ok' if ok else 'FAILED'}")
+        for module, seconds in _top_imports(stderr, top):
+            print(f"    {module:40s} {seconds:6.2f}s")
+
+    if save:
+        RESULTS.parent.mkdir(parents=True, exist_ok=True)
+        with RESULTS.open("a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+
+
+if __name__ == "__main__":
+    main()
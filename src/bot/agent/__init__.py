@@ -7,12 +7,16 @@ from annotated_types import MinLen
 from pydantic import BaseModel, Field, SerializeAsAny
 from pydantic_ai import Agent
 
+from bot.graph.query_governor import QueryPage
+
 
 class CypherQuery(BaseModel):
     """cypher脚本"""
 
     cypher: Annotated[str, MinLen(1)]
     explanation: Annotated[str, Field(description='查询的解释，以 Markdown 格式呈现')]
+    cursor: Annotated[str | None, Field(
+        description='读取下一页时填入上一页结果的 next_cursor，Cypher 保持不变；首次查询不填')] = None
 
 
 class InvalidRequest(BaseModel):
@@ -39,6 +43,23 @@ class DataGovResponse(TypedDict):
                 SerializeAsAny[List[List[Union[str, BaseModel]]]],
                 Field(default=[], description="`cypher_query·给出的CypherQuery`的查询结果")]
     description: NotRequired[Annotated[str, Field(description='查询结果描述')]]
+    truncated: NotRequired[Annotated[bool, Field(description='结果超过行数上限，只返回了前一部分')]]
+    next_cursor: NotRequired[Annotated[str, Field(description='读取下一页结果的游标')]]
+    estimated_rows: NotRequired[Annotated[int, Field(description='查询计划估计的结果总行数，仅供参考')]]
+
+def page_response(page: QueryPage, description: str) -> DataGovResponse:
+    """将一页查询结果转换为 cypher_query 工具的返回值"""
+    result: DataGovResponse = {
+        "contents": page.rows,
+        "description": description,
+    }
+    if page.truncated:
+        result["truncated"] = True
+    if page.next_cursor is not None:
+        result["next_cursor"] = page.next_cursor
+    if page.estimated_rows is not None:
+        result["estimated_rows"] = page.estimated_rows
+    return result
 
 class SQLResponse(TypedDict):
     """sql response"""
@@ -6,6 +6,7 @@
 """
 from __future__ import annotations as _annotations
 
+import asyncio
 from dataclasses import dataclass
 from typing import Union
 from typing_extensions import TypeAlias
@@ -15,11 +16,13 @@ import sqlparse
 
 try:
     import bot.models as models
-    from . import SQLResponse, DataGovResponse, AgentFactory, CypherQuery, InvalidRequest
+    from . import (SQLResponse, DataGovResponse, AgentFactory, CypherQuery, InvalidRequest,
+                   page_response)
 finally:
     pass
 
-from bot.graph import BaseGraph, BaseMetadataHelper
+from bot.graph import BaseGraph, AsyncBaseGraph, BaseMetadataHelper, AsyncMetadataHelper
+from bot.graph.query_governor import QueryGovernor, QueryGovernorError
 from bot.settings import settings
 
 SupportResponse: TypeAlias = Union[InvalidRequest, SQLResponse, DataGovResponse]
@@ -27,9 +30,15 @@ SupportResponse: TypeAlias = Union[InvalidRequest, SQLResponse, DataGovResponse]
 @dataclass
 class SupportDependencies:
     """数据治理知识支持Agent依赖项"""
-    graph: BaseGraph
+    graph: BaseGraph | AsyncBaseGraph
+    # 异步图须使用 AsyncMetadataHelper
     metadata_helper: BaseMetadataHelper
 
+    def __post_init__(self) -> None:
+        if isinstance(self.graph, AsyncBaseGraph) \
+                and not isinstance(self.metadata_helper, AsyncMetadataHelper):
+            raise TypeError(f"{type(self.metadata_helper).__name__} does not support async graphs")
+
 class DataGovSupportAgentFactory(AgentFactory):
     """数据治理知识支持Agent"""
     @staticmethod
@@ -42,7 +51,7 @@ class DataGovSupportAgentFactory(AgentFactory):
                 c = c[:-1]
             return c
 
-        def cypher_query(ctx: RunContext[SupportDependencies], query: CypherQuery) -> DataGovResponse:
+        async def cypher_query(ctx: RunContext[SupportDependencies], query: CypherQuery) -> DataGovResponse:
             """Graph query executor
             
             Args:
@@ -57,20 +66,27 @@ class DataGovSupportAgentFactory(AgentFactory):
                     raise ModelRetry('请编写一个MATCH的查询。') 
 
             with logfire.span("Execute query"):
+                # 结果分页返回，避免过大的结果占满上下文
                 try:
                     _wraped_cypher = _wrap_cypher(query.cypher)
-                    contents = _metadata_helper.query(_wraped_cypher, _graph)
+                    if isinstance(_graph, AsyncBaseGraph):
+                        assert isinstance(_metadata_helper, AsyncMetadataHelper) # SupportDependencies 已检查
+                        page = await QueryGovernor(_metadata_helper, "agent").apage(
+                            _wraped_cypher, _graph, query.cursor)
+                    else:
+                        # 同步图数据库放到线程池执行，避免阻塞事件循环
+                        page = await asyncio.to_thread(QueryGovernor(_metadata_helper, "agent").page,
+                                                       _wraped_cypher, _graph, query.cursor)
+                except QueryGovernorError as e:
+                    logfire.warn('查询被拒绝: {e}', e=e)
+                    raise ModelRetry(str(e)) from e
                 except Exception as e:
                     logfire.warn('错误查询: {e}', e=e)
                     logfire.warn('Cypher {q}', q=query.cypher)
                     raise ModelRetry(f'错误查询: {e}') from e
-                if not contents:
+                if not page.rows and query.cursor is None:
                     raise ModelRetry('未找到相关结果，请重新查询。')
-                result : DataGovResponse = {
-                    "contents":contents,
-                    "description": query.explanation
-                }
-            return result
+            return page_response(page, query.explanation)
 
         def sql_validate(sql: str) -> SQLResponse:
             """SQL query executor
@@ -105,6 +121,8 @@ class DataGovSupportAgentFactory(AgentFactory):
                 "注意：请不要使用'cypher_query'工具执行SQL查询。",
                 "注意：对name属性的查询例如数据实体名、应用名、业务域名等，不要翻译。",
                 "注意：工具使用后的结果应组织成合适的MarkDown文本格式回复。",
+                "注意：'cypher_query'的结果按页返回，结果中有next_cursor且需要更多结果时，" +
+                " 使用相同的Cypher并填入cursor再次调用；优先通过过滤条件缩小结果范围。",
             )
         )
 
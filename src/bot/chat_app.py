@@ -1,6 +1,7 @@
 """交互服务端"""
 from __future__ import annotations as _annotations
 import asyncio
+import os
 import sys
 import json
 from datetime import datetime, timezone
@@ -37,9 +38,13 @@ sys.path.append(str(BOT_DIR))
 from bot.agent.dg_support import dg_support_agent, SupportDependencies
 from bot.settings import settings
 
-from bot.models.embedding import GTEEmbeddingFunction
+from bot.models.embedding import GTEEmbeddingFunction, shutdown_embedding_service, warm_up
+from bot.retrieval import PromptRetriever, RetrievalResult
+from make_vector.collection_sync import live_collection
+from bot.name_index import NameIndex, watch_graph
 
-from bot.graph import BaseGraph, BaseMetadataHelper
+from bot.graph import BaseGraph, AsyncBaseGraph, BaseMetadataHelper
+from bot.graph.result_cache import get_result_cache
 
 # 配置日志
 logfire.configure(environment='local', send_to_logfire=False,)
@@ -51,7 +56,10 @@ origins = [
 WEBROOT_DIR = Path(__file__).parent.joinpath('web')
 usage_limits = UsageLimits(request_limit=10, total_tokens_limit=32768)
 
-emb_fn = GTEEmbeddingFunction()
+emb_fn = GTEEmbeddingFunction(batched=True)
+
+# 不加载向量化模型，跳过 chromadb 检索（python chat_app.py --no-embedding）
+NO_EMBEDDING = os.environ.get("DG_AGENT_NO_EMBEDDING") == "1"
 
 @asynccontextmanager
 async def lifespan(_app: fastapi.FastAPI):
@@ -62,25 +70,64 @@ async def lifespan(_app: fastapi.FastAPI):
         from bot.graph.ontology.kuzu import MetadataHelper
 
         _metadata_graph = \
-            KuzuGraph(db_path=settings.get_setting("kuzu.database"))
+            KuzuGraph(db_path=settings.get_setting("kuzu.database"),
+                      pool_max_size=settings.get_value("kuzu.pool.max_size", 4),
+                      num_threads=settings.get_value("kuzu.pool.num_threads", 0),
+                      pool_timeout=settings.get_value("kuzu.pool.timeout", 30.0))
         _metadata_helper = MetadataHelper()
     elif graph == "age":
-        from bot.graph.age_graph import AGEGraph
+        from bot.graph.async_age_graph import AsyncAGEGraph
         from bot.graph.ontology.age import MetadataHelper
 
         _metadata_graph = \
-            AGEGraph(graph_name=settings.get_setting("age.graph"),
-                    dsn=settings.get_setting("age.dsn"))
+            AsyncAGEGraph(graph_name=settings.get_setting("age.graph"),
+                          dsn=settings.get_setting("age.dsn"),
+                          pool_min_size=settings.get_value("age.pool.min_size", 1),
+                          pool_max_size=settings.get_value("age.pool.max_size", 10),
+                          pool_timeout=settings.get_value("age.pool.timeout", 30.0),
+                          prepare=settings.get_value("age.pool.prepare", True),
+                          itersize=settings.get_value("age.itersize", 2000))
+        await _metadata_graph.open()
         _metadata_helper = MetadataHelper()
     else:
         raise ValueError(f"Unsupported graph: {graph}")
     
     _chroma_client = chromadb.PersistentClient(
         path=settings.get_setting("chromadb.persist_directory"))
+    _retriever = None
+    _warm_up = None
+    _watch_names = None
+    if not NO_EMBEDDING:
+        _name_index = None
+        if settings.get_value("name_index.enabled", True):
+            # 后台构建名称索引，之后图或 names 集合变化时增量更新
+            _name_index = NameIndex()
+            _names_collection = settings.get_setting("chromadb.names_collection")
+            _watch_names = asyncio.create_task(watch_graph(
+                _name_index, _metadata_graph,
+                lambda: live_collection(_chroma_client, _names_collection),
+                interval=settings.get_value("name_index.check_interval", 60.0)))
+        _retriever = PromptRetriever.from_client(_chroma_client, emb_fn, _name_index)
+        if settings.get_value("embedding.warm_up", True):
+            # 后台加载模型，不阻塞服务启动；加载完成前的请求在首次向量化时等待
+            _warm_up = asyncio.create_task(asyncio.to_thread(warm_up))
 
     yield {'metadata_graph': _metadata_graph, 
            'metadata_helper': _metadata_helper,
-           'chroma_client': _chroma_client}
+           'chroma_client': _chroma_client,
+           'retriever': _retriever}
+
+    if graph == "age":
+        await _metadata_graph.close()
+    else:
+        _metadata_graph.close()
+    if _warm_up is not None and not _warm_up.done():
+        _warm_up.cancel()
+    if _watch_names is not None:
+        _watch_names.cancel()
+    if (_results := get_result_cache()) is not None:
+        _results.log_stats()
+    shutdown_embedding_service()
 
 app = fastapi.FastAPI(lifespan=lifespan)
 logfire.instrument_fastapi(app)
@@ -122,6 +169,45 @@ class ChatMessage(TypedDict):
     timestamp: str
     content: str
 
+class DeltaMessage(TypedDict):
+    """增量模式下发送给浏览器的片段，seq 从 1 开始连续递增"""
+
+    role: Literal['model']
+    timestamp: str
+    seq: int
+    delta: str
+
+StreamMode = Literal['delta', 'snapshot']
+
+class ModelMessageStream:
+    """
+    生成模型回复的 NDJSON 事件
+
+    delta 模式每个事件只携带新增片段和序号；
+    snapshot 模式每个事件携带截至当前的完整回复，兼容旧版页面。
+    """
+    def __init__(self, timestamp: str, mode: StreamMode = 'delta') -> None:
+        self.timestamp = timestamp
+        self.mode = mode
+        self.seq = 0
+        self._parts: list[str] = []
+
+    def push(self, fragment: str) -> bytes:
+        """追加一个片段，返回需要发送的一行数据"""
+        self.seq += 1
+        if self.mode == 'snapshot':
+            self._parts.append(fragment)
+            m = ModelResponse(parts=[TextPart("".join(self._parts))],
+                              timestamp=self.timestamp) # pyright: ignore[reportArgumentType]
+            return json.dumps(to_chat_message(m)).encode('utf-8') + b'\n'
+        message: DeltaMessage = {
+            'role': 'model',
+            'timestamp': self.timestamp,
+            'seq': self.seq,
+            'delta': fragment,
+        }
+        return json.dumps(message).encode('utf-8') + b'\n'
+
 def to_chat_message(m: ModelMessage) -> ChatMessage:
     """Convert a `ModelMessage` to a `ChatMessage`."""
     first_part = m.parts[0]
@@ -145,7 +231,7 @@ def to_chat_message(m: ModelMessage) -> ChatMessage:
     raise UnexpectedModelBehavior(f'Unexpected message type for chat app: {m}')
 
 
-async def get_graph(request: Request) -> BaseGraph:
+async def get_graph(request: Request) -> BaseGraph | AsyncBaseGraph:
     """get the metadata graph"""
     return request.state.metadata_graph
 
@@ -157,34 +243,18 @@ async def get_chroma_client(request: Request) -> ClientAPI:
     """get the chroma client"""
     return request.state.chroma_client
 
-def wrap_prompt(prompt: str, chroma_client: ClientAPI) -> str:
-    """Wrap a prompt with the system prompt."""
-    c_cypher = chroma_client.get_collection(
-                name=settings.get_setting("chromadb.cypher_collection"),
-                embedding_function=emb_fn)
-    relevant = c_cypher.query(
-        query_texts=[prompt],
-        n_results=3,
-        include=['documents'], # pyright: ignore[reportArgumentType]
-    )
-    relevant_cypher_text = ''
-    if relevant is not None and 'documents' in relevant and relevant["documents"]:
-        relevant_cypher_text = '\n'.join(relevant["documents"][0])
+async def get_retriever(request: Request) -> PromptRetriever | None:
+    """get the prompt retriever"""
+    return request.state.retriever
 
+def wrap_prompt(prompt: str, relevant: RetrievalResult) -> str:
+    """Wrap a prompt with the system prompt."""
+    relevant_cypher_text = '\n'.join(relevant.cypher_docs)
+    if relevant_cypher_text:
         logfire.info("relevant_cypher_text: {rt}", rt=relevant_cypher_text)
-    
-    c_names = chroma_client.get_collection(
-                name=settings.get_setting("chromadb.names_collection"),
-                embedding_function=emb_fn)
-    relevant_names = c_names.query(
-        query_texts=[prompt],
-        n_results=10,
-        include=['documents'], # pyright: ignore[reportArgumentType]
-    )
-    relevant_names_text = ''
-    if relevant_names is not None and 'documents' in relevant_names and relevant_names["documents"]:
-        relevant_names_text = '\n'.join(relevant_names["documents"][0])
 
+    relevant_names_text = '\n'.join(relevant.name_docs)
+    if relevant_names_text:
         logfire.info("relevant_names_text: {rt}", rt=relevant_names_text)
 
     result = f"""
@@ -204,11 +274,17 @@ def wrap_prompt(prompt: str, chroma_client: ClientAPI) -> str:
 @app.post('/chat/')
 async def post_chat(
     prompt: Annotated[str, fastapi.Form()],
-    metadata_graph: BaseGraph = Depends(get_graph),
+    mode: Annotated[StreamMode | None, fastapi.Form()] = None,
+    metadata_graph: BaseGraph | AsyncBaseGraph = Depends(get_graph),
     metadata_helper: BaseMetadataHelper = Depends(get_metadata_helper),
-    chroma_client: ClientAPI = Depends(get_chroma_client)
+    retriever: PromptRetriever | None = Depends(get_retriever)
 ) -> StreamingResponse:
-    """post_chat"""
+    """post_chat
+
+    mode 为 delta（默认，可通过 chat.stream_mode 配置）时只推送增量片段，
+    为 snapshot 时每次推送完整回复
+    """
+    stream_mode: StreamMode = mode or settings.get_value("chat.stream_mode", "delta")
 
     async def stream_messages():
         """Streams new line delimited JSON `Message`s to the client."""
@@ -226,44 +302,36 @@ async def post_chat(
         )
         try:
             # SupportResponse
-            async with dg_support_agent.iter(wrap_prompt(prompt, chroma_client),
+            relevant = await retriever.aretrieve(prompt) if retriever is not None \
+                else RetrievalResult()
+            async with dg_support_agent.iter(wrap_prompt(prompt, relevant),
                                             deps=SupportDependencies(
                                                     graph=metadata_graph,
                                                     metadata_helper=metadata_helper),
                                             usage_limits=usage_limits) as run:
-                output_messages: list[str] = []
-                _timestamp = datetime.now(tz=timezone.utc).isoformat()
+                output = ModelMessageStream(datetime.now(tz=timezone.utc).isoformat(),
+                                            stream_mode)
                 async for node in run:
                     if Agent.is_model_request_node(node):
                         async with node.stream(run.ctx) as request_stream:
                             async for event in request_stream:
                                 if isinstance(event, PartDeltaEvent):
                                     if isinstance(event.delta, TextPartDelta):
-                                        output_messages.append(event.delta.content_delta)
-                                        m = ModelResponse(parts=[
-                                            TextPart("".join(output_messages))],
-                                            timestamp=_timestamp) # pyright: ignore[reportArgumentType]
-                                        yield json.dumps(to_chat_message(m)).encode('utf-8') + b'\n'
+                                        yield output.push(event.delta.content_delta)
                     elif Agent.is_call_tools_node(node):
                         # A handle-response node => The model returned some data,
                         # potentially calls a tool
                         async with node.stream(run.ctx) as handle_stream:
                             async for event in handle_stream:
                                 if isinstance(event, FunctionToolCallEvent):
-                                    output_messages.append(
+                                    yield output.push(
                                         f'\n\n [Tools] {event.part.tool_name!r} '+
                                         f'开始 ID={event.part.tool_call_id!r} \n\n'
                                     )
-                                    m = ModelResponse(parts=[TextPart("".join(output_messages))],
-                                                    timestamp=_timestamp)# pyright: ignore[reportArgumentType]
-                                    yield json.dumps(to_chat_message(m)).encode('utf-8') + b'\n'
                                 elif isinstance(event, FunctionToolResultEvent):
-                                    output_messages.append(
+                                    yield output.push(
                                         f'[Tools] ID={event.tool_call_id!r} 完成。\n\n'
                                     )
-                                    m = ModelResponse(parts=[TextPart("".join(output_messages))],
-                                                    timestamp=_timestamp)# pyright: ignore[reportArgumentType]
-                                    yield json.dumps(to_chat_message(m)).encode('utf-8') + b'\n'
         except asyncio.CancelledError:
             print("Stream cancelled.")
 
@@ -271,7 +339,13 @@ async def post_chat(
 
 
 if __name__ == '__main__':
+    import argparse
     import uvicorn
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--no-embedding', action='store_true',
+                        help='不加载向量化模型，跳过 chromadb 检索')
+    if parser.parse_args().no_embedding:
+        os.environ["DG_AGENT_NO_EMBEDDING"] = "1"
     uvicorn.run(
         'bot.chat_app:app',
     )
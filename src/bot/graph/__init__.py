@@ -1,5 +1,7 @@
 from .kuzu_graph import KuzuGraph
 from .age_graph import AGEGraph
-from .base_graph import BaseGraph, BaseMetadataHelper
+from .async_age_graph import AsyncAGEGraph
+from .base_graph import BaseGraph, AsyncBaseGraph, BaseMetadataHelper, AsyncMetadataHelper
 
-__all__ = ["KuzuGraph", "AGEGraph", "BaseGraph", "BaseMetadataHelper"]
+__all__ = ["KuzuGraph", "AGEGraph", "AsyncAGEGraph",
+           "BaseGraph", "AsyncBaseGraph", "BaseMetadataHelper", "AsyncMetadataHelper"]
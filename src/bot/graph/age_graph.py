@@ -7,13 +7,142 @@ langchain/libs/community/langchain_community/graphs/age_graph.py
 from __future__ import annotations
 
 from math import e
+import hashlib
+import json
 import re
-from typing import Dict, List, Tuple, Union, Sequence, Any
+import threading
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import (Dict, Generator, Iterable, Iterator, List, Mapping, Tuple, Union, Sequence,
+                    Any)
 
 import age
 import logfire
+import psycopg2
+from cachetools import LRUCache, cached
+from psycopg2 import extensions as ext
 
 from .base_graph import BaseGraph
+from .agtype import from_age
+from .age_pool import AGEConnection, AGEConnectionPool, PoolStats, PreparedStatements
+from .schema_cache import SchemaCache, get_schema_cache, age_schema_key, make_fingerprint
+
+
+LABELS_QUERY = """SELECT "name", kind
+    FROM ag_catalog.ag_label WHERE graph = %s
+    AND not "name" like '\\_ag\\_%%'"""
+
+# 图的变更指纹：label 列表及各 label 表的累计增删改行数
+# pg_stat_user_tables 的计数不受事务控制（回滚的写入同样计入），且由统计收集进程延迟汇总，
+# 提交后可能要过一段时间才变化，只作为兜底信号。缓存的正确性依赖写入方提交后调用
+# SchemaCache.invalidate() 更新代次标记（make_graph 的导入脚本均如此），代次变化立即使缓存失效
+FINGERPRINT_QUERY = """SELECT l.name, l.kind,
+    COALESCE(s.n_tup_ins, 0), COALESCE(s.n_tup_upd, 0), COALESCE(s.n_tup_del, 0)
+    FROM ag_catalog.ag_label l
+    LEFT JOIN pg_catalog.pg_stat_user_tables s ON s.relid = l.relation
+    WHERE l.graph = %s
+    ORDER BY l.name"""
+
+# 每个label在图的schema下对应一张同名表，结构探查直接对这些表做 UNION ALL，
+# 无论label数量多少都只需固定次数的往返
+NODE_PROPERTIES_LIMIT = 10
+EDGE_PROPERTIES_LIMIT = 100
+TRIPLE_SAMPLE_LIMIT = 3000
+TRIPLE_LIMIT = 10
+
+
+# Cypher 翻译结果的缓存条数
+COMPILE_CACHE_SIZE = 1024
+
+# 流式读取时每次从服务端取回的行数
+DEFAULT_ITERSIZE = 2000
+
+
+@dataclass(frozen=True)
+class CompiledQuery:
+    """Cypher 翻译得到的 SQL"""
+    sql: str
+    fields: Tuple[str, ...]
+    # 服务端预备语句名称
+    name: str
+    # 为 True 时 Cypher 参数以 agtype map 作为 cypher() 的第三个参数 $1 传入
+    parameterized: bool = False
+
+    @property
+    def arg_types(self) -> str:
+        """PREPARE 的参数类型"""
+        return "(agtype)" if self.parameterized else ""
+
+    @property
+    def execute_sql(self) -> str:
+        """EXECUTE 语句，参数以 %s 占位"""
+        return f"EXECUTE {self.name}(%s)" if self.parameterized else f"EXECUTE {self.name}"
+
+
+_PLAN_ROWS = re.compile(r"\brows=(\d+)")
+
+
+def plan_rows(plan: List[str]) -> int | None:
+    """查询计划顶层节点估计的行数"""
+    m = _PLAN_ROWS.search(plan[0]) if plan else None
+    return int(m.group(1)) if m else None
+
+
+# 预备语句不存在
+INVALID_STATEMENT_NAME = "26000"
+
+# prepared_steps 中表示回滚事务的步骤
+ROLLBACK = None
+
+PreparedStep = Tuple[Union[str, None], Union[Tuple, None]]
+
+
+def prepared_steps(prepared: PreparedStatements, compiled: CompiledQuery,
+                   args: Tuple | None = None, prefix: str = "",
+                   idle: bool = True) -> Generator[PreparedStep, None, None]:
+    """
+    以服务端预备语句执行的步骤，同步和异步驱动共用
+
+    逐个产出 (SQL, 参数)，SQL 为 ROLLBACK 时回滚事务；驱动执行出错时把异常 throw 回生成器。
+    只有 EXECUTE 时语句已不存在（如会话被 DISCARD）且事务中没有之前的操作时，
+    才回滚并重新 PREPARE 一次，否则原样抛出，由调用方回滚整个事务。
+
+    Args:
+        prepared: 连接上已 PREPARE 的语句
+        args: EXECUTE 的参数（agtype 参数 map）
+        prefix (str): EXECUTE 前的修饰，如 "EXPLAIN "
+        idle (bool): 执行前连接是否处于空闲（无未提交事务）状态
+    """
+    for attempt in (1, 2):
+        statements = prepared.prepare(compiled.name, compiled.sql, compiled.arg_types)
+        try:
+            for statement in statements:
+                yield statement, None
+        except Exception:
+            # PREPARE 没有成功，服务端不存在该语句
+            prepared.discard(compiled.name)
+            raise
+        try:
+            yield prefix + compiled.execute_sql, args
+            return
+        except Exception as e:
+            if _sqlstate(e) != INVALID_STATEMENT_NAME:
+                raise
+            prepared.discard(compiled.name)
+            if attempt == 2 or not idle:
+                raise
+        yield ROLLBACK, None
+
+
+def _sqlstate(e: Exception) -> str | None:
+    """psycopg2 的 pgcode 或 psycopg3 的 sqlstate"""
+    return getattr(e, "sqlstate", None) or getattr(e, "pgcode", None)
+
+
+def agtype_params(params: Mapping[str, Any]) -> str:
+    """Cypher 参数转换为 agtype map 的文本形式"""
+    return json.dumps(params, ensure_ascii=False, default=str)
 
 
 class AGEQueryException(Exception):
@@ -48,29 +177,60 @@ class AGEGraph(BaseGraph):
         "dict": "MAP",
         "bool": "BOOLEAN",
     }
-
-    def _get_age(self) -> age.Age:
-        age_db: age.Age = age.connect(graph=self.graph_name, dsn=self.dsn)
-        assert age_db.connection is not None
-        return age_db
-
+    backend = "age"
 
     def __init__(
-        self, graph_name: str, dsn: str
+        self, graph_name: str, dsn: str,
+        pool_min_size: int = 1,
+        pool_max_size: int = 10,
+        pool_timeout: float = 30.0,
+        schema_cache: SchemaCache | None = None,
+        prepare: bool = True,
+        itersize: int = DEFAULT_ITERSIZE,
     ) -> None:
         self.graph_name = graph_name
         self.dsn = dsn
-        _conn = self._get_age().connection
-        assert _conn is not None
-
-        with _conn.cursor() as curs:
+        # 不带参数的查询在服务端 PREPARE 后 EXECUTE，省去重复的解析和规划
+        self.prepare = prepare
+        # iter_query 每次从服务端游标取回的行数
+        self.itersize = itersize
+        self.schema_cache = schema_cache or get_schema_cache()
+        self.schema_cache_key = age_schema_key(graph_name, dsn)
+        self.pool = AGEConnectionPool(graph_name, dsn,
+                                      min_size=pool_min_size,
+                                      max_size=pool_max_size,
+                                      timeout=pool_timeout)
+
+        with self.pool.connection() as _conn, _conn.cursor() as curs:
             curs.execute("""SELECT graphid FROM ag_catalog.ag_graph WHERE name = %s""", (graph_name,))
             data = curs.fetchone()
             assert data is not None
             self.graphid = data[0]
             logfire.info("graphid:{id}", id=self.graphid)
 
-        self.refresh_schema()
+        self._load_schema()
+
+    def fingerprint(self) -> str:
+        """图的变更指纹，数据导入或修改后会发生变化"""
+        with self.pool.connection() as _conn, _conn.cursor() as curs:
+            curs.execute(FINGERPRINT_QUERY, (self.graphid,))
+            return make_fingerprint(curs.fetchall())
+
+    def _load_schema(self) -> None:
+        """优先从缓存加载schema，指纹变化时重新探查"""
+        cached = self.schema_cache.load(self.schema_cache_key, self.fingerprint())
+        if cached is None:
+            self.refresh_schema()
+        else:
+            self._schema = cached
+
+    def pool_stats(self) -> PoolStats:
+        """连接池指标：等待次数、获取连接耗时、使用中的连接数"""
+        return self.pool.stats()
+
+    def close(self) -> None:
+        """关闭连接池"""
+        self.pool.close()
 
     @staticmethod
     def _format_triples(triples: List[Dict[str, str]]) -> List[str]:
@@ -117,7 +277,21 @@ class AGEGraph(BaseGraph):
             return field.replace("(", "_").replace(")", "")
 
     @staticmethod
-    def _wrap_query(query: str, graph_name: str) -> Tuple[str, List[str]]:
+    def _wrap_query(query: str, graph_name: str,
+                    parameterized: bool = False) -> Tuple[str, List[str]]:
+        """
+        Convert a Cyper query to an Apache Age compatible Sql Query.
+        翻译结果经 compile_query 缓存
+
+        Returns :
+            Tuple[str, List[str]] : SQL 及返回字段
+        """
+        compiled = compile_query(query, graph_name, parameterized)
+        return compiled.sql, list(compiled.fields)
+
+    @staticmethod
+    def _translate_query(query: str, graph_name: str,
+                         parameterized: bool = False) -> Tuple[str, List[str]]:
         """
         Convert a Cyper query to an Apache Age compatible Sql Query.
         Handles combined queries with UNION/EXCEPT operators
@@ -125,6 +299,7 @@ class AGEGraph(BaseGraph):
         Args:
             query (str) : A valid cypher query, can include UNION/EXCEPT operators
             graph_name (str) : The name of the graph to query
+            parameterized (bool) : 为 True 时以 $1 作为 cypher() 的参数 map
 
         Returns :
             str : An equivalent pgSql query wrapped with ag_catalog.cypher
@@ -139,7 +314,7 @@ class AGEGraph(BaseGraph):
         # pgsql template
         template = """SELECT {projection} FROM ag_catalog.cypher('{graph_name}', $$
             {query}
-        $$) AS ({fields});"""
+        $${params}) AS ({fields});"""
 
         # split the query into parts based on UNION and EXCEPT
         parts = re.split(r"\b(UNION\b|\bEXCEPT)\b", query, flags=re.IGNORECASE)
@@ -191,6 +366,7 @@ class AGEGraph(BaseGraph):
             query=query,
             fields=fields_str,
             projection="*",
+            params=", $1" if parameterized else "",
         ), wrap_fields
 
     @staticmethod
@@ -198,6 +374,9 @@ class AGEGraph(BaseGraph):
         """
         Convert a record returned from an age query to a dictionary
 
+        连接池中的连接以 decode_agtype 解码，取到的已是最终结构；
+        其他连接由 parseAgeValue 解析得到的 Vertex/Edge/Path 在这里一次转换
+
         Args:
             record (): a record from an age query result
 
@@ -206,153 +385,338 @@ class AGEGraph(BaseGraph):
                 the dictionary key is the field name and the value is the
                 value converted to a python type
         """
-        def _make_edge(edge: age.models.Edge)  -> Dict[str, Any]:
-            """
-            Convert an edge from id-label->id to a dictionary
-            """
-            assert edge.label is not None
-
-            _e = {
-                "id": edge.id,
-                "label": edge.label,
-                "properties": edge.properties,
-                "from_id": edge.start_id,
-                "to_id": edge.end_id,
-                "type": "edge"
-            }
-            if edge.properties:
-                _e.update(edge.properties)
-            
-            return _e
-        
-        def _make_vertex(vertex: age.models.Vertex) -> Dict[str, Any]:
-            """
-            Convert a vertex from id-label to a dictionary
-            """
-            vtx = {
-                "id": vertex.id, 
-                "label": vertex.label,
-                "type": "vertex"
-            }
-            if vertex.properties:
-                vtx.update(v.properties)
-            return vtx
-
-        # result holder
-        d = {}
-
-        # prebuild a mapping of vertex_id to vertex mappings to be used
-        # later to build edges
-        vertices = {}
-        for v in record:
-            # agtype comes back '{key: value}::type' which must be parsed
-            if isinstance(v, age.models.Vertex):
-                vertices[v.id] = _make_vertex(v)
-
-        # iterate returned fields and parse appropriately
-        for k, v in zip(fields, record):
-            if isinstance(v, age.models.Vertex):
-                d[k] = _make_vertex(v)
-            # convert edge from id-label->id by replacing id with node information
-            # we only do this if the vertex was also returned in the query
-            # this is an attempt to be consistent with neo4j implementation
-            elif isinstance(v, age.models.Edge):
-                d[k] = _make_edge(v)
-            elif isinstance(v, list):
-                # make path
-                d[k] = [ _make_edge(e) if isinstance(e, age.models.Edge) else _make_vertex(e) \
-                        for e in v ]
-            else:
-                #print("other:", type(v))
-                d[k] = v if isinstance(v, str) else v
+        return {k: from_age(v) for k, v in zip(fields, record)}
 
-        return d
+    @staticmethod
+    def _execute_prepared(conn: AGEConnection, curs, compiled: CompiledQuery,
+                          args: Tuple | None = None, prefix: str = "") -> None:
+        """
+        以服务端预备语句执行，连接上首次出现时先 PREPARE，步骤见 prepared_steps
 
-    def query(self, query: str, params:Sequence | None = None) -> List[Dict[str, Any]]:
+        Args:
+            args: EXECUTE 的参数（agtype 参数 map）
+            prefix (str): EXECUTE 前的修饰，如 "EXPLAIN "
         """
-        执行查询
+        idle = conn.get_transaction_status() == ext.TRANSACTION_STATUS_IDLE
+        steps = prepared_steps(conn.prepared, compiled, args, prefix, idle)
+        step = next(steps)
+        while True:
+            sql, sql_args = step
+            try:
+                if sql is ROLLBACK:
+                    conn.rollback()
+                else:
+                    curs.execute(sql, sql_args)
+            except psycopg2.Error as e:
+                step = steps.throw(e)
+                continue
+            try:
+                step = next(steps)
+            except StopIteration:
+                return
+
+    @contextmanager
+    def _rollback_on_error(self, conn) -> Iterator[None]:
+        """
+        语句出错时回滚事务
+        session() 中固定的连接上可能还有外层的命名游标在读取，回滚整个事务会关闭它，
+        此时以保存点包裹语句，出错只回滚到保存点
         """
-        _wrap_query, fields = AGEGraph._wrap_query(query, self.graph_name)
+        if not self.pool.is_pinned(conn):
+            try:
+                yield
+            except (age.SqlExecutionError, psycopg2.Error):
+                # 内层语句已回滚时不再重复
+                if conn.get_transaction_status() != ext.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+                raise
+            return
+        with conn.cursor() as curs:
+            curs.execute("SAVEPOINT dg_nested")
+        try:
+            yield
+        except (age.SqlExecutionError, psycopg2.Error):
+            with conn.cursor() as curs:
+                curs.execute("ROLLBACK TO SAVEPOINT dg_nested")
+            raise
+        with conn.cursor() as curs:
+            curs.execute("RELEASE SAVEPOINT dg_nested")
+
+    def _commit(self, conn) -> None:
+        """提交事务；session() 中固定的连接由 session() 退出时提交"""
+        if not self.pool.is_pinned(conn):
+            conn.commit()
+
+    def _execute(self, conn, curs, query: str,
+                 params: Sequence | Mapping[str, Any] | None = None,
+                 prepare: bool = True) -> CompiledQuery:
+        """
+        执行 Cypher，出错时回滚
 
-        # execute the query, rolling back on an error
-        _age = self._get_age()
-        _conn = _age.connection
-        assert _conn is not None
+        Args:
+            params: Mapping 为 Cypher 参数（$name），Sequence 为 SQL 层的 %s 占位参数
+            prepare (bool): 不带参数时是否使用服务端预备语句（仍受 self.prepare 控制）
 
-        with _conn.cursor() as curs:
-            try:
-                if params is None:
-                    curs.execute(_wrap_query)
+        Returns:
+            CompiledQuery: 翻译结果，fields 为结果的字段
+        """
+        cypher_params = isinstance(params, Mapping)
+        compiled = compile_query(query, self.graph_name, cypher_params)
+        try:
+            with self._rollback_on_error(conn):
+                if cypher_params:
+                    # AGE 只接受预备语句参数作为 cypher() 的参数 map
+                    AGEGraph._execute_prepared(conn, curs, compiled, (agtype_params(params),)) # pyright: ignore[reportArgumentType]
+                elif params is not None:
+                    curs.execute(compiled.sql, params)
+                elif prepare and self.prepare and isinstance(conn, AGEConnection):
+                    AGEGraph._execute_prepared(conn, curs, compiled)
                 else:
-                    curs.execute(_wrap_query, params)
-            except age.SqlExecutionError as e:
-                _age.rollback()
-                raise AGEQueryException(
-                    {
-                        "message": f"Error executing graph query: {query}",
-                        "detail": str(e),
-                    }
-                ) from e
+                    curs.execute(compiled.sql)
+        except (age.SqlExecutionError, psycopg2.Error) as e:
+            raise AGEQueryException(
+                {
+                    "message": f"Error executing graph query: {query}",
+                    "detail": str(e),
+                }
+            ) from e
+        return compiled
+
+    def query(self, query: str,
+              params: Sequence | Mapping[str, Any] | None = None) -> List[Dict[str, Any]]:
+        """
+        执行查询
 
+        Args:
+            query (str): Cypher
+            params: Mapping 时作为 Cypher 参数（$name），同一查询的不同取值共用一个预备语句；
+                Sequence 时按 %s 占位替换到 SQL 中
+        """
+        with self.pool.connection() as _conn, _conn.cursor() as curs:
+            compiled = self._execute(_conn, curs, query, params)
             data = curs.fetchall()
             if data is None:
                 result = []
             # convert to dictionaries
             else:
+                fields = list(compiled.fields)
                 result = [AGEGraph._record_to_dict(d, fields) for d in data]
             return result
 
-    def execuate(self, query: str, params:Sequence | None =None, auto_commit:bool=True):
+    def _fetchmany(self, conn, curs, size: int, query: str) -> List[Tuple]:
+        """分批取回结果，出错时回滚（固定的连接由 session() 退出时回滚）"""
+        try:
+            return curs.fetchmany(size)
+        except (age.SqlExecutionError, psycopg2.Error) as e:
+            if not self.pool.is_pinned(conn):
+                conn.rollback()
+            raise AGEQueryException(
+                {
+                    "message": f"Error fetching graph query result: {query}",
+                    "detail": str(e),
+                }
+            ) from e
+
+    @contextmanager
+    def session(self) -> Iterator[None]:
+        """
+        上下文内当前线程的查询共用连接池中的一个连接（及其事务）
+        其中的语句出错只回滚到各自的保存点，提交推迟到退出上下文时；上下文因异常退出时整体回滚
+        """
+        with self.pool.pinned() as conn:
+            yield
+            conn.commit()
+
+    def iter_query(self, query: str,
+                   params: Sequence | Mapping[str, Any] | None = None) -> Iterator[Dict[str, Any]]:
+        """
+        逐行返回查询结果
+        通过服务端命名游标（DECLARE ... CURSOR）每次取回 itersize 行并逐行解码，
+        客户端不保留完整结果。读取结束（或生成器关闭）前一直占用连接池中的一个连接。
+
+        Cypher 参数（Mapping）只能经预备语句传入，而 DECLARE 不能用于 EXECUTE，
+        此时退回到普通游标，结果由 libpq 整体接收，只是按 itersize 分批解码。
+        """
+        named = not isinstance(params, Mapping)
+        with self.pool.connection() as _conn, \
+             (_conn.cursor(name=f"dg_cursor_{uuid.uuid4().hex}") if named else _conn.cursor()) as curs:
+            if named:
+                # 命名游标只在当前事务内有效，连接归还时随事务回滚关闭
+                compiled = compile_query(query, self.graph_name)
+                try:
+                    with self._rollback_on_error(_conn):
+                        curs.execute(compiled.sql.rstrip().rstrip(";"), params)
+                except (age.SqlExecutionError, psycopg2.Error) as e:
+                    raise AGEQueryException(
+                        {
+                            "message": f"Error executing graph query: {query}",
+                            "detail": str(e),
+                        }
+                    ) from e
+            else:
+                compiled = self._execute(_conn, curs, query, params)
+            fields = list(compiled.fields)
+            while rows := self._fetchmany(_conn, curs, self.itersize, query):
+                for d in rows:
+                    yield AGEGraph._record_to_dict(d, fields)
+
+    def execuate(self, query: str, params: Sequence | Mapping[str, Any] | None = None,
+                 auto_commit:bool=True):
         """
         执行DDL
         """
-        _wrap_query = AGEGraph._wrap_query(query, self.graph_name)
         # execute the query, rolling back on an error
-        _age = self._get_age()
-        with _age.connection.cursor() as curs: # pyright: ignore
-            try:
-                if params is None:
-                    curs.execute(_wrap_query) # pyright: ignore
-                else:
-                    curs.execute(_wrap_query, params) # pyright: ignore
-            except age.SqlExecutionError as e:
-                _age.rollback()
-                raise AGEQueryException(
-                    {
-                        "message": f"Error executing graph query: {query}",
-                        "detail": str(e),
-                    }
-                ) from e
-        if auto_commit:
-            _age.commit()
-
-    def explain(self, query: str):
+        with self.pool.connection() as _conn:
+            with _conn.cursor() as curs:
+                # 写入语句通常各不相同，不使用预备语句
+                self._execute(_conn, curs, query, params, prepare=False)
+            # 未提交的事务在连接归还时回滚
+            if auto_commit:
+                self._commit(_conn)
+
+    def execute_many(self, query: str, params_seq: Iterable[Mapping[str, Any]],
+                     auto_commit: bool = True) -> None:
+        """
+        以不同的 Cypher 参数多次执行同一写入语句，共用一个预备语句，在一个事务中提交
+        """
+        with self.pool.connection() as _conn:
+            # session() 中出错时回滚整批，而不只是出错的一条
+            with self._rollback_on_error(_conn), _conn.cursor() as curs:
+                for params in params_seq:
+                    self._execute(_conn, curs, query, params)
+            if auto_commit:
+                self._commit(_conn)
+
+    def explain(self, query: str, params: Mapping[str, Any] | None = None) -> List[str]:
         """
         执行查询计划 验证SQL
+
+        Args:
+            params: Cypher 参数，提供时对预备语句执行 EXPLAIN EXECUTE
+
+        Returns:
+            List[str]: 查询计划的各行
         """
-        _wrap_query, _ = AGEGraph._wrap_query(query, self.graph_name)
-        _wrap_query = "EXPLAIN " + _wrap_query
-        _conn = self._get_age().connection
-        assert _conn is not None
-        with _conn.cursor() as curs:
-            curs.execute(_wrap_query)
+        with self.pool.connection() as _conn, _conn.cursor() as curs:
+            if params is None:
+                _wrap_query, _ = AGEGraph._wrap_query(query, self.graph_name)
+                curs.execute("EXPLAIN " + _wrap_query)
+            else:
+                compiled = compile_query(query, self.graph_name, True)
+                AGEGraph._execute_prepared(_conn, curs, compiled, # pyright: ignore[reportArgumentType]
+                                           (agtype_params(params),), prefix="EXPLAIN ")
+            return [r[0] for r in curs.fetchall()]
+
+    def estimate_rows(self, query: str, params: Mapping[str, Any] | None = None) -> int | None:
+        """按 EXPLAIN 顶层节点的 rows 估计结果行数"""
+        return plan_rows(self.explain(query, params))
 
     def _get_labels(self) -> Tuple[List[str], List[str]]:
         """
         获取labels
         """
-        _conn = self._get_age().connection
-        assert _conn is not None
-        with _conn.cursor() as curs:
-            curs.execute(f"""SELECT "name", kind
-                             FROM ag_catalog.ag_label WHERE graph = {self.graphid}
-                             AND not "name" like '\\_ag\\_%'""")
-            labels = curs.fetchall()
-            e_labels = [l[0] for l in labels if l[1] == "e"]
-            n_labels = [l[0] for l in labels if l[1] == "v"]
+        with self.pool.connection() as _conn, _conn.cursor() as curs:
+            curs.execute(LABELS_QUERY, (self.graphid,))
+            return AGEGraph._split_labels(curs.fetchall())
 
+    @staticmethod
+    def _split_labels(labels: List[Tuple]) -> Tuple[List[str], List[str]]:
+        """将 (name, kind) 行拆分为节点label和边label"""
+        e_labels = [l[0] for l in labels if l[1] == "e"]
+        n_labels = [l[0] for l in labels if l[1] == "v"]
         return n_labels, e_labels
 
+    @staticmethod
+    def _label_table(graph_name: str, label: str) -> str:
+        """label 对应的表名 "graph"."label" """
+        def _quote(ident: str) -> str:
+            return '"' + ident.replace('"', '""') + '"'
+        return f"{_quote(graph_name)}.{_quote(label)}"
+
+    @staticmethod
+    def _triples_sql(graph_name: str, graphid: Any,
+                     e_labels: List[str]) -> Tuple[str, List[Any]]:
+        """
+        生成一次性获取所有边label三元组的SQL
+        等价于对每个边label执行
+            MATCH (a)-[e:`label`]->(b) WITH a,e,b LIMIT 3000
+            RETURN DISTINCT labels(a), type(e), labels(b) LIMIT 10
+
+        Returns:
+            Tuple[str, List[Any]]: SQL 及其参数，结果行为 (start, type, end)
+        """
+        parts = []
+        params: List[Any] = []
+        for label in e_labels:
+            parts.append(f"""(SELECT DISTINCT sl.name, %s, el.name
+                FROM (SELECT start_id, end_id FROM {AGEGraph._label_table(graph_name, label)}
+                      LIMIT {TRIPLE_SAMPLE_LIMIT}) e
+                JOIN ag_catalog.ag_label sl
+                  ON sl.graph = %s AND sl.id = ag_catalog._extract_label_id(e.start_id)
+                JOIN ag_catalog.ag_label el
+                  ON el.graph = %s AND el.id = ag_catalog._extract_label_id(e.end_id)
+                LIMIT {TRIPLE_LIMIT})""")
+            params.extend([label, graphid, graphid])
+        return "\nUNION ALL\n".join(parts), params
+
+    @staticmethod
+    def _properties_sql(graph_name: str, labels: List[str],
+                        limit: int) -> Tuple[str, List[Any]]:
+        """
+        生成一次性采样多个label属性的SQL，结果行为 (label, properties)
+        """
+        parts = []
+        params: List[Any] = []
+        for label in labels:
+            parts.append(f"""(SELECT %s, properties
+                FROM {AGEGraph._label_table(graph_name, label)} LIMIT {limit})""")
+            params.append(label)
+        return "\nUNION ALL\n".join(parts), params
+
+    @staticmethod
+    def _rows_to_triples(data: List[Tuple]) -> List[Dict[str, str]]:
+        """将 (start, type, end) 行转换为三元组"""
+        return [
+            {
+                "start": d[0],
+                "type": d[1],
+                "end": d[2],
+            }
+            for d in data
+        ]
+
+    @classmethod
+    def _rows_to_properties(cls, labels: List[str], data: List[Tuple],
+                            key: str) -> List[Dict[str, Any]]:
+        """将 (label, properties) 行按label汇总为去重后的属性及类型"""
+        grouped: Dict[str, set] = {label: set() for label in labels}
+        for label, props in data:
+            # build a set of distinct properties
+            for k, v in (props or {}).items():
+                grouped[label].add((k, cls.types[type(v).__name__]))
+        return [
+            {
+                "properties": [{"property": k, "type": v} for k, v in grouped[label]],
+                key: label,
+            }
+            for label in labels
+        ]
+
+    def _fetch_batched(self, sql: str, params: List[Any], message: str) -> List[Tuple]:
+        if not params:
+            return []
+        with self.pool.connection() as _conn, _conn.cursor() as curs:
+            try:
+                curs.execute(sql, params)
+            except (age.SqlExecutionError, psycopg2.Error) as e:
+                raise AGEQueryException(
+                    {
+                        "message": message,
+                        "detail": str(e),
+                    }
+                ) from e
+            return curs.fetchall()
+
     def _get_triples(self, e_labels: List[str]) -> List[Dict[str, str]]:
         """
         Get a set of distinct relationship types (as a list of dicts) in the graph
@@ -365,47 +729,9 @@ class AGEGraph(BaseGraph):
             List[Dict[str, str]]: relationships as a list of dicts in the format
                 "{'start':<from_label>, 'type':<edge_label>, 'end':<from_label>}"
         """
-
-        # age query to get distinct relationship types
-        triple_query = """
-        SELECT * FROM ag_catalog.cypher('{graph_name}', $$
-            MATCH (a)-[e:`{e_label}`]->(b)
-            WITH a,e,b LIMIT 3000
-            RETURN DISTINCT labels(a) AS from, type(e) AS edge, labels(b) AS to
-            LIMIT 10
-        $$) AS (f agtype, edge agtype, t agtype);
-        """
-
-        triple_schema = []
-
-        # iterate desired edge types and add distinct relationship types to result
-        _conn = self._get_age().connection
-        assert _conn is not None
-        with _conn.cursor() as curs:
-            for label in e_labels:
-                q = triple_query.format(graph_name=self.graph_name, e_label=label)
-                try:
-                    curs.execute(q)
-                    data = curs.fetchall()
-                    for d in data:
-                        # use json.loads to convert returned
-                        # strings to python primitives
-                        triple_schema.append(
-                            {
-                                "start": d[0][0],
-                                "type": d[1],
-                                "end": d[2][0],
-                            }
-                        )
-                except age.SqlExecutionError as e:
-                    raise AGEQueryException(
-                        {
-                            "message": "Error fetching triples",
-                            "detail": str(e),
-                        }
-                    ) from e
-
-        return triple_schema
+        sql, params = AGEGraph._triples_sql(self.graph_name, self.graphid, e_labels)
+        return AGEGraph._rows_to_triples(
+            self._fetch_batched(sql, params, "Error fetching triples"))
 
     def _get_node_properties(self, n_labels: List[str]) -> List[Dict[str, Any]]:
         """
@@ -428,51 +754,10 @@ class AGEGraph(BaseGraph):
                         ]
                 }"
         """
-
-        # cypher query to fetch properties of a given label
-        node_properties_query = """
-        SELECT * FROM ag_catalog.cypher('{graph_name}', $$
-            MATCH (a:`{n_label}`)
-            RETURN properties(a) AS props
-            LIMIT 10
-        $$) AS (props agtype);
-        """
-
-        node_properties = []
-        _conn = self._get_age().connection
-        assert _conn is not None
-        with _conn.cursor() as curs:
-            for label in n_labels:
-                q = node_properties_query.format(
-                    graph_name=self.graph_name, n_label=label
-                )
-
-                try:
-                    curs.execute(q)
-                except age.SqlExecutionError as e:
-                    raise AGEQueryException(
-                        {
-                            "message": "Error fetching node properties",
-                            "detail": str(e),
-                        }
-                    ) from e
-                data = curs.fetchall()
-
-                # build a set of distinct properties
-                s = set({})
-                for d in data:
-                    # use json.loads to convert to python
-                    # primitive and get readable type
-                    for k, v in d[0].items():
-                        s.add((k, self.types[type(v).__name__]))
-
-                np = {
-                    "properties": [{"property": k, "type": v} for k, v in s],
-                    "labels": label,
-                }
-                node_properties.append(np)
-
-        return node_properties
+        sql, params = AGEGraph._properties_sql(self.graph_name, n_labels,
+                                               NODE_PROPERTIES_LIMIT)
+        rows = self._fetch_batched(sql, params, "Error fetching node properties")
+        return self._rows_to_properties(n_labels, rows, "labels")
 
     def _get_edge_properties(self, e_labels: List[str]) -> List[Dict[str, Any]]:
         """
@@ -495,64 +780,37 @@ class AGEGraph(BaseGraph):
                         ]
                 }"
         """
-        # cypher query to fetch properties of a given label
-        edge_properties_query = """
-        SELECT * FROM ag_catalog.cypher('{graph_name}', $$
-            MATCH ()-[e:`{e_label}`]->()
-            RETURN properties(e) AS props
-            LIMIT 100
-        $$) AS (props agtype);
-        """
-        edge_properties = []
-        _conn = self._get_age().connection
-        assert _conn is not None
-        with _conn.cursor() as curs:
-            for label in e_labels:
-                q = edge_properties_query.format(
-                    graph_name=self.graph_name, e_label=label
-                )
-
-                try:
-                    curs.execute(q)
-                except age.SqlExecutionError as e:
-                    raise AGEQueryException(
-                        {
-                            "message": "Error fetching edge properties",
-                            "detail": str(e),
-                        }
-                    ) from e
-                data = curs.fetchall()
-
-                # build a set of distinct properties
-                s = set({})
-                for d in data:
-                    # use json.loads to convert to python
-                    # primitive and get readable type
-                    for k, v in d[0].items():
-                        s.add((k, self.types[type(v).__name__]))
-
-                np = {
-                    "properties": [{"property": k, "type": v} for k, v in s],
-                    "type": label,
-                }
-                edge_properties.append(np)
-
-        return edge_properties
+        sql, params = AGEGraph._properties_sql(self.graph_name, e_labels,
+                                               EDGE_PROPERTIES_LIMIT)
+        rows = self._fetch_batched(sql, params, "Error fetching edge properties")
+        return self._rows_to_properties(e_labels, rows, "type")
 
     def refresh_schema(self) -> None:
         """
         刷新schema
         更新 labels, relationships, and properties
         """
+        fingerprint = self.fingerprint()
         n_labels, e_labels = self._get_labels()
         triple_schema = self._get_triples(e_labels)
 
-        node_properties = self._get_node_properties(n_labels)
         node_properties = self._get_node_properties(n_labels)
         edge_properties = self._get_edge_properties(e_labels)
 
         # 生成图谱结构描述
-        self._schema = f"""
+        self._schema = AGEGraph._build_schema(n_labels, e_labels,
+                                              node_properties, edge_properties,
+                                              triple_schema)
+        self.schema_cache.save(self.schema_cache_key, fingerprint, self._schema)
+        logfire.info("Refresh schema completed.")
+
+    @staticmethod
+    def _build_schema(n_labels: List[str], e_labels: List[str],
+                      node_properties: List[Dict[str, Any]],
+                      edge_properties: List[Dict[str, Any]],
+                      triple_schema: List[Dict[str, str]]) -> str:
+        """生成提供给大模型的图谱结构描述"""
+        return f"""
 ## 图数据库结构:
 ### 节点：
 {n_labels}
@@ -563,7 +821,6 @@ class AGEGraph(BaseGraph):
 {edge_properties}
 ## 节点关联关系:
 {AGEGraph._format_triples(triple_schema)}"""
-        logfire.info("Refresh schema completed.")
 
 
         # self._structured_schema = {
@@ -573,6 +830,11 @@ class AGEGraph(BaseGraph):
         #     "metadata": {},
         # }
 
+    @property
+    def graph_key(self) -> str:
+        """图标识，与schema缓存键一致"""
+        return self.schema_cache_key
+
     @property
     def schema(self) -> str:
         """Returns the schema of the Graph"""
@@ -583,3 +845,19 @@ class AGEGraph(BaseGraph):
     #     """Returns the structured schema of the Graph"""
     #     return self._structured_schema
 
+
+@cached(LRUCache(maxsize=COMPILE_CACHE_SIZE), lock=threading.Lock(), info=True)
+def compile_query(query: str, graph_name: str, parameterized: bool = False) -> CompiledQuery:
+    """
+    将 Cypher 翻译为 ag_catalog.cypher(...) 形式的 SQL，结果按 LRU 缓存，
+    同一查询在 explain() 和 query() 中只翻译一次。缓存指标见 compile_query.cache_info()
+
+    Args:
+        parameterized (bool): Cypher 中使用 $name 参数，参数 map 在 EXECUTE 时传入
+
+    Raises:
+        ValueError: 查询为空或包含 RETURN *
+    """
+    sql, fields = AGEGraph._translate_query(query, graph_name, parameterized) # pylint: disable=protected-access
+    name = "dg_" + hashlib.sha1(sql.encode("utf-8")).hexdigest()[:24]
+    return CompiledQuery(sql, tuple(fields), name, parameterized)
@@ -0,0 +1,158 @@
+"""AGE 连接池
+为 AGEGraph 提供有界、线程安全的 psycopg2 连接池。
+每个连接在创建时完成一次 AGE 会话初始化（LOAD 'age'、search_path、agtype 类型注册），
+之后在多次查询间复用。agtype 以 decode_agtype 解码。
+连接记录已在服务端 PREPARE 的语句，重复查询直接 EXECUTE。
+"""
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import List
+
+import age
+import logfire
+from psycopg2 import extensions as ext
+
+from .agtype import decode_agtype
+from .pool import ConnectionPool, PoolStats, PoolTimeout
+
+__all__ = ["AGEConnection", "AGEConnectionPool", "AGEPoolTimeout", "PoolStats",
+           "PreparedStatements"]
+
+
+class AGEPoolTimeout(PoolTimeout):
+    """Raised when no connection becomes available within the timeout."""
+
+
+# 每个连接保留的预备语句数
+PREPARED_PER_CONNECTION = 256
+
+
+class PreparedStatements:
+    """
+    一个连接上已 PREPARE 的语句，超出上限时按 LRU DEALLOCATE
+
+    Args:
+        max_size (int): 保留的语句数
+    """
+
+    def __init__(self, max_size: int = PREPARED_PER_CONNECTION) -> None:
+        self.max_size = max_size
+        self._names: OrderedDict[str, None] = OrderedDict()
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._names
+
+    def prepare(self, name: str, sql: str, arg_types: str = "") -> List[str]:
+        """
+        返回 EXECUTE name 之前需要执行的语句（已 PREPARE 时为空）
+
+        Args:
+            name (str): 语句名称
+            sql (str): SQL，参数以 $1... 表示
+            arg_types (str): 参数类型列表，如 "(agtype)"，无参数时为空
+        """
+        if name in self._names:
+            self._names.move_to_end(name)
+            return []
+        statements = []
+        while len(self._names) >= self.max_size:
+            evicted, _ = self._names.popitem(last=False)
+            statements.append(f"DEALLOCATE {evicted}")
+        statements.append(f"PREPARE {name}{arg_types} AS {sql}")
+        self._names[name] = None
+        return statements
+
+    def discard(self, name: str) -> None:
+        """服务端已没有该语句（PREPARE 失败或会话被 DISCARD）时删除记录"""
+        self._names.pop(name, None)
+
+    def clear(self) -> None:
+        """会话中的语句已被 DEALLOCATE ALL 或无法确认时清空记录"""
+        self._names.clear()
+
+
+class AGEConnection(ext.connection):
+    """记录已 PREPARE 语句的 psycopg2 连接"""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.prepared = PreparedStatements()
+
+
+class AGEConnectionPool(ConnectionPool[ext.connection]):
+    """
+    AGE 连接池
+
+    Args:
+        graph_name (str): 图名称
+        dsn (str): PostgreSQL 连接串
+        min_size (int): 预先建立的连接数
+        max_size (int): 最大连接数
+        timeout (float): 等待空闲连接的超时时间（秒）
+        check_idle_after (float): 连接空闲超过该时间（秒）后，取出前先做健康检查
+    """
+    timeout_error = AGEPoolTimeout
+
+    def __init__(
+        self,
+        graph_name: str,
+        dsn: str,
+        min_size: int = 1,
+        max_size: int = 10,
+        timeout: float = 30.0,
+        check_idle_after: float = 60.0,
+    ) -> None:
+        self.graph_name = graph_name
+        self.dsn = dsn
+        self.check_idle_after = check_idle_after
+        super().__init__(self._connect, validate=self._validate, reset=self._reset,
+                         min_size=min_size, max_size=max_size, timeout=timeout)
+
+    def _connect(self) -> ext.connection:
+        """建立新连接并完成 AGE 会话初始化"""
+        age_db: age.Age = age.connect(graph=self.graph_name, dsn=self.dsn,
+                                      connection_factory=AGEConnection)
+        conn = age_db.connection
+        assert conn is not None
+        # 本连接的 agtype 改用 decode_agtype 解码（age.connect 注册的是全局的 parseAgeValue）
+        with conn.cursor() as curs:
+            curs.execute("SELECT typelem FROM pg_type WHERE typname = '_agtype'")
+            oid = curs.fetchone()[0] # pyright: ignore[reportOptionalSubscript]
+        ext.register_type(ext.new_type((oid,), "AGTYPE", decode_agtype), conn)
+        return conn
+
+    def _validate(self, conn: ext.connection, idle: float) -> bool:
+        """已关闭的连接丢弃，空闲较久的连接先做健康检查"""
+        if conn.closed:
+            return False
+        return idle <= self.check_idle_after or self._is_healthy(conn)
+
+    @staticmethod
+    def _is_healthy(conn: ext.connection) -> bool:
+        """检查连接是否可用"""
+        if conn.closed:
+            return False
+        try:
+            with conn.cursor() as curs:
+                curs.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception: # pylint: disable=broad-except
+            return False
+
+    @staticmethod
+    def _reset(conn: ext.connection) -> bool:
+        """未提交或出错的事务一律回滚，保证下一个使用者拿到干净的会话"""
+        if conn.closed:
+            return False
+        if conn.get_transaction_status() != ext.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except Exception: # pylint: disable=broad-except
+                return False
+        return True
+
+    def log_stats(self) -> None:
+        """通过 logfire 输出连接池指标"""
+        logfire.info("AGE pool stats: {stats}", stats=self.stats().as_dict())
@@ -0,0 +1,133 @@
+"""agtype 解码
+AGE 返回的 agtype 文本是带类型注解的 JSON：
+
+    {"id": 1, "label": "Person", "properties": {...}}::vertex
+    [{...}::vertex, {...}::edge, {...}::vertex]::path
+    1.5::numeric
+
+age 自带的 parseAgeValue 基于 ANTLR 逐字符解析，再由 AGEGraph 转换为字典，大结果集的大部分时间耗在这里。
+decode_agtype 把类型注解改写为普通 JSON 后交给 json.loads（C 实现），
+在 object_hook 中一次生成最终的顶点/边字典，路径直接得到顶点/边字典的列表。
+
+改写优先用 str.replace：插入的内容都带引号，若注解文本其实出现在字符串字面量中，
+改写后必然不是合法 JSON，此时再用跳过字符串的正则改写；仍无法解析的文本回退到 parseAgeValue。
+"""
+from __future__ import annotations
+
+import json
+import re
+from decimal import Decimal
+from typing import Any, Dict
+
+from age import parseAgeValue
+from age.models import Edge, Path, Vertex
+
+# 类型注解改写后在对象中的标记键
+_GTYPE = "::"
+# 快速改写时路径列表末尾的标记元素
+_PATH = "::path"
+
+# 字符串字面量原样保留，只改写其外的类型注解
+_ANNOTATION = re.compile(r'"(?:[^"\\]|\\.)*"|\}::(vertex|edge)|\]::path|([-+\w.]+)::numeric')
+
+
+def _rewrite(m: re.Match) -> str:
+    gtype, numeric = m.group(1), m.group(2)
+    if gtype is not None:
+        return f', "{_GTYPE}": "{gtype}"}}'
+    if numeric is not None:
+        return f'{{"{_GTYPE}": "numeric", "value": "{numeric}"}}'
+    text = m.group(0)
+    # ]::path，路径按顶点/边的列表返回
+    return text if text[0] == '"' else "]"
+
+
+def make_vertex(id_: Any, label: str, properties: Dict[str, Any] | None) -> Dict[str, Any]:
+    """顶点字典：id、label、type，属性展开在同一层"""
+    vtx = {"id": id_, "label": label, "type": "vertex"}
+    if properties:
+        vtx.update(properties)
+    return vtx
+
+
+def make_edge(id_: Any, label: str, properties: Dict[str, Any] | None,
+              start_id: Any, end_id: Any) -> Dict[str, Any]:
+    """边字典：在顶点字段之外保留 properties 及起止顶点 id"""
+    edge = {"id": id_, "label": label, "properties": properties,
+            "from_id": start_id, "to_id": end_id, "type": "edge"}
+    if properties:
+        edge.update(properties)
+    return edge
+
+
+def _object_hook(obj: Dict[str, Any]) -> Any:
+    gtype = obj.get(_GTYPE)
+    if gtype is None:
+        return obj
+    if gtype == "vertex":
+        return make_vertex(obj.get("id"), obj.get("label"), obj.get("properties"))
+    if gtype == "edge":
+        return make_edge(obj.get("id"), obj.get("label"), obj.get("properties"),
+                         obj.get("start_id"), obj.get("end_id"))
+    return Decimal(obj["value"])
+
+
+_decoder = json.JSONDecoder(object_hook=_object_hook)
+
+
+def _strip_paths(value: Any) -> Any:
+    """去掉路径列表末尾的标记元素"""
+    if isinstance(value, list):
+        if value and value[-1] == _PATH:
+            value.pop()
+        for v in value:
+            _strip_paths(v)
+    elif isinstance(value, dict):
+        for v in value.values():
+            _strip_paths(v)
+    return value
+
+
+def _decode_fast(text: str) -> Any:
+    """以 str.replace 改写类型注解，注解出现在字符串中时抛出 ValueError"""
+    has_path = "]::path" in text
+    text = text.replace("}::vertex", f', "{_GTYPE}": "vertex"}}') \
+               .replace("}::edge", f', "{_GTYPE}": "edge"}}')
+    if has_path:
+        text = text.replace("]::path", f', "{_PATH}"]')
+    value = _decoder.decode(text)
+    return _strip_paths(value) if has_path else value
+
+
+def from_age(value: Any) -> Any:
+    """将 parseAgeValue 得到的 Vertex/Edge/Path 转换为与 decode_agtype 相同的结构"""
+    if isinstance(value, Vertex):
+        return make_vertex(value.id, value.label, value.properties)
+    if isinstance(value, Edge):
+        assert value.label is not None
+        return make_edge(value.id, value.label, value.properties, value.start_id, value.end_id)
+    if isinstance(value, (Path, list)):
+        return [from_age(v) for v in value]
+    return value
+
+
+def decode_agtype(text: str | None, cursor: Any = None) -> Any:
+    """
+    解码 agtype 文本，可作为 psycopg2 的 typecaster
+
+    Returns:
+        Any: 顶点/边为字典，路径为顶点/边字典的列表，numeric 为 Decimal，其余为对应的 python 值
+    """
+    if text is None:
+        return None
+    try:
+        if "::" not in text:
+            return _decoder.decode(text)
+        if "::numeric" not in text:
+            try:
+                return _decode_fast(text)
+            except ValueError:
+                pass
+        return _decoder.decode(_ANNOTATION.sub(_rewrite, text))
+    except ValueError:
+        return from_age(parseAgeValue(text, cursor))
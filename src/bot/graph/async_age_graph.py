@@ -0,0 +1,369 @@
+"""AsyncAGEGraph class.
+Apache AGE 异步操作类
+基于 psycopg3 + psycopg_pool 的异步连接池，供 FastAPI / MCP 服务在事件循环中直接 await，
+避免同步查询阻塞其他请求。
+SQL 包装、结果转换与 schema 生成复用 AGEGraph 的实现，
+不带参数及带 Cypher 参数（$name）的查询同样以服务端预备语句执行。
+"""
+from __future__ import annotations
+
+import uuid
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Dict, List, Mapping, Sequence, Tuple
+
+import logfire
+import psycopg
+from psycopg.adapt import Loader
+from psycopg.pq import TransactionStatus
+from psycopg_pool import AsyncConnectionPool
+from age.exceptions import AgeNotSet
+
+from .base_graph import AsyncBaseGraph
+from .agtype import decode_agtype
+from .age_pool import PreparedStatements
+from .schema_cache import SchemaCache, get_schema_cache, age_schema_key, make_fingerprint
+from .age_graph import (
+    AGEGraph,
+    AGEQueryException,
+    CompiledQuery,
+    DEFAULT_ITERSIZE,
+    agtype_params,
+    compile_query,
+    plan_rows,
+    prepared_steps,
+    ROLLBACK,
+    LABELS_QUERY,
+    FINGERPRINT_QUERY,
+    NODE_PROPERTIES_LIMIT,
+    EDGE_PROPERTIES_LIMIT,
+)
+
+
+class AgtypeLoader(Loader):
+    """将 agtype 文本解码为顶点/边字典等 python 对象"""
+
+    def load(self, data) -> Any:
+        return decode_agtype(bytes(data).decode("utf-8"))
+
+
+class AGEAsyncConnection(psycopg.AsyncConnection):
+    """记录已 PREPARE 语句的 psycopg3 连接"""
+    prepared: PreparedStatements
+
+
+async def _setup_age(conn: AGEAsyncConnection) -> None:
+    """每个连接只执行一次的 AGE 会话初始化"""
+    conn.prepared = PreparedStatements()
+    await conn.execute("LOAD 'age'")
+    await conn.execute("SET search_path = ag_catalog, '$user', public")
+    cur = await conn.execute("SELECT typelem FROM pg_type WHERE typname = '_agtype'")
+    row = await cur.fetchone()
+    if row is None or row[0] is None:
+        raise AgeNotSet()
+    conn.adapters.register_loader(row[0], AgtypeLoader)
+    await conn.commit()
+
+
+class AsyncAGEGraph(AsyncBaseGraph):
+    """
+    Apache AGE 异步操作类
+
+    Example:
+        graph = AsyncAGEGraph(graph_name, dsn)
+        await graph.open()
+        rows = await graph.query("MATCH (n:BusinessDomain) RETURN n LIMIT 1")
+        await graph.close()
+    """
+    backend = "age"
+
+    def __init__(
+        self, graph_name: str, dsn: str,
+        pool_min_size: int = 1,
+        pool_max_size: int = 10,
+        pool_timeout: float = 30.0,
+        schema_cache: SchemaCache | None = None,
+        prepare: bool = True,
+        itersize: int = DEFAULT_ITERSIZE,
+    ) -> None:
+        self.graph_name = graph_name
+        self.dsn = dsn
+        # 不带参数的查询在服务端 PREPARE 后 EXECUTE
+        self.prepare = prepare
+        # iter_query 每次从服务端游标取回的行数
+        self.itersize = itersize
+        self.schema_cache = schema_cache or get_schema_cache()
+        self.schema_cache_key = age_schema_key(graph_name, dsn)
+        self.graphid = None
+        self._schema: str = ""
+        # session() 期间当前任务固定使用的连接
+        self._pinned: ContextVar[AGEAsyncConnection | None] = \
+            ContextVar(f"age_pinned_{id(self)}", default=None)
+        # 使用客户端参数绑定，与 psycopg2 一致，允许在 $$ ... $$ 内使用 %s
+        self.pool = AsyncConnectionPool(
+            dsn,
+            connection_class=AGEAsyncConnection,
+            kwargs={"cursor_factory": psycopg.AsyncClientCursor},
+            min_size=pool_min_size,
+            max_size=pool_max_size,
+            timeout=pool_timeout,
+            configure=_setup_age,
+            check=AsyncConnectionPool.check_connection,
+            open=False,
+        )
+
+    async def open(self) -> "AsyncAGEGraph":
+        """打开连接池并加载schema"""
+        await self.pool.open(wait=True)
+        rows = await self._fetchall(
+            """SELECT graphid FROM ag_catalog.ag_graph WHERE name = %s""", (self.graph_name,))
+        assert rows
+        self.graphid = rows[0][0]
+        logfire.info("graphid:{id}", id=self.graphid)
+        cached = self.schema_cache.load(self.schema_cache_key, await self.fingerprint())
+        if cached is None:
+            await self.refresh_schema()
+        else:
+            self._schema = cached
+        return self
+
+    async def close(self) -> None:
+        """关闭连接池"""
+        await self.pool.close()
+
+    async def __aenter__(self) -> "AsyncAGEGraph":
+        return await self.open()
+
+    async def __aexit__(self, *_exc) -> None:
+        await self.close()
+
+    def pool_stats(self) -> Dict[str, int]:
+        """连接池指标"""
+        return self.pool.get_stats()
+
+    @asynccontextmanager
+    async def _connection(self) -> AsyncIterator[AGEAsyncConnection]:
+        """取出一个连接，当前任务处于 session() 中时返回固定的连接"""
+        pinned = self._pinned.get()
+        if pinned is not None:
+            yield pinned
+            return
+        async with self.pool.connection() as _conn:
+            yield _conn # pyright: ignore[reportReturnType]
+
+    @asynccontextmanager
+    async def session(self) -> AsyncIterator[None]:
+        """
+        上下文内当前任务的查询共用连接池中的一个连接（及其事务）
+        其中的语句出错只回滚到各自的保存点，退出上下文时提交；因异常退出时整体回滚
+        """
+        if self._pinned.get() is not None:
+            yield
+            return
+        async with self.pool.connection() as _conn:
+            self._pinned.set(_conn) # pyright: ignore[reportArgumentType]
+            try:
+                yield
+                await _conn.commit()
+            finally:
+                # 异步生成器可能在其他上下文中关闭，不使用 reset(token)
+                self._pinned.set(None)
+
+    @asynccontextmanager
+    async def _rollback_on_error(self, conn: AGEAsyncConnection) -> AsyncIterator[None]:
+        """语句出错时回滚事务；session() 中固定的连接上以保存点包裹，同 AGEGraph._rollback_on_error"""
+        if conn is not self._pinned.get():
+            try:
+                yield
+            except psycopg.Error:
+                if conn.info.transaction_status != TransactionStatus.IDLE:
+                    await conn.rollback()
+                raise
+            return
+        await conn.execute("SAVEPOINT dg_nested")
+        try:
+            yield
+        except psycopg.Error:
+            await conn.execute("ROLLBACK TO SAVEPOINT dg_nested")
+            raise
+        await conn.execute("RELEASE SAVEPOINT dg_nested")
+
+    async def _fetchall(self, sql: str, params: Sequence | None = None,
+                        message: str = "Error executing graph query") -> List[Tuple]:
+        async with self._connection() as _conn, _conn.cursor() as curs:
+            try:
+                async with self._rollback_on_error(_conn):
+                    await curs.execute(sql, params)
+            except psycopg.Error as e:
+                raise AGEQueryException(
+                    {
+                        "message": message,
+                        "detail": str(e),
+                    }
+                ) from e
+            return await curs.fetchall()
+
+    async def _fetch_prepared(self, compiled: CompiledQuery, args: Tuple | None = None,
+                              prefix: str = "",
+                              message: str = "Error executing graph query") -> List[Tuple]:
+        async with self._connection() as _conn, _conn.cursor() as curs:
+            try:
+                async with self._rollback_on_error(_conn): # pyright: ignore[reportArgumentType]
+                    await self._execute_prepared(_conn, curs, compiled, args, prefix) # pyright: ignore[reportArgumentType]
+            except psycopg.Error as e:
+                raise AGEQueryException(
+                    {
+                        "message": message,
+                        "detail": str(e),
+                    }
+                ) from e
+            return await curs.fetchall()
+
+    async def query(self, query: str,
+                    params: Sequence | Mapping[str, Any] | None = None) -> List[Dict[str, Any]]:
+        """
+        执行查询
+
+        Args:
+            query (str): Cypher
+            params: Mapping 时作为 Cypher 参数（$name），Sequence 时按 %s 占位替换到 SQL 中
+        """
+        message = f"Error executing graph query: {query}"
+        if isinstance(params, Mapping):
+            # AGE 只接受预备语句参数作为 cypher() 的参数 map
+            compiled = compile_query(query, self.graph_name, True)
+            data = await self._fetch_prepared(compiled, (agtype_params(params),), message=message)
+        elif params is not None or not self.prepare:
+            compiled = compile_query(query, self.graph_name)
+            data = await self._fetchall(compiled.sql, params, message=message)
+        else:
+            compiled = compile_query(query, self.graph_name)
+            data = await self._fetch_prepared(compiled, message=message)
+        fields = list(compiled.fields)
+        return [AGEGraph._record_to_dict(d, fields) for d in data]
+
+    async def iter_query(self, query: str,
+                         params: Sequence | Mapping[str, Any] | None = None
+                         ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        逐行返回查询结果
+        不带参数时通过服务端命名游标每次取回 itersize 行，客户端不保留完整结果；
+        服务端游标使用服务端参数绑定，与 $$ ... $$ 内的 %s 不兼容，带参数时退回到 query()
+        """
+        if params is not None:
+            for row in await self.query(query, params):
+                yield row
+            return
+        compiled = compile_query(query, self.graph_name)
+        fields = list(compiled.fields)
+        async with self._connection() as _conn, \
+                _conn.cursor(name=f"dg_cursor_{uuid.uuid4().hex}") as curs:
+            async def _fetch(first: bool) -> List[Tuple]:
+                try:
+                    if first:
+                        await curs.execute(compiled.sql.rstrip().rstrip(";"))
+                    return await curs.fetchmany(self.itersize)
+                except psycopg.Error as e:
+                    raise AGEQueryException(
+                        {
+                            "message": f"Error executing graph query: {query}",
+                            "detail": str(e),
+                        }
+                    ) from e
+
+            rows = await _fetch(True)
+            while rows:
+                for d in rows:
+                    yield AGEGraph._record_to_dict(d, fields)
+                rows = await _fetch(False)
+
+    @staticmethod
+    async def _execute_prepared(conn: AGEAsyncConnection, curs: psycopg.AsyncCursor,
+                                compiled: CompiledQuery, args: Tuple | None = None,
+                                prefix: str = "") -> None:
+        """以服务端预备语句执行，步骤与 AGEGraph._execute_prepared 共用 prepared_steps"""
+        idle = conn.info.transaction_status == TransactionStatus.IDLE
+        steps = prepared_steps(conn.prepared, compiled, args, prefix, idle)
+        step = next(steps)
+        while True:
+            sql, sql_args = step
+            try:
+                if sql is ROLLBACK:
+                    await conn.rollback()
+                else:
+                    await curs.execute(sql, sql_args)
+            except psycopg.Error as e:
+                step = steps.throw(e)
+                continue
+            try:
+                step = next(steps)
+            except StopIteration:
+                return
+
+    async def explain(self, query: str, params: Mapping[str, Any] | None = None) -> List[str]:
+        """
+        执行查询计划 验证SQL
+
+        Args:
+            params: Cypher 参数，提供时对预备语句执行 EXPLAIN EXECUTE
+
+        Returns:
+            List[str]: 查询计划的各行
+        """
+        if params is None:
+            _wrap_query, _ = AGEGraph._wrap_query(query, self.graph_name)
+            return [r[0] for r in await self._fetchall("EXPLAIN " + _wrap_query)]
+        compiled = compile_query(query, self.graph_name, True)
+        rows = await self._fetch_prepared(compiled, (agtype_params(params),), prefix="EXPLAIN ")
+        return [r[0] for r in rows]
+
+    async def estimate_rows(self, query: str,
+                            params: Mapping[str, Any] | None = None) -> int | None:
+        """按 EXPLAIN 顶层节点的 rows 估计结果行数"""
+        return plan_rows(await self.explain(query, params))
+
+    async def fingerprint(self) -> str:
+        """图的变更指纹，数据导入或修改后会发生变化"""
+        return make_fingerprint(await self._fetchall(FINGERPRINT_QUERY, (self.graphid,)))
+
+    async def refresh_schema(self) -> None:
+        """
+        刷新schema
+        更新 labels, relationships, and properties
+        """
+        fingerprint = await self.fingerprint()
+        n_labels, e_labels = AGEGraph._split_labels(
+            await self._fetchall(LABELS_QUERY, (self.graphid,)))
+
+        async def _fetch_batched(sql: str, params: List[Any], message: str) -> List[Tuple]:
+            if not params:
+                return []
+            return await self._fetchall(sql, params, message=message)
+
+        sql, params = AGEGraph._triples_sql(self.graph_name, self.graphid, e_labels)
+        triple_schema = AGEGraph._rows_to_triples(
+            await _fetch_batched(sql, params, "Error fetching triples"))
+
+        sql, params = AGEGraph._properties_sql(self.graph_name, n_labels, NODE_PROPERTIES_LIMIT)
+        node_properties = AGEGraph._rows_to_properties(
+            n_labels, await _fetch_batched(sql, params, "Error fetching node properties"), "labels")
+
+        sql, params = AGEGraph._properties_sql(self.graph_name, e_labels, EDGE_PROPERTIES_LIMIT)
+        edge_properties = AGEGraph._rows_to_properties(
+            e_labels, await _fetch_batched(sql, params, "Error fetching edge properties"), "type")
+
+        self._schema = AGEGraph._build_schema(n_labels, e_labels,
+                                              node_properties, edge_properties,
+                                              triple_schema)
+        self.schema_cache.save(self.schema_cache_key, fingerprint, self._schema)
+        logfire.info("Refresh schema completed.")
+
+    @property
+    def graph_key(self) -> str:
+        """图标识，与schema缓存键一致"""
+        return self.schema_cache_key
+
+    @property
+    def schema(self) -> str:
+        """Returns the schema of the Graph"""
+        return self._schema
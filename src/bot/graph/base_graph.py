@@ -1,5 +1,9 @@
 from abc import ABC, abstractmethod
-from typing import Dict, List, Tuple, Any, Sequence
+from contextlib import nullcontext
+from typing import (Any, AsyncContextManager, AsyncIterable, AsyncIterator, ContextManager, Dict,
+                    Iterable, Iterator, List, Mapping, Sequence, Tuple, TypeVar)
+
+T = TypeVar("T")
 
 class BaseGraph(ABC):
     # python type mapping for providing readable types to LLM
@@ -11,6 +15,8 @@ class BaseGraph(ABC):
         "dict": "MAP",
         "bool": "BOOLEAN",
     }
+    # 后端名称，用于按后端区分配置
+    backend = ""
 
     @property
     @abstractmethod
@@ -19,15 +25,49 @@ class BaseGraph(ABC):
         ...
 
     @abstractmethod
-    def query(self, query: str, params: Sequence | Dict[str, Any] | None = None) -> List[Dict[str, Any]]:
-        """执行查询"""
+    def query(self, query: str, params: Sequence | Mapping[str, Any] | None = None) -> List[Dict[str, Any]]:
+        """
+        执行查询
+        params 为 Mapping 时绑定到 Cypher 中的 $name 参数，取值不同的同一查询共用解析和执行计划
+        """
         pass
 
+    def iter_query(self, query: str,
+                   params: Sequence | Mapping[str, Any] | None = None) -> Iterator[Dict[str, Any]]:
+        """
+        逐行返回查询结果，供可以增量处理结果的调用方使用
+        默认实现基于 query()，支持流式读取的子类应覆盖
+        """
+        yield from self.query(query, params)
+
+    def session(self) -> ContextManager[Any]:
+        """
+        上下文内当前线程的查询共用一个连接（及其事务）
+        流式读取的同时需要执行其他查询时使用，避免同时占用两个连接；默认不做处理
+        """
+        return nullcontext()
+
     @abstractmethod
     def refresh_schema(self) -> None:
         """刷新schema"""
         pass
 
+    def estimate_rows(self, query: str, params: Mapping[str, Any] | None = None) -> int | None:
+        """
+        按查询计划估计结果行数，不执行查询
+        默认不估计，返回 None
+        """
+        return None
+
+    @property
+    def graph_key(self) -> str:
+        """图标识，用于区分不同图的缓存"""
+        return f"{type(self).__name__}-{id(self)}"
+
+    def fingerprint(self) -> str:
+        """图的变更指纹，默认不跟踪变更"""
+        return ""
+
     @staticmethod
     def _format_triples(triples: List[Dict[str, str]]) -> List[str]:
         """
@@ -38,8 +78,107 @@ class BaseGraph(ABC):
         triple_schema = [triple_template.format(**triple) for triple in triples]
         return triple_schema
 
+class AsyncBaseGraph(ABC):
+    """BaseGraph 的异步版本，供 FastAPI / MCP 等异步服务使用"""
+    types = BaseGraph.types
+    backend = ""
+
+    @property
+    @abstractmethod
+    def schema(self) -> str:
+        """获取schema"""
+        ...
+
+    @abstractmethod
+    async def query(self, query: str, params: Sequence | Mapping[str, Any] | None = None) -> List[Dict[str, Any]]:
+        """
+        执行查询
+        params 为 Mapping 时绑定到 Cypher 中的 $name 参数
+        """
+        pass
+
+    async def iter_query(self, query: str,
+                         params: Sequence | Mapping[str, Any] | None = None
+                         ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        逐行返回查询结果，供可以增量处理结果的调用方使用
+        默认实现基于 query()，支持流式读取的子类应覆盖
+        """
+        for row in await self.query(query, params):
+            yield row
+
+    def session(self) -> AsyncContextManager[Any]:
+        """上下文内当前任务的查询共用一个连接，默认不做处理"""
+        return nullcontext()
+
+    @abstractmethod
+    async def refresh_schema(self) -> None:
+        """刷新schema"""
+        pass
+
+    async def estimate_rows(self, query: str,
+                            params: Mapping[str, Any] | None = None) -> int | None:
+        """按查询计划估计结果行数，默认不估计"""
+        return None
+
+    @property
+    def graph_key(self) -> str:
+        """图标识，用于区分不同图的缓存"""
+        return f"{type(self).__name__}-{id(self)}"
+
+    async def fingerprint(self) -> str:
+        """图的变更指纹，默认不跟踪变更"""
+        return ""
+
+def iter_chunks(rows: Iterable[T], size: int) -> Iterator[List[T]]:
+    """按 size 分块"""
+    chunk: List[T] = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+async def aiter_chunks(rows: AsyncIterable[T], size: int) -> AsyncIterator[List[T]]:
+    """iter_chunks 的异步版本"""
+    chunk: List[T] = []
+    async for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
 class BaseMetadataHelper(ABC):
     @abstractmethod
-    def query(self, cypher:str, graph:BaseGraph)-> list:
-        """执行查询"""
+    def query(self, cypher:str, graph:BaseGraph,
+              params:Mapping[str, Any] | None = None, limit:int | None = None)-> list:
+        """执行查询，params 为 Cypher 参数，limit 为返回的行数上限"""
         pass
+
+    def iter_query(self, cypher:str, graph:BaseGraph,
+                   params:Mapping[str, Any] | None = None,
+                   limit:int | None = None)-> Iterator[list]:
+        """逐行返回查询结果，默认实现基于 query()"""
+        yield from self.query(cypher, graph, params, limit)
+
+class AsyncMetadataHelper(BaseMetadataHelper):
+    """
+    同时支持异步图的元模型查询
+    只支持同步图的 helper（如 Kuzu）不继承此类，异步调用方以此类型声明参数，传入时在类型检查阶段报错
+    """
+    @abstractmethod
+    async def aquery(self, cypher:str, graph:AsyncBaseGraph,
+                     params:Mapping[str, Any] | None = None, limit:int | None = None)-> list:
+        """执行查询（异步），params 为 Cypher 参数，limit 为返回的行数上限"""
+        pass
+
+    async def aiter_query(self, cypher:str, graph:AsyncBaseGraph,
+                          params:Mapping[str, Any] | None = None,
+                          limit:int | None = None)-> AsyncIterator[list]:
+        """逐行返回查询结果（异步），默认实现基于 aquery()"""
+        for row in await self.aquery(cypher, graph, params, limit):
+            yield row
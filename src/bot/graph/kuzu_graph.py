@@ -4,10 +4,14 @@ KuzuGraph class.
 """
 from __future__ import annotations
 
-from typing import Dict, List, Any
+from pathlib import Path
+from typing import Dict, Iterator, List, Any
 
 import kuzu
 from .base_graph import BaseGraph
+from .schema_cache import SchemaCache, get_schema_cache, kuzu_schema_key, make_fingerprint
+from .pool import PoolStats
+from .kuzu_pool import KuzuConnectionPool
 
 class KuzuQueryException(Exception):
     """Exception for the Kuzu queries."""
@@ -42,23 +46,57 @@ class KuzuGraph(BaseGraph):
         "dict": "MAP",
         "bool": "BOOLEAN",
     }
-
-    def __init__(self, db_path: str) -> None:
+    # Kuzu 的 EXPLAIN 只给出算子树，没有行数估计，estimate_rows 使用默认实现
+    backend = "kuzu"
+
+    def __init__(
+        self, db_path: str,
+        schema_cache: SchemaCache | None = None,
+        pool_max_size: int = 4,
+        num_threads: int = 0,
+        pool_timeout: float = 30.0,
+    ) -> None:
         self.db_path: str = db_path
         self.db = kuzu.Database(db_path, read_only=True)
-        self.conn = kuzu.Connection(self.db)
+        self.pool = KuzuConnectionPool(self.db, max_size=pool_max_size,
+                                       num_threads=num_threads, timeout=pool_timeout)
         self._schema:str = ""
-        self.refresh_schema()
+        self.schema_cache = schema_cache or get_schema_cache()
+        self.schema_cache_key = kuzu_schema_key(db_path)
+        cached = self.schema_cache.load(self.schema_cache_key, self.fingerprint())
+        if cached is None:
+            self.refresh_schema()
+        else:
+            self._schema = cached
+
+    def pool_stats(self) -> PoolStats:
+        """连接池指标"""
+        return self.pool.stats()
+
+    def close(self) -> None:
+        """关闭连接池和数据库"""
+        self.pool.close()
+        self.db.close()
+
+    def fingerprint(self) -> str:
+        """数据库文件的变更指纹（文件大小、修改时间）"""
+        root = Path(self.db_path)
+        files = [root] if root.is_file() else sorted(p for p in root.rglob("*") if p.is_file())
+        return make_fingerprint(
+            (str(p.relative_to(root)) if p != root else p.name,
+             p.stat().st_size, p.stat().st_mtime_ns)
+            for p in files)
 
     def explain(self, query: str, params: Dict[str, Any] | None = None):
         """
         执行查询计划
         """
         try:
-            if params is None:
-                self.conn.execute(query)
-            else:
-                self.conn.execute(query, params)
+            with self.pool.connection() as conn:
+                if params is None:
+                    conn.execute(query)
+                else:
+                    conn.execute(query, params)
         except Exception as e:
             raise KuzuQueryException(
                 {
@@ -67,22 +105,14 @@ class KuzuGraph(BaseGraph):
                 }
             ) from e
 
-    def query(self, query: str, params: Dict[str, Any] | None = None) -> List[Dict[str, Any]]:
-        """
-        执行查询
-        """
+    @staticmethod
+    def _execute(conn: kuzu.Connection, query: str,
+                 params: Dict[str, Any] | None) -> kuzu.QueryResult:
         try:
             if params is None:
-                result = self.conn.execute(query)
+                result = conn.execute(query)
             else:
-                result = self.conn.execute(query, params)
-            # 假设 Kuzu 的查询结果对象有类似获取列名的方法，这里需要根据实际的 Kuzu API 来调整
-            # 以下代码假设 result 有一个正确的方法来获取列名
-            if isinstance(result, kuzu.QueryResult):                
-                # column_names = result.get_column_names()
-                _df = result.get_as_df()
-                return _df.to_dict(orient="records")
-            return []  # 确保在所有代码路径上返回 List[Dict[str, Any]] 类型的值
+                result = conn.execute(query, params)
         except Exception as e:
             raise KuzuQueryException(
                 {
@@ -90,6 +120,45 @@ class KuzuGraph(BaseGraph):
                     "detail": str(e),
                 }
             ) from e
+        # 多条语句时返回列表，取最后一条的结果
+        if isinstance(result, list):
+            for r in result[:-1]:
+                r.close()
+            result = result[-1]
+        return result
+
+    def session(self):
+        """上下文内当前线程的查询共用连接池中的一个连接（及其事务）"""
+        return self.pool.pinned()
+
+    def iter_query(self, query: str, params: Dict[str, Any] | None = None) -> Iterator[Dict[str, Any]]:
+        """
+        逐行返回查询结果
+        直接读取 QueryResult（has_next/get_next），不经过 DataFrame
+        读取结束（或生成器关闭）前一直占用连接池中的一个连接
+        """
+        with self.pool.connection() as conn:
+            result = self._execute(conn, query, params)
+            try:
+                columns = result.get_column_names()
+                while result.has_next():
+                    yield dict(zip(columns, result.get_next()))
+            except Exception as e:
+                raise KuzuQueryException(
+                    {
+                        "message": f"Error fetching graph query result: {query}",
+                        "detail": str(e),
+                    }
+                ) from e
+            finally:
+                result.close()
+
+    def query(self, query: str, params: Dict[str, Any] | None = None) -> List[Dict[str, Any]]:
+        """
+        执行查询
+        params 使用 Kuzu 原生参数绑定（Cypher 中的 $name）
+        """
+        return list(self.iter_query(query, params))
 
     def _wrap_name(self, name: str) -> str:
         """Wrap name with backticks."""
@@ -99,47 +168,49 @@ class KuzuGraph(BaseGraph):
 
     def refresh_schema(self) -> None:
         """Refreshes the Kùzu graph schema information"""
-        node_properties = []
-        node_table_names = self.conn._get_node_table_names()
-        for table_name in node_table_names:
-            current_table_schema = {"properties": [], "label": self._wrap_name(table_name)}
-            properties = self.conn._get_node_property_names(table_name)
-            for property_name in properties:
-                property_type = properties[property_name]["type"]
-                list_type_flag = ""
-                if properties[property_name]["dimension"] > 0:
-                    if "shape" in properties[property_name]:
-                        for s in properties[property_name]["shape"]:
-                            list_type_flag += "[%s]" % s
-                    else:
-                        for i in range(properties[property_name]["dimension"]):
-                            list_type_flag += "[]"
-                property_type += list_type_flag
-                current_table_schema["properties"].append(
-                    (property_name, property_type)
+        fingerprint = self.fingerprint()
+        with self.pool.connection() as conn:
+            node_properties = []
+            node_table_names = conn._get_node_table_names()
+            for table_name in node_table_names:
+                current_table_schema = {"properties": [], "label": self._wrap_name(table_name)}
+                properties = conn._get_node_property_names(table_name)
+                for property_name in properties:
+                    property_type = properties[property_name]["type"]
+                    list_type_flag = ""
+                    if properties[property_name]["dimension"] > 0:
+                        if "shape" in properties[property_name]:
+                            for s in properties[property_name]["shape"]:
+                                list_type_flag += "[%s]" % s
+                        else:
+                            for i in range(properties[property_name]["dimension"]):
+                                list_type_flag += "[]"
+                    property_type += list_type_flag
+                    current_table_schema["properties"].append(
+                        (property_name, property_type)
+                    )
+                node_properties.append(current_table_schema)
+
+            relationships = []
+            rel_tables = conn._get_rel_table_names()
+            for table in rel_tables:
+                relationships.append(
+                    "(:%s)-[:%s]->(:%s)" % (self._wrap_name(table["src"]), table["name"], self._wrap_name(table["dst"]))
                 )
-            node_properties.append(current_table_schema)
-
-        relationships = []
-        rel_tables = self.conn._get_rel_table_names()
-        for table in rel_tables:
-            relationships.append(
-                "(:%s)-[:%s]->(:%s)" % (self._wrap_name(table["src"]), table["name"], self._wrap_name(table["dst"]))
-            )
-
-        rel_properties = []
-        for table in rel_tables:
-            table_name = self._wrap_name(table["name"])
-            current_table_schema = {"properties": [], "label": table_name}
-            query_result = self.conn.execute(
-                f"CALL table_info('{table_name}') RETURN *;"
-            )
-            while query_result.has_next(): # pyright: ignore[reportAttributeAccessIssue]
-                row = query_result.get_next()# pyright: ignore[reportAttributeAccessIssue]
-                prop_name = row[1]
-                prop_type = row[2]
-                current_table_schema["properties"].append((prop_name, prop_type))
-            rel_properties.append(current_table_schema)
+
+            rel_properties = []
+            for table in rel_tables:
+                table_name = self._wrap_name(table["name"])
+                current_table_schema = {"properties": [], "label": table_name}
+                query_result = conn.execute(
+                    f"CALL table_info('{table_name}') RETURN *;"
+                )
+                while query_result.has_next(): # pyright: ignore[reportAttributeAccessIssue]
+                    row = query_result.get_next()# pyright: ignore[reportAttributeAccessIssue]
+                    prop_name = row[1]
+                    prop_type = row[2]
+                    current_table_schema["properties"].append((prop_name, prop_type))
+                rel_properties.append(current_table_schema)
 
         self._schema = (
             "## 图数据库结构:\n"
@@ -147,7 +218,13 @@ class KuzuGraph(BaseGraph):
             f"关联: {rel_properties}\n"
             f"节点关联关系: {relationships}\n"
         )
+        self.schema_cache.save(self.schema_cache_key, fingerprint, self._schema)
     
+    @property
+    def graph_key(self) -> str:
+        """图标识，与schema缓存键一致"""
+        return self.schema_cache_key
+
     @property
     def schema(self) -> str:
         """Returns the schema of the Graph"""
@@ -0,0 +1,45 @@
+"""Kuzu 连接池
+在共享的只读 Database 上维护多个 kuzu.Connection，
+每个请求取出独立的连接执行查询，max_size 限制同时执行的查询数。
+"""
+from __future__ import annotations
+
+import kuzu
+import logfire
+
+from .pool import ConnectionPool, PoolTimeout
+
+
+class KuzuPoolTimeout(PoolTimeout):
+    """Raised when no connection becomes available within the timeout."""
+
+
+class KuzuConnectionPool(ConnectionPool[kuzu.Connection]):
+    """
+    Kuzu 连接池
+
+    Args:
+        db (kuzu.Database): 共享的数据库对象
+        max_size (int): 最大连接数，即最大并发查询数
+        num_threads (int): 每个连接执行查询使用的线程数，0 表示使用 Kuzu 的默认值
+        timeout (float): 等待空闲连接的超时时间（秒）
+    """
+    timeout_error = KuzuPoolTimeout
+
+    def __init__(
+        self,
+        db: kuzu.Database,
+        max_size: int = 4,
+        num_threads: int = 0,
+        timeout: float = 30.0,
+    ) -> None:
+        self.db = db
+        self.num_threads = num_threads
+        super().__init__(self._connect, max_size=max_size, timeout=timeout)
+
+    def _connect(self) -> kuzu.Connection:
+        return kuzu.Connection(self.db, num_threads=self.num_threads)
+
+    def log_stats(self) -> None:
+        """通过 logfire 输出连接池指标"""
+        logfire.info("Kuzu pool stats: {stats}", stats=self.stats().as_dict())
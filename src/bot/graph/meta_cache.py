@@ -0,0 +1,198 @@
+"""元模型对象缓存
+MetadataHelper 解析出的元模型对象按 (图标识, 图版本, label, id) 缓存。
+图版本取自图的代次标记（schema_cache.generation）和变更指纹（fingerprint），
+代次标记每次都检查（异步版本在线程池中读取，不阻塞事件循环），指纹按 check_interval 节流检查；
+csv2age / csv2kuzu 重新导入后代次标记和指纹变化，该图的旧对象随即失效。
+容量按对象的近似字节数计算，超出后按 LRU 淘汰。
+"""
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Hashable, Tuple
+
+import logfire
+from cachetools import LRUCache
+
+from bot.settings import settings
+
+from .base_graph import BaseGraph, AsyncBaseGraph
+from .schema_cache import get_schema_cache
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# (图标识, 图版本)
+Scope = Tuple[str, str]
+
+
+def sizeof_meta(obj: Any) -> int:
+    """元模型对象的近似字节数（序列化后的长度，物理表包含其字段）"""
+    if hasattr(obj, "model_dump_json"):
+        return len(obj.model_dump_json().encode("utf-8"))
+    return len(repr(obj).encode("utf-8"))
+
+
+@dataclass
+class MetaCacheStats:
+    """缓存指标"""
+    entries: int = 0
+    bytes: int = 0
+    max_bytes: int = 0
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    invalidations: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        """命中率"""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        """转换为字典，便于日志输出"""
+        return {
+            "entries": self.entries,
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+class _LRU(LRUCache):
+    """统计容量淘汰次数的 LRUCache"""
+
+    def __init__(self, maxsize, getsizeof, stats: MetaCacheStats):
+        super().__init__(maxsize, getsizeof=getsizeof)
+        self._stats = stats
+
+    def popitem(self):
+        item = super().popitem()
+        self._stats.evictions += 1
+        return item
+
+
+class MetaObjectCache:
+    """
+    元模型对象缓存，线程安全
+
+    Args:
+        max_bytes (int): 缓存对象的总字节数上限
+        check_interval (float): 同一个图两次检查变更指纹的最小间隔（秒）
+
+    Example:
+        scope = cache.scope(graph)
+        obj = cache.get(scope, "PhysicalTable", "844424930131969")
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, check_interval: float = 10.0) -> None:
+        self.max_bytes = max_bytes
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._stats = MetaCacheStats(max_bytes=max_bytes)
+        self._data = _LRU(max_bytes, sizeof_meta, self._stats)
+        # 图标识 -> (图版本, 代次标记, 检查时间)
+        self._versions: Dict[str, Tuple[str, str, float]] = {}
+
+    def _cached_scope(self, graph_key: str, generation: str) -> Scope | None:
+        with self._lock:
+            known = self._versions.get(graph_key)
+        if known is not None and known[1] == generation \
+                and time.monotonic() - known[2] < self.check_interval:
+            return graph_key, known[0]
+        return None
+
+    def _set_version(self, graph_key: str, generation: str, fingerprint: str) -> Scope:
+        version = f"{generation}:{fingerprint}"
+        with self._lock:
+            known = self._versions.get(graph_key)
+            self._versions[graph_key] = (version, generation, time.monotonic())
+            if known is not None and known[0] != version:
+                self._drop(graph_key)
+                logfire.info("Metadata cache invalidated: {graph} version changed", graph=graph_key)
+        return graph_key, version
+
+    def scope(self, graph: BaseGraph) -> Scope:
+        """获取图的当前缓存范围，指纹变化时丢弃该图的旧对象"""
+        generation = get_schema_cache().generation(graph.graph_key)
+        return self._cached_scope(graph.graph_key, generation) \
+            or self._set_version(graph.graph_key, generation, graph.fingerprint())
+
+    async def ascope(self, graph: AsyncBaseGraph) -> Scope:
+        """scope 的异步版本"""
+        generation = await asyncio.to_thread(get_schema_cache().generation, graph.graph_key)
+        return self._cached_scope(graph.graph_key, generation) \
+            or self._set_version(graph.graph_key, generation, await graph.fingerprint())
+
+    def get(self, scope: Scope, label: str, obj_id: Hashable) -> Any | None:
+        """读取缓存，未命中返回 None"""
+        key = (*scope, label, obj_id)
+        with self._lock:
+            obj = self._data.get(key)
+            if obj is None:
+                self._stats.misses += 1
+            else:
+                self._stats.hits += 1
+            return obj
+
+    def put(self, scope: Scope, label: str, obj_id: Hashable, obj: Any) -> None:
+        """写入缓存，单个对象超过容量上限时不缓存"""
+        key = (*scope, label, obj_id)
+        with self._lock:
+            try:
+                self._data[key] = obj
+            except ValueError:
+                # value too large
+                pass
+
+    def _drop(self, graph_key: str) -> None:
+        for key in [k for k in self._data if k[0] == graph_key]:
+            self._data.pop(key, None)
+        self._stats.invalidations += 1
+
+    def invalidate(self, graph_key: str | None = None) -> None:
+        """丢弃指定图（None 时为全部）的缓存对象"""
+        with self._lock:
+            if graph_key is None:
+                self._data = _LRU(self.max_bytes, sizeof_meta, self._stats)
+                self._versions.clear()
+                self._stats.invalidations += 1
+            else:
+                self._versions.pop(graph_key, None)
+                self._drop(graph_key)
+
+    def stats(self) -> MetaCacheStats:
+        """获取缓存指标快照"""
+        with self._lock:
+            return MetaCacheStats(
+                entries=len(self._data),
+                bytes=int(self._data.currsize),
+                max_bytes=self.max_bytes,
+                hits=self._stats.hits,
+                misses=self._stats.misses,
+                evictions=self._stats.evictions,
+                invalidations=self._stats.invalidations,
+            )
+
+    def log_stats(self) -> None:
+        """通过 logfire 输出缓存指标"""
+        logfire.info("Metadata cache stats: {stats}", stats=self.stats().as_dict())
+
+
+_default_cache: MetaObjectCache | None = None
+
+
+def get_meta_cache() -> MetaObjectCache:
+    """按 settings.yaml 的 meta_cache 配置获取进程内共享的缓存实例"""
+    global _default_cache # pylint: disable=global-statement
+    if _default_cache is None:
+        _default_cache = MetaObjectCache(
+            max_bytes=settings.get_value("meta_cache.max_bytes", DEFAULT_MAX_BYTES),
+            check_interval=settings.get_value("meta_cache.check_interval", 10.0))
+    return _default_cache
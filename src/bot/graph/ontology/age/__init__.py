@@ -1,5 +1,6 @@
-from typing import Any
-from cachetools import TTLCache, cachedmethod
+from contextlib import closing
+from itertools import islice
+from typing import Any, AsyncIterator, Iterator, Mapping
 
 from .Application import Application
 from .BusinessDomain import BusinessDomain
@@ -11,7 +12,10 @@ from .PhysicalTable import PhysicalTable
 from .RelatedTo import RelatedTo
 from .. import MetaObject
 
-from bot.graph.base_graph import BaseGraph, BaseMetadataHelper
+from bot.graph.base_graph import (BaseGraph, AsyncBaseGraph, AsyncMetadataHelper,
+                                  iter_chunks, aiter_chunks)
+from bot.graph.meta_cache import MetaObjectCache, Scope, get_meta_cache
+from bot.graph.result_cache import QueryResultCache, cache_params, get_result_cache
 
 class Others(MetaObject):
     @classmethod
@@ -33,74 +37,223 @@ _meta_factories:dict[str, type] = {
     "RELATED_TO": RelatedTo,
 }
 
-def _age_obj_key(_, c:Any, _g:Any) -> int:
-    if isinstance(c, dict):
-        return hash(f"{c['label']}:{c['id']}")
-    return hash(c)
+def _age_obj_key(c:dict) -> tuple[str, Any]:
+    return c['label'], c['id']
 
-meta_obj_cache = TTLCache(maxsize=200, ttl=3000)
+# 单次批量取字段的物理表数量上限，避免 IN 列表过长
+COLUMNS_BATCH_SIZE = 200
 
-class MetadataHelper(BaseMetadataHelper):
-    def _load_columns(self, table:PhysicalTable, graph:BaseGraph):
-        """加载物理表的列信息
+# 流式查询时每块的行数，每块批量加载一次字段
+STREAM_CHUNK_SIZE = 1000
+
+# 物理表名以参数传入，各批次共用同一语句
+COLUMNS_CYPHER = """
+            MATCH (t:PhysicalTable)-[:HAS_COLUMN]->(c:Column)
+            WHERE t.full_table_name IN $names
+            RETURN t.full_table_name AS tn, c"""
+
+def _group_tables(objs) -> dict[str, list[PhysicalTable]]:
+    """按 full_table_name 归并待加载字段的物理表"""
+    tables: dict[str, list[PhysicalTable]] = {}
+    for obj in objs:
+        if isinstance(obj, PhysicalTable):
+            tables.setdefault(obj.full_table_name, []).append(obj)
+    return tables
+
+def _attach_columns(tables:dict[str, list[PhysicalTable]], rows:list) -> None:
+    """将批量查询到的字段挂到对应的物理表上"""
+    for r in rows:
+        column = Column.parse(r['c'])
+        for table in tables.get(r['tn'], []):
+            table.columns.append(column)
+
+class MetadataHelper(AsyncMetadataHelper):
+    """
+    AGE 元模型查询
+
+    Args:
+        cache: 元模型对象缓存，默认使用进程内共享的缓存
+        results: 查询结果缓存，默认按 settings.yaml 的 result_cache 配置使用进程内共享的缓存
+    """
+    def __init__(self, cache:MetaObjectCache | None = None,
+                 results:QueryResultCache | None = None) -> None:
+        self.cache = cache or get_meta_cache()
+        self.results = results if results is not None else get_result_cache()
+
+    def _load_columns(self, tables:dict[str, list[PhysicalTable]], graph:BaseGraph):
+        """批量加载物理表的列信息
         """
-        cypher = f"""
-            MATCH (t:PhysicalTable {{full_table_name: '{table.full_table_name}'}})-[:HAS_COLUMN]->(c:Column) 
-            RETURN c"""
-        columns = graph.query(cypher)
-        table.columns.extend([Column.parse(c['c']) for c in columns])
-    
-    @cachedmethod(lambda _: meta_obj_cache, key=_age_obj_key)
-    def _parse_age2model(self, c:Any, graph:BaseGraph):
-        """将kuzu数据库类型转换为元模型对象
-        
-        Args:
-            c: 待转换的AGE数据库对象（顶点或边）
-        Returns:
-            Any: 转换后的元模型对象
+        names = list(tables)
+        for i in range(0, len(names), COLUMNS_BATCH_SIZE):
+            _attach_columns(tables, graph.query(COLUMNS_CYPHER,
+                                                {"names": names[i:i + COLUMNS_BATCH_SIZE]}))
+
+    async def _aload_columns(self, tables:dict[str, list[PhysicalTable]], graph:AsyncBaseGraph):
+        """批量加载物理表的列信息（异步）
         """
+        names = list(tables)
+        for i in range(0, len(names), COLUMNS_BATCH_SIZE):
+            _attach_columns(tables,
+                            await graph.query(COLUMNS_CYPHER, {"names": names[i:i + COLUMNS_BATCH_SIZE]}))
+
+    @staticmethod
+    def _parse_cell(c:Any):
+        """将AGE数据库对象转换为元模型对象，不访问数据库"""
         if isinstance(c, dict):
             cls = _meta_factories.get(c['label'], Others)
-            obj = cls.parse(c)
-            if cls is PhysicalTable:
-                self._load_columns(obj, graph)
-            return obj
-        else:
-            return c
-
-    def _traverse_age_result(self,
-                             contents,
-                             metaobj_list:list,
-                             graph:BaseGraph):
-        """遍历kuzu查询结果提取元模型对象
-        
-        Args:
-            contents: kuzu查询结果内容
-            resp: DataGovResponse对象，用于存储转换后的元模型对象
+            return cls.parse(c)
+        return c
+
+    @staticmethod
+    def _iter_cells(row:dict):
+        """展开一行结果中的单元格，路径/列表逐个展开"""
+        for cell in row.values():
+            if isinstance(cell, list):
+                yield from cell
+            else:
+                yield cell
+
+    def _collect_age_result(self, contents, scope:Scope) -> tuple[list, dict]:
+        """将查询结果转换为元模型对象，不访问数据库
+
+        缓存未命中的对象先放在 fresh 中，物理表的字段批量加载完成后再写入缓存，
+        同一结果中重复出现的对象共用一个实例。
+
+        Returns:
+            tuple: (元模型对象列表, 本次新解析的对象 {缓存键: 对象})
         """
+        fresh: dict[tuple, Any] = {}
+        metaobj_list = []
         for row in contents:
-             _row = []
-             for cell in row.values():
-                 if isinstance(cell, list):
-                     for _c in cell:
-                         d = self._parse_age2model(_c, graph)
-                         _row.append(d)
-                 else:
-                     d = self._parse_age2model(cell, graph)
-                     _row.append(d)
-             metaobj_list.append(_row)
+            _row = []
+            for c in self._iter_cells(row):
+                if not isinstance(c, dict):
+                    _row.append(c)
+                    continue
+                key = _age_obj_key(c)
+                obj = fresh.get(key)
+                if obj is None:
+                    obj = self.cache.get(scope, *key)
+                if obj is None:
+                    obj = self._parse_cell(c)
+                    fresh[key] = obj
+                _row.append(obj)
+            metaobj_list.append(_row)
+        return metaobj_list, fresh
+
+    def _finish(self, objs:list, fresh:dict, graph:BaseGraph, scope:Scope) -> list:
+        """加载新解析物理表的字段，写入缓存"""
+        self._load_columns(_group_tables(fresh.values()), graph)
+        for key, obj in fresh.items():
+            self.cache.put(scope, *key, obj)
+        return objs
+
+    async def _afinish(self, objs:list, fresh:dict, graph:AsyncBaseGraph, scope:Scope) -> list:
+        """_finish 的异步版本"""
+        await self._aload_columns(_group_tables(fresh.values()), graph)
+        for key, obj in fresh.items():
+            self.cache.put(scope, *key, obj)
+        return objs
+
+    def query(self, cypher:str, graph:BaseGraph,
+              params:Mapping[str, Any] | None = None, limit:int | None = None)-> list:
+        """按照Cypher脚本进行AGE元数据查询，结果经查询结果缓存
     
-    def query(self, cypher:str, graph:BaseGraph)-> list:
-        """按照Cypher脚本进行AGE元数据查询
+        Args:
+            query: Cypher
+            params: Cypher 参数（$name），取值不同的同一查询共用预备语句
+            limit: 返回的行数上限，超出部分不读取
+            
+        Returns:
+            list: 包含查询结果的响应对象
+        """
+        scope = self.cache.scope(graph)
+        if self.results is None:
+            return self._query(cypher, graph, params, limit, scope)
+        return list(self.results.get_or_load(scope, cypher, cache_params(params, limit),
+                                             lambda: self._query(cypher, graph, params, limit,
+                                                                 scope)))
+
+    def _query(self, cypher:str, graph:BaseGraph, params:Mapping[str, Any] | None,
+               limit:int | None, scope:Scope)-> list:
+        if limit is None:
+            # 一次取回全部结果，不带参数的查询走预备语句
+            objs, fresh = self._collect_age_result(graph.query(cypher, params), scope)
+        else:
+            with closing(graph.iter_query(cypher, params)) as rows: # pyright: ignore[reportArgumentType]
+                objs, fresh = self._collect_age_result(islice(rows, limit), scope)
+        # 结果读取完、连接归还后再加载字段
+        return self._finish(objs, fresh, graph, scope)
+
+    def iter_query(self, cypher:str, graph:BaseGraph,
+                   params:Mapping[str, Any] | None = None,
+                   limit:int | None = None)-> Iterator[list]:
+        """逐行返回元模型对象，不经查询结果缓存
+
+        结果按 STREAM_CHUNK_SIZE 分块转换，每块批量加载一次字段，内存只保留当前块。
+        读取期间占用一个连接，字段在同一连接（session）上加载，不再占用第二个连接。
+        """
+        scope = self.cache.scope(graph)
+        with graph.session(), \
+             closing(graph.iter_query(cypher, params)) as rows: # pyright: ignore[reportArgumentType]
+            for chunk in iter_chunks(islice(rows, limit), STREAM_CHUNK_SIZE):
+                yield from self._finish(*self._collect_age_result(chunk, scope), graph, scope)
+
+    async def aquery(self, cypher:str, graph:AsyncBaseGraph,
+                     params:Mapping[str, Any] | None = None, limit:int | None = None)-> list:
+        """按照Cypher脚本进行AGE元数据查询（异步），结果经查询结果缓存
     
         Args:
             query: Cypher
+            params: Cypher 参数（$name）
+            limit: 返回的行数上限，超出部分不读取
             
         Returns:
             list: 包含查询结果的响应对象
         """
-        result = graph.query(cypher)
+        scope = await self.cache.ascope(graph)
+        if self.results is None:
+            return await self._aquery(cypher, graph, params, limit, scope)
+        return list(await self.results.aget_or_load(scope, cypher, cache_params(params, limit),
+                                                    lambda: self._aquery(cypher, graph, params,
+                                                                         limit, scope)))
+
+    async def _aquery(self, cypher:str, graph:AsyncBaseGraph, params:Mapping[str, Any] | None,
+                      limit:int | None, scope:Scope)-> list:
+        if limit is None:
+            result = await graph.query(cypher, params)
+        else:
+            result = []
+            rows = graph.iter_query(cypher, params)
+            try:
+                while len(result) < limit:
+                    try:
+                        result.append(await anext(rows))
+                    except StopAsyncIteration:
+                        break
+            finally:
+                await rows.aclose() # pyright: ignore[reportAttributeAccessIssue]
+        objs, fresh = self._collect_age_result(result, scope)
+        return await self._afinish(objs, fresh, graph, scope)
 
-        collect_metaobjs = []
-        self._traverse_age_result(result, collect_metaobjs, graph)
-        return collect_metaobjs
+    async def aiter_query(self, cypher:str, graph:AsyncBaseGraph,
+                          params:Mapping[str, Any] | None = None,
+                          limit:int | None = None)-> AsyncIterator[list]:
+        """逐行返回元模型对象（异步），不经查询结果缓存，分块方式及连接使用同 iter_query"""
+        scope = await self.cache.ascope(graph)
+        async with graph.session():
+            rows = graph.iter_query(cypher, params)
+            count = 0
+            try:
+                size = STREAM_CHUNK_SIZE if limit is None else max(1, min(STREAM_CHUNK_SIZE, limit))
+                async for chunk in aiter_chunks(rows, size):
+                    if limit is not None:
+                        chunk = chunk[:limit - count]
+                    count += len(chunk)
+                    objs, fresh = self._collect_age_result(chunk, scope)
+                    for row in await self._afinish(objs, fresh, graph, scope):
+                        yield row
+                    if limit is not None and count >= limit:
+                        break
+            finally:
+                await rows.aclose() # pyright: ignore[reportAttributeAccessIssue]
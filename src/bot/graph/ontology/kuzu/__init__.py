@@ -1,5 +1,6 @@
-from typing import Any
-from cachetools import TTLCache, cachedmethod
+from contextlib import closing
+from itertools import islice
+from typing import Any, Iterator, Mapping
 
 from .Application import Application
 from .BusinessDomain import BusinessDomain
@@ -11,7 +12,9 @@ from .PhysicalTable import PhysicalTable
 from .RelatedTo import RelatedTo
 from .. import MetaObject
 
-from bot.graph.base_graph import BaseGraph, BaseMetadataHelper
+from bot.graph.base_graph import BaseGraph, BaseMetadataHelper, iter_chunks
+from bot.graph.meta_cache import MetaObjectCache, Scope, get_meta_cache
+from bot.graph.result_cache import QueryResultCache, cache_params, get_result_cache
 
 class Others(MetaObject):
     @classmethod
@@ -33,48 +36,76 @@ _meta_factories:dict[str, type] = {
     "RELATED_TO": RelatedTo,
 }
 
-def _age_obj_key(_, c:Any, _g:Any) -> int:
-    if isinstance(c, dict):
-        return hash(f"{c['_label']}:{c['_id']['offset']}:{c['_id']['table']}")
-    return hash(c)
+def _kuzu_obj_key(c:dict) -> tuple[str, str]:
+    return c['_label'], f"{c['_id']['offset']}:{c['_id']['table']}"
 
-meta_obj_cache = TTLCache(maxsize=200, ttl=3000)
+# 单次批量取字段的物理表数量上限，避免 IN 列表过长
+COLUMNS_BATCH_SIZE = 200
+
+# 流式查询时每块的行数，每块批量加载一次字段
+STREAM_CHUNK_SIZE = 1000
+
+# 物理表名以参数传入，各批次共用同一语句
+COLUMNS_CYPHER = """
+            MATCH (t:PhysicalTable)-[:HAS_COLUMN]->(c:`Column`)
+            WHERE t.full_table_name IN $names
+            RETURN t.full_table_name AS tn, c"""
 
 class MetadataHelper(BaseMetadataHelper):
-    def _load_columns(self, table:PhysicalTable, graph:BaseGraph):
-        """加载物理表的列信息
+    """
+    Kuzu 元模型查询
+
+    Args:
+        cache: 元模型对象缓存，默认使用进程内共享的缓存
+        results: 查询结果缓存，默认按 settings.yaml 的 result_cache 配置使用进程内共享的缓存
+    """
+    def __init__(self, cache:MetaObjectCache | None = None,
+                 results:QueryResultCache | None = None) -> None:
+        self.cache = cache or get_meta_cache()
+        self.results = results if results is not None else get_result_cache()
+
+    def _load_columns(self, tables:dict[str, list[PhysicalTable]], graph:BaseGraph):
+        """批量加载物理表的列信息
         """
-        cypher = f"""
-            MATCH (t:PhysicalTable {{full_table_name: '{table.full_table_name}'}})-[:HAS_COLUMN]->(c:`Column`) 
-            RETURN c"""
-        columns = graph.query(cypher)
-        table.columns.extend([Column.parse(c['c']) for c in columns])
-    
-    @cachedmethod(lambda _: meta_obj_cache, key=_age_obj_key)
-    def _parse_kuzu2model(self, c:Any, graph:BaseGraph):
-        """将kuzu数据库类型转换为元模型对象
+        names = list(tables)
+        for i in range(0, len(names), COLUMNS_BATCH_SIZE):
+            for r in graph.query(COLUMNS_CYPHER, {"names": names[i:i + COLUMNS_BATCH_SIZE]}):
+                column = Column.parse(r['c'])
+                for table in tables.get(r['tn'], []):
+                    table.columns.append(column)
+
+    def _parse_kuzu2model(self, c:Any, scope:Scope, fresh:dict[tuple, Any]):
+        """将kuzu数据库类型转换为元模型对象，不访问数据库
         
         Args:
-            c: 待转换的AGE数据库对象（顶点或边）
+            c: 待转换的kuzu数据库对象（节点或边）
+            scope: 缓存范围（图标识, 图版本）
+            fresh: 本次查询新解析的对象，字段加载完成后再写入缓存
         Returns:
             Any: 转换后的元模型对象
         """
-        cls = _meta_factories.get(c['_label'], Others)
-        obj = cls.parse(c)
-        if cls is PhysicalTable:
-            self._load_columns(obj, graph)
+        key = _kuzu_obj_key(c)
+        obj = fresh.get(key)
+        if obj is None:
+            obj = self.cache.get(scope, *key)
+        if obj is None:
+            cls = _meta_factories.get(c['_label'], Others)
+            obj = cls.parse(c)
+            fresh[key] = obj
         return obj
 
-    def _traverse_age_result(self,
-                             contents,
-                             metaobj_list:list,
-                             graph:BaseGraph):
-        """遍历kuzu查询结果提取元模型对象
+    def _collect_kuzu_result(self, contents, scope:Scope) -> tuple[list, dict]:
+        """遍历kuzu查询结果提取元模型对象，不访问数据库
         
         Args:
             contents: kuzu查询结果内容
-            resp: DataGovResponse对象，用于存储转换后的元模型对象
+            scope: 缓存范围（图标识, 图版本）
+
+        Returns:
+            tuple: (元模型对象列表, 本次新解析的对象 {缓存键: 对象})
         """
+        fresh: dict[tuple, Any] = {}
+        metaobj_list = []
         for row in contents:
             _row = []
             for cell in row.values():
@@ -83,28 +114,69 @@ class MetadataHelper(BaseMetadataHelper):
                     continue
                 if '_nodes' in cell:
                     for _r in cell['_nodes']:
-                        d = self._parse_kuzu2model(_r, graph)
+                        d = self._parse_kuzu2model(_r, scope, fresh)
                         _row.append(d)
                 if '_rels' in cell:
                     for _r in cell['_rels']:
-                        d = self._parse_kuzu2model(_r, graph)
+                        d = self._parse_kuzu2model(_r, scope, fresh)
                         _row.append(d)
                 elif '_label' in cell:
-                    d = self._parse_kuzu2model(cell, graph)
+                    d = self._parse_kuzu2model(cell, scope, fresh)
                     _row.append(d)
             metaobj_list.append(_row)
-    
-    def query(self, cypher:str, graph:BaseGraph)-> list:
-        """按照Cypher脚本进行AGE元数据查询
+        return metaobj_list, fresh
+
+    def _finish(self, objs:list, fresh:dict, graph:BaseGraph, scope:Scope) -> list:
+        """物理表的字段一次批量加载，写入缓存"""
+        tables: dict[str, list[PhysicalTable]] = {}
+        for obj in fresh.values():
+            if isinstance(obj, PhysicalTable):
+                tables.setdefault(obj.full_table_name, []).append(obj)
+        self._load_columns(tables, graph)
+        for key, obj in fresh.items():
+            self.cache.put(scope, *key, obj)
+        return objs
+
+    def query(self, cypher:str, graph:BaseGraph,
+              params:Mapping[str, Any] | None = None, limit:int | None = None)-> list:
+        """按照Cypher脚本进行AGE元数据查询，结果经查询结果缓存
     
         Args:
             query: Cypher
+            params: Cypher 参数（$name）
+            limit: 返回的行数上限，超出部分不读取
             
         Returns:
             list: 包含查询结果的响应对象
         """
-        result = graph.query(cypher)
+        scope = self.cache.scope(graph)
+        if self.results is None:
+            return self._query(cypher, graph, params, limit, scope)
+        return list(self.results.get_or_load(scope, cypher, cache_params(params, limit),
+                                             lambda: self._query(cypher, graph, params, limit,
+                                                                 scope)))
 
-        collect_metaobjs = []
-        self._traverse_age_result(result, collect_metaobjs, graph)
-        return collect_metaobjs
+    def _query(self, cypher:str, graph:BaseGraph, params:Mapping[str, Any] | None,
+               limit:int | None, scope:Scope)-> list:
+        if limit is None:
+            # 一次取回全部结果
+            objs, fresh = self._collect_kuzu_result(graph.query(cypher, params), scope)
+        else:
+            with closing(graph.iter_query(cypher, params)) as rows: # pyright: ignore[reportArgumentType]
+                objs, fresh = self._collect_kuzu_result(islice(rows, limit), scope)
+        # 结果读取完、连接归还后再加载字段
+        return self._finish(objs, fresh, graph, scope)
+
+    def iter_query(self, cypher:str, graph:BaseGraph,
+                   params:Mapping[str, Any] | None = None,
+                   limit:int | None = None)-> Iterator[list]:
+        """逐行返回元模型对象，不经查询结果缓存
+
+        结果按 STREAM_CHUNK_SIZE 分块转换，每块批量加载一次字段，内存只保留当前块。
+        读取期间占用一个连接，字段在同一连接（session）上加载，不再占用第二个连接。
+        """
+        scope = self.cache.scope(graph)
+        with graph.session(), \
+             closing(graph.iter_query(cypher, params)) as rows: # pyright: ignore[reportArgumentType]
+            for chunk in iter_chunks(islice(rows, limit), STREAM_CHUNK_SIZE):
+                yield from self._finish(*self._collect_kuzu_result(chunk, scope), graph, scope)
@@ -0,0 +1,236 @@
+"""连接池
+AGE 与 Kuzu 连接池共用的有界、线程安全连接池。
+各后端只提供建立、检查、归还时重置连接的函数，等待、扩容、指标统计在这里实现。
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Dict, Generic, Iterator, Tuple, TypeVar
+
+C = TypeVar("C")
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes available within the timeout."""
+
+
+@dataclass
+class PoolStats:
+    """连接池指标"""
+    size: int = 0
+    in_use: int = 0
+    idle: int = 0
+    checkouts: int = 0
+    waits: int = 0
+    wait_time_total: float = 0.0
+    checkout_latency_total: float = 0.0
+    checkout_latency_max: float = 0.0
+    discarded: int = 0
+
+    @property
+    def checkout_latency_avg(self) -> float:
+        """平均获取连接耗时（秒）"""
+        if self.checkouts == 0:
+            return 0.0
+        return self.checkout_latency_total / self.checkouts
+
+    def as_dict(self) -> Dict[str, Any]:
+        """转换为字典，便于日志输出"""
+        return {
+            "size": self.size,
+            "in_use": self.in_use,
+            "idle": self.idle,
+            "checkouts": self.checkouts,
+            "waits": self.waits,
+            "wait_time_total": self.wait_time_total,
+            "checkout_latency_avg": self.checkout_latency_avg,
+            "checkout_latency_max": self.checkout_latency_max,
+            "discarded": self.discarded,
+        }
+
+
+def _close(conn: Any) -> None:
+    try:
+        conn.close()
+    except Exception: # pylint: disable=broad-except
+        pass
+
+
+class ConnectionPool(Generic[C]):
+    """
+    连接池
+
+    Args:
+        connect: 建立新连接
+        validate: 取出空闲连接时调用，参数为连接和空闲时长（秒），返回 False 时丢弃并重新建立
+        reset: 归还时调用，返回 False 时丢弃该连接
+        close: 关闭连接
+        min_size (int): 预先建立的连接数
+        max_size (int): 最大连接数
+        timeout (float): 等待空闲连接的超时时间（秒）
+    """
+    timeout_error: type[PoolTimeout] = PoolTimeout
+
+    def __init__(
+        self,
+        connect: Callable[[], C],
+        validate: Callable[[C, float], bool] | None = None,
+        reset: Callable[[C], bool] | None = None,
+        close: Callable[[C], None] = _close,
+        min_size: int = 0,
+        max_size: int = 10,
+        timeout: float = 30.0,
+    ) -> None:
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError(f"Invalid pool size: min_size={min_size}, max_size={max_size}")
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self._connect_fn = connect
+        self._validate_fn = validate
+        self._reset_fn = reset
+        self._close_fn = close
+
+        self._cond = threading.Condition()
+        # (connection, 归还时间)
+        self._idle: Deque[Tuple[C, float]] = deque()
+        self._size = 0
+        self._closed = False
+        self._stats = PoolStats()
+        # pinned() 期间当前线程固定使用的连接
+        self._local = threading.local()
+
+        for _ in range(min_size):
+            self._idle.append((connect(), time.monotonic()))
+            self._size += 1
+
+    def _acquire(self) -> C:
+        start = time.monotonic()
+        deadline = start + self.timeout
+        waited = False
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise self.timeout_error("Connection pool is closed")
+                if self._idle:
+                    conn, released_at = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    # 预占名额，在锁外建立连接
+                    self._size += 1
+                    conn, released_at = None, None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats.wait_time_total += time.monotonic() - start
+                    raise self.timeout_error(
+                        f"No connection available after {self.timeout}s (max_size={self.max_size})")
+                if not waited:
+                    waited = True
+                    self._stats.waits += 1
+                self._cond.wait(remaining)
+            if waited:
+                self._stats.wait_time_total += time.monotonic() - start
+
+        try:
+            if conn is None:
+                conn = self._connect_fn()
+            elif self._validate_fn is not None \
+                    and not self._validate_fn(conn, time.monotonic() - released_at): # pyright: ignore[reportOperatorIssue]
+                self._close_fn(conn)
+                with self._cond:
+                    self._stats.discarded += 1
+                conn = self._connect_fn()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+        latency = time.monotonic() - start
+        with self._cond:
+            self._stats.checkouts += 1
+            self._stats.in_use += 1
+            self._stats.checkout_latency_total += latency
+            self._stats.checkout_latency_max = max(self._stats.checkout_latency_max, latency)
+        return conn
+
+    def _release(self, conn: C) -> None:
+        reusable = self._reset_fn is None or self._reset_fn(conn)
+        with self._cond:
+            self._stats.in_use -= 1
+            if reusable and not self._closed:
+                self._idle.append((conn, time.monotonic()))
+            else:
+                self._size -= 1
+                self._stats.discarded += 1
+                self._close_fn(conn)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self) -> Iterator[C]:
+        """
+        取出一个连接，退出上下文时自动归还；当前线程处于 pinned() 中时返回固定的连接
+
+        Example:
+            with pool.connection() as conn:
+                ...
+        """
+        pinned = getattr(self._local, "conn", None)
+        if pinned is not None:
+            yield pinned
+            return
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            self._release(conn)
+
+    @contextmanager
+    def pinned(self) -> Iterator[C]:
+        """
+        上下文内当前线程的 connection() 都返回同一个连接，退出时才归还
+        用于流式读取期间在同一连接上执行其他查询，不必再占用一个连接
+        """
+        if getattr(self._local, "conn", None) is not None:
+            yield self._local.conn
+            return
+        with self.connection() as conn:
+            self._local.conn = conn
+            try:
+                yield conn
+            finally:
+                self._local.conn = None
+
+    def is_pinned(self, conn: C) -> bool:
+        """conn 是否为当前线程 pinned() 中固定的连接"""
+        return getattr(self._local, "conn", None) is conn
+
+    def stats(self) -> PoolStats:
+        """获取连接池指标快照"""
+        with self._cond:
+            return PoolStats(
+                size=self._size,
+                in_use=self._stats.in_use,
+                idle=len(self._idle),
+                checkouts=self._stats.checkouts,
+                waits=self._stats.waits,
+                wait_time_total=self._stats.wait_time_total,
+                checkout_latency_total=self._stats.checkout_latency_total,
+                checkout_latency_max=self._stats.checkout_latency_max,
+                discarded=self._stats.discarded,
+            )
+
+    def close(self) -> None:
+        """关闭连接池中所有空闲连接，使用中的连接在归还时关闭"""
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                conn, _ = self._idle.pop()
+                self._size -= 1
+                self._close_fn(conn)
+            self._cond.notify_all()
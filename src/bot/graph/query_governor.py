@@ -0,0 +1,274 @@
+"""Cypher 结果规模控制
+Agent 和 MCP 的 cypher_query 工具执行 LLM 编写的任意 MATCH，不加限制时整个结果会序列化进模型上下文。
+QueryGovernor 为查询追加 SKIP/LIMIT，每次只返回一页结果和继续读取下一页的游标：
+
+- 末尾已有整数 SKIP/LIMIT 的查询在其范围内分页，无法改写的查询（UNION、参数形式的 LIMIT 等）
+  由 MetadataHelper 的 limit 只读取到当前页为止；
+- 首页先通过 EXPLAIN 估计结果行数（AGE 取查询计划顶层节点的 rows，Kuzu 的计划不含估计），
+  估计值只作为提示随首页返回：AGE 的label表缺少统计信息时给出 1000 行之类的默认估计，
+  实际返回的行数始终由 SKIP/LIMIT 和页大小限制；
+- 页大小、累计行数上限、估计行数上限按工具（agent / mcp）和后端（age / kuzu）分别配置：
+
+    governor:
+      age:
+        max_estimated_rows: 100000
+      agent:
+        page_size: 50
+        kuzu:
+          page_size: 20
+
+未排序的查询依赖数据库的扫描顺序分页，图数据不变时各页结果不重叠。
+"""
+from __future__ import annotations
+
+import base64
+import binascii
+import hashlib
+import json
+import re
+from dataclasses import dataclass, fields, replace
+from typing import Any, Dict, Generic, List, Mapping, Tuple, TypeVar
+
+import logfire
+
+from bot.settings import settings
+
+from .base_graph import AsyncBaseGraph, AsyncMetadataHelper, BaseGraph, BaseMetadataHelper
+from .result_cache import normalize_cypher, params_key
+
+
+@dataclass(frozen=True)
+class GovernorLimits:
+    """
+    结果规模限制
+
+    Args:
+        page_size (int): 每页返回的行数
+        max_rows (int): 通过游标累计可读取的行数上限
+        max_estimated_rows: EXPLAIN 估计的行数超过时记录警告，None 表示不检查
+    """
+    page_size: int = 100
+    max_rows: int = 1000
+    max_estimated_rows: int | None = 100000
+
+
+# 各工具的默认限制，settings.yaml 的 governor 配置在此基础上覆盖
+DEFAULT_LIMITS: Dict[str, GovernorLimits] = {
+    "agent": GovernorLimits(page_size=50, max_rows=500),
+    "mcp": GovernorLimits(page_size=200, max_rows=2000),
+}
+
+
+def limits_for(tool: str, backend: str) -> GovernorLimits:
+    """
+    按工具和后端读取限制，优先级从低到高：
+    默认值、governor、governor.<backend>、governor.<tool>、governor.<tool>.<backend>
+    """
+    limits = DEFAULT_LIMITS.get(tool, GovernorLimits())
+    names = {f.name for f in fields(GovernorLimits)}
+    for key in ("governor", f"governor.{backend}", f"governor.{tool}", f"governor.{tool}.{backend}"):
+        section = settings.get_value(key)
+        if isinstance(section, dict):
+            limits = replace(limits, **{k: v for k, v in section.items() if k in names})
+    return limits
+
+
+class QueryGovernorError(Exception):
+    """查询不满足结果规模限制，消息返回给模型以便修改查询"""
+
+
+class InvalidCursor(QueryGovernorError):
+    """游标无法解析或不属于当前查询"""
+
+
+# 字符串字面量（单引号、双引号、反引号）及注释，改写时不检查其中的关键字
+_LITERAL = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"|`[^`]*`|//[^\n]*|/\*.*?\*/", re.S)
+# 末尾的整数 SKIP / LIMIT
+_TAIL = re.compile(r"(?:\s+SKIP\s+(\d+))?(?:\s+LIMIT\s+(\d+))?\s*$", re.I)
+_RETURN = re.compile(r"\bRETURN\b", re.I)
+_UNION = re.compile(r"\bUNION\b", re.I)
+_PAGING = re.compile(r"\b(?:SKIP|LIMIT)\b", re.I)
+
+
+def _mask(cypher: str) -> str:
+    """将字面量和注释替换为等长的占位，关键字位置不变"""
+    return _LITERAL.sub(lambda m: "_" * len(m.group(0)), cypher)
+
+
+def paginate(cypher: str, offset: int, size: int) -> Tuple[str, int] | None:
+    """
+    改写 Cypher，读取第 offset 行起的 size 行
+
+    Returns:
+        Tuple[str, int] | None: (改写后的 Cypher, 读取的行数)，读取的行数为 0 时已无结果；
+            无法安全改写时返回 None
+    """
+    cypher = cypher.strip().rstrip(";").rstrip()
+    masked = _mask(cypher)
+    returns = list(_RETURN.finditer(masked))
+    if not returns or _UNION.search(masked):
+        return None
+    tail = _TAIL.search(masked)
+    assert tail is not None
+    # LIMIT/SKIP 为参数或表达式时无法合并
+    if _PAGING.search(masked, returns[-1].end(), tail.start()):
+        return None
+    skip = int(tail.group(1) or 0) + offset
+    take = size
+    if tail.group(2) is not None:
+        take = max(0, min(size, int(tail.group(2)) - offset))
+    # 换行追加，末尾的 // 注释不会吞掉新增的子句
+    head = cypher[:tail.start()]
+    if skip:
+        head += f"\nSKIP {skip}"
+    return f"{head}\nLIMIT {take}", take
+
+
+def _digest(cypher: str, params: Mapping[str, Any] | None) -> str:
+    text = normalize_cypher(cypher) + "\0" + params_key(params)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+def encode_cursor(cypher: str, params: Mapping[str, Any] | None, offset: int) -> str:
+    """下一页的游标，绑定查询语句和参数"""
+    data = json.dumps({"q": _digest(cypher, params), "o": offset}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(data.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, cypher: str, params: Mapping[str, Any] | None) -> int:
+    """
+    解析游标
+
+    Returns:
+        int: 下一页的起始行
+
+    Raises:
+        InvalidCursor: 游标无法解析，或不是由同一查询生成
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        digest, offset = data["q"], int(data["o"])
+    except (ValueError, TypeError, KeyError, UnicodeError, binascii.Error) as e:
+        raise InvalidCursor("游标无效，请去掉 cursor 重新查询。") from e
+    if digest != _digest(cypher, params) or offset < 0:
+        raise InvalidCursor("游标与查询不匹配，读取下一页时请使用与上一页相同的 Cypher。")
+    return offset
+
+
+@dataclass
+class QueryPage:
+    """一页查询结果"""
+    rows: List[list]
+    # 读取下一页的游标，没有更多可读取的结果时为 None
+    next_cursor: str | None = None
+    # 还有结果未返回（包括超过累计行数上限无法继续读取的部分）
+    truncated: bool = False
+    # EXPLAIN 估计的总行数，只在首页提供，仅供参考
+    estimated_rows: int | None = None
+
+
+H = TypeVar("H", bound=BaseMetadataHelper)
+A = TypeVar("A", bound=AsyncMetadataHelper)
+
+
+class QueryGovernor(Generic[H]):
+    """
+    分页执行 Cypher，控制返回给模型的结果规模
+
+    Args:
+        helper: 元模型查询，apage 需要支持异步图的 AsyncMetadataHelper
+        tool (str): 工具名称，用于选择限制配置
+
+    Example:
+        governor = QueryGovernor(metadata_helper, "agent")
+        page = await governor.apage(cypher, graph, cursor)
+    """
+
+    def __init__(self, helper: H, tool: str) -> None:
+        self.helper = helper
+        self.tool = tool
+
+    def limits(self, graph: BaseGraph | AsyncBaseGraph) -> GovernorLimits:
+        """当前图对应的限制"""
+        return limits_for(self.tool, graph.backend)
+
+    def _plan(self, cypher: str, params: Mapping[str, Any] | None, cursor: str | None,
+              limits: GovernorLimits) -> Tuple[int, int, Tuple[str, int] | None]:
+        """(起始行, 本页行数, 改写结果)"""
+        offset = 0 if cursor is None else decode_cursor(cursor, cypher, params)
+        size = max(0, min(limits.page_size, limits.max_rows - offset))
+        # 多读一行判断是否还有下一页
+        return offset, size, paginate(cypher, offset, size + 1)
+
+    def _check_estimate(self, estimated: int | None, limits: GovernorLimits) -> None:
+        # 估计值可能是默认值，不据此拒绝查询
+        if estimated is not None and limits.max_estimated_rows is not None \
+                and estimated > limits.max_estimated_rows:
+            logfire.warn("Query estimated {estimated} rows, over {limit}: {tool}",
+                         estimated=estimated, limit=limits.max_estimated_rows, tool=self.tool)
+
+    def _make_page(self, rows: list, cypher: str, params: Mapping[str, Any] | None,
+                   offset: int, size: int, limits: GovernorLimits,
+                   estimated: int | None) -> QueryPage:
+        more = len(rows) > size
+        page = QueryPage(rows[:size], truncated=more, estimated_rows=estimated)
+        if more and offset + size < limits.max_rows:
+            page.next_cursor = encode_cursor(cypher, params, offset + size)
+        if more:
+            logfire.info("Query paged: {tool} rows {start}-{end}, more={cursor}", tool=self.tool,
+                         start=offset, end=offset + size, cursor=page.next_cursor is not None)
+        return page
+
+    def page(self, cypher: str, graph: BaseGraph, cursor: str | None = None,
+             params: Mapping[str, Any] | None = None) -> QueryPage:
+        """
+        读取一页结果
+
+        Args:
+            cypher: Cypher，分页读取时每页须相同
+            cursor: 上一页返回的 next_cursor，None 时读取首页
+            params: Cypher 参数
+
+        Raises:
+            InvalidCursor: 游标无效
+        """
+        limits = self.limits(graph)
+        offset, size, paged = self._plan(cypher, params, cursor, limits)
+        estimated = None
+        if cursor is None:
+            try:
+                estimated = graph.estimate_rows(cypher, params)
+            except Exception as e: # pylint: disable=broad-except
+                logfire.warn("EXPLAIN failed: {error}", error=str(e))
+            self._check_estimate(estimated, limits)
+        if paged is None:
+            # 无法改写时顺序读取到本页末尾
+            rows = self.helper.query(cypher, graph, params, limit=offset + size + 1)[offset:]
+        elif paged[1] == 0:
+            rows = []
+        else:
+            rows = self.helper.query(paged[0], graph, params, limit=paged[1])
+        return self._make_page(rows, cypher, params, offset, size, limits, estimated)
+
+    async def apage(self: QueryGovernor[A], cypher: str, graph: AsyncBaseGraph,
+                    cursor: str | None = None,
+                    params: Mapping[str, Any] | None = None) -> QueryPage:
+        """page 的异步版本"""
+        limits = self.limits(graph)
+        offset, size, paged = self._plan(cypher, params, cursor, limits)
+        estimated = None
+        if cursor is None:
+            try:
+                estimated = await graph.estimate_rows(cypher, params)
+            except Exception as e: # pylint: disable=broad-except
+                logfire.warn("EXPLAIN failed: {error}", error=str(e))
+            self._check_estimate(estimated, limits)
+        if paged is None:
+            rows = (await self.helper.aquery(cypher, graph, params,
+                                             limit=offset + size + 1))[offset:]
+        elif paged[1] == 0:
+            rows = []
+        else:
+            rows = await self.helper.aquery(paged[0], graph, params, limit=paged[1])
+        return self._make_page(rows, cypher, params, offset, size, limits, estimated)
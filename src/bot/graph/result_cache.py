@@ -0,0 +1,271 @@
+"""Cypher 查询结果缓存
+MetadataHelper 的查询结果按 (图标识, 图版本, 规范化的 Cypher, 参数) 缓存。
+图版本与元模型对象缓存共用（见 meta_cache），make_graph 导入脚本提交后版本变化，旧结果随即失效。
+同一时刻相同的查询只执行一次，其余调用方等待并共用结果（single-flight）。
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import re
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple, TypeVar
+
+import logfire
+from cachetools import LRUCache, TTLCache
+
+from bot.settings import settings
+
+from .meta_cache import Scope
+
+T = TypeVar("T")
+
+DEFAULT_MAX_ENTRIES = 1024
+
+# 字符串字面量（单引号、双引号、反引号），规范化时原样保留
+_LITERAL = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"|`[^`]*`", re.S)
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_cypher(cypher: str) -> str:
+    """合并字面量之外的空白，去掉末尾分号"""
+    parts = []
+    last = 0
+    for m in _LITERAL.finditer(cypher):
+        parts.append(_SPACES.sub(" ", cypher[last:m.start()]))
+        parts.append(m.group(0))
+        last = m.end()
+    parts.append(_SPACES.sub(" ", cypher[last:]))
+    return "".join(parts).strip().rstrip(";").rstrip()
+
+
+def cache_params(params: Any, limit: int | None = None) -> Any:
+    """缓存键中的参数部分，限定行数时一并区分"""
+    return params if limit is None else [params, limit]
+
+
+def params_key(params: Any) -> str:
+    """参数的稳定表示"""
+    if params is None:
+        return ""
+    return json.dumps(params, sort_keys=True, ensure_ascii=False, default=str)
+
+
+@dataclass
+class ResultCacheStats:
+    """缓存指标"""
+    entries: int = 0
+    hits: int = 0
+    misses: int = 0
+    # 等待同一查询的在途结果
+    coalesced: int = 0
+    evictions: int = 0
+    invalidations: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        """命中率（等待在途结果也算命中）"""
+        total = self.hits + self.coalesced + self.misses
+        return (self.hits + self.coalesced) / total if total else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        """转换为字典，便于日志输出"""
+        return {
+            "entries": self.entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": self.hit_rate,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+def _counting(base: type, stats: ResultCacheStats) -> type:
+    """统计容量淘汰次数的缓存类（TTL 过期不计入）"""
+    class _Cache(base):
+        def popitem(self):
+            item = super().popitem()
+            stats.evictions += 1
+            return item
+    return _Cache
+
+
+class QueryResultCache:
+    """
+    查询结果缓存，线程安全
+
+    Args:
+        max_entries (int): 缓存的查询数上限，超出后按 LRU 淘汰
+        ttl: 结果的存活时间（秒），None 表示只随图版本失效
+        log_every (int): 每查询多少次通过 logfire 输出一次指标，0 表示不输出
+
+    Example:
+        rows = cache.get_or_load(scope, cypher, None, lambda: graph.query(cypher))
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl: float | None = None,
+                 log_every: int = 1000) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.log_every = log_every
+        self._lock = threading.Lock()
+        self._stats = ResultCacheStats()
+        self._data = self._new_data()
+        # 图标识 -> 最近一次看到的图版本
+        self._versions: Dict[str, str] = {}
+        self._inflight: Dict[Hashable, Future] = {}
+        self._ainflight: Dict[Hashable, asyncio.Future] = {}
+
+    def _new_data(self):
+        if self.ttl is None:
+            return _counting(LRUCache, self._stats)(maxsize=self.max_entries)
+        return _counting(TTLCache, self._stats)(maxsize=self.max_entries, ttl=self.ttl)
+
+    def key(self, scope: Scope, cypher: str, params: Any = None) -> Tuple[str, str, str, str]:
+        """缓存键"""
+        return (*scope, normalize_cypher(cypher), params_key(params))
+
+    def _lookup(self, key: Tuple[str, ...]) -> Tuple[bool, Any]:
+        """在锁内调用；图版本变化时先丢弃该图的旧结果"""
+        graph_key, version = key[0], key[1]
+        known = self._versions.get(graph_key)
+        if known != version:
+            if known is not None:
+                self._drop(graph_key)
+                logfire.info("Result cache invalidated: {graph} version changed", graph=graph_key)
+            self._versions[graph_key] = version
+        try:
+            return True, self._data[key]
+        except KeyError:
+            return False, None
+
+    def _record(self, counter: str) -> None:
+        """在锁内调用"""
+        setattr(self._stats, counter, getattr(self._stats, counter) + 1)
+        total = self._stats.hits + self._stats.coalesced + self._stats.misses
+        if self.log_every and total % self.log_every == 0:
+            logfire.info("Result cache stats: {stats}", stats=self._snapshot().as_dict())
+
+    def _store(self, key: Tuple[str, ...], value: Any) -> None:
+        """在锁内调用；结果生成期间图版本已变化时不缓存"""
+        if self._versions.get(key[0]) == key[1]:
+            self._data[key] = value
+
+    def get_or_load(self, scope: Scope, cypher: str, params: Any,
+                    loader: Callable[[], T]) -> T:
+        """读取缓存，未命中时调用 loader，同时到达的相同查询只执行一次"""
+        key = self.key(scope, cypher, params)
+        with self._lock:
+            found, value = self._lookup(key)
+            if found:
+                self._record("hits")
+                return value
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+                self._record("misses")
+            else:
+                self._record("coalesced")
+        if not owner:
+            return future.result() # pyright: ignore[reportOptionalMemberAccess]
+        try:
+            value = loader()
+        except BaseException as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+            future.set_exception(e) # pyright: ignore[reportOptionalMemberAccess]
+            raise
+        with self._lock:
+            self._inflight.pop(key, None)
+            self._store(key, value)
+        future.set_result(value) # pyright: ignore[reportOptionalMemberAccess]
+        return value
+
+    async def aget_or_load(self, scope: Scope, cypher: str, params: Any,
+                           loader: Callable[[], Awaitable[T]]) -> T:
+        """get_or_load 的异步版本，single-flight 限于同一个事件循环"""
+        key = self.key(scope, cypher, params)
+        with self._lock:
+            found, value = self._lookup(key)
+            if found:
+                self._record("hits")
+                return value
+            future = self._ainflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._ainflight[key] = asyncio.get_running_loop().create_future()
+                self._record("misses")
+            else:
+                self._record("coalesced")
+        if not owner:
+            # shield: 等待方被取消时不影响在途查询
+            return await asyncio.shield(future) # pyright: ignore[reportArgumentType]
+        try:
+            value = await loader()
+        except BaseException as e:
+            with self._lock:
+                self._ainflight.pop(key, None)
+            future.set_exception(e) # pyright: ignore[reportOptionalMemberAccess]
+            # 没有等待方时避免 "exception was never retrieved" 警告
+            future.exception() # pyright: ignore[reportOptionalMemberAccess]
+            raise
+        with self._lock:
+            self._ainflight.pop(key, None)
+            self._store(key, value)
+        future.set_result(value) # pyright: ignore[reportOptionalMemberAccess]
+        return value
+
+    def _drop(self, graph_key: str) -> None:
+        for key in [k for k in self._data if k[0] == graph_key]:
+            self._data.pop(key, None)
+        self._stats.invalidations += 1
+
+    def invalidate(self, graph_key: str | None = None) -> None:
+        """丢弃指定图（None 时为全部）的缓存结果"""
+        with self._lock:
+            if graph_key is None:
+                self._data = self._new_data()
+                self._versions.clear()
+                self._stats.invalidations += 1
+            else:
+                self._versions.pop(graph_key, None)
+                self._drop(graph_key)
+
+    def _snapshot(self) -> ResultCacheStats:
+        return ResultCacheStats(
+            entries=len(self._data),
+            hits=self._stats.hits,
+            misses=self._stats.misses,
+            coalesced=self._stats.coalesced,
+            evictions=self._stats.evictions,
+            invalidations=self._stats.invalidations,
+        )
+
+    def stats(self) -> ResultCacheStats:
+        """获取缓存指标快照"""
+        with self._lock:
+            return self._snapshot()
+
+    def log_stats(self) -> None:
+        """通过 logfire 输出缓存指标"""
+        logfire.info("Result cache stats: {stats}", stats=self.stats().as_dict())
+
+
+_default_cache: QueryResultCache | None = None
+
+
+def get_result_cache() -> QueryResultCache | None:
+    """按 settings.yaml 的 result_cache 配置获取进程内共享的缓存实例，未启用时返回 None"""
+    global _default_cache # pylint: disable=global-statement
+    if not settings.get_value("result_cache.enabled", True):
+        return None
+    if _default_cache is None:
+        _default_cache = QueryResultCache(
+            max_entries=settings.get_value("result_cache.max_entries", DEFAULT_MAX_ENTRIES),
+            ttl=settings.get_value("result_cache.ttl", None),
+            log_every=settings.get_value("result_cache.log_every", 1000))
+    return _default_cache
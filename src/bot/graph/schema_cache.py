@@ -0,0 +1,147 @@
+"""图谱结构缓存
+将 refresh_schema 生成的 schema 文本按 (图标识, 变更指纹) 持久化到本地磁盘，
+聊天服务、MCP 服务和测试进程启动时直接加载，指纹变化时才重新探查数据库。
+make_graph 的导入脚本在导入完成后调用 invalidate() 使缓存失效，
+同时更新该图的代次标记，其他进程中的元模型对象缓存和查询结果缓存据此立即失效。
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Iterable
+
+import logfire
+
+from bot.settings import settings
+
+# schema 文本格式变化时递增，旧缓存自动失效
+SCHEMA_CACHE_VERSION = 1
+
+DEFAULT_CACHE_DIR = Path.home() / ".cache" / "dg_agent" / "schema"
+
+
+def make_fingerprint(rows: Iterable[Any]) -> str:
+    """将探查得到的行（label、计数等）摘要为指纹"""
+    h = hashlib.sha256()
+    for row in rows:
+        h.update(repr(tuple(row)).encode("utf-8"))
+        h.update(b"\n")
+    return h.hexdigest()
+
+
+def make_key(*parts: str) -> str:
+    """生成可作为文件名的缓存键"""
+    name = parts[0]
+    digest = hashlib.sha1("\x00".join(parts).encode("utf-8")).hexdigest()[:12]
+    safe = "".join(c if c.isalnum() or c in "-_" else "_" for c in name)
+    return f"{safe}-{digest}"
+
+
+def age_schema_key(graph_name: str, dsn: str) -> str:
+    """AGE 图的缓存键"""
+    return make_key(f"age-{graph_name}", dsn)
+
+
+def kuzu_schema_key(db_path: str | Path) -> str:
+    """Kuzu 数据库的缓存键"""
+    return make_key("kuzu", str(Path(db_path).resolve()))
+
+
+class SchemaCache:
+    """
+    schema 磁盘缓存，多进程共享（原子替换写入）
+
+    Args:
+        directory: 缓存目录
+        enabled: 为 False 时 load 总是未命中、save 不落盘
+    """
+
+    def __init__(self, directory: str | Path | None = None, enabled: bool = True) -> None:
+        self.directory = Path(directory) if directory else DEFAULT_CACHE_DIR
+        self.enabled = enabled
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    def _generation_path(self, key: str) -> Path:
+        return self.directory / f"{key}.generation"
+
+    def generation(self, key: str) -> str:
+        """图的代次标记，invalidate 后变化；不受 enabled 影响"""
+        try:
+            return self._generation_path(key).read_text(encoding="utf-8")
+        except OSError:
+            return ""
+
+    def _bump_generation(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(str(time.time_ns()), encoding="utf-8")
+
+    def load(self, key: str, fingerprint: str) -> str | None:
+        """读取缓存，版本或指纹不一致时返回 None"""
+        if not self.enabled:
+            return None
+        try:
+            with self._path(key).open("r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get("version") != SCHEMA_CACHE_VERSION \
+                or data.get("fingerprint") != fingerprint:
+            return None
+        logfire.info("Schema cache hit: {key}", key=key)
+        return data.get("schema")
+
+    def save(self, key: str, fingerprint: str, schema: str) -> None:
+        """写入缓存"""
+        if not self.enabled:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        data = {
+            "version": SCHEMA_CACHE_VERSION,
+            "key": key,
+            "fingerprint": fingerprint,
+            "created_at": time.time(),
+            "schema": schema,
+        }
+        # 先写临时文件再替换，其他进程不会读到写了一半的文件
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=f".{key}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp, self._path(key))
+        except OSError:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+
+    def invalidate(self, key: str | None = None) -> None:
+        """删除指定键的缓存，key 为 None 时清空全部"""
+        if key is not None:
+            self._path(key).unlink(missing_ok=True)
+            self._bump_generation(self._generation_path(key))
+            logfire.info("Schema cache invalidated: {key}", key=key)
+            return
+        if self.directory.exists():
+            for p in self.directory.glob("*.json"):
+                p.unlink(missing_ok=True)
+            for p in self.directory.glob("*.generation"):
+                self._bump_generation(p)
+        logfire.info("Schema cache cleared: {dir}", dir=str(self.directory))
+
+
+_default_cache: SchemaCache | None = None
+
+
+def get_schema_cache() -> SchemaCache:
+    """按 settings.yaml 的 schema_cache 配置获取进程内共享的缓存实例"""
+    global _default_cache # pylint: disable=global-statement
+    if _default_cache is None:
+        _default_cache = SchemaCache(
+            directory=settings.get_value("schema_cache.directory"),
+            enabled=settings.get_value("schema_cache.enabled", True))
+    return _default_cache
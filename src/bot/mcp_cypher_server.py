@@ -20,11 +20,12 @@ MCP_DIR = Path(__file__).parent.parent
 sys.path.append(str(MCP_DIR))
 
 try:
-    from bot.agent import DataGovResponse, CypherQuery
-    from bot.graph.age_graph import AGEGraph
+    from bot.agent import DataGovResponse, CypherQuery, page_response
+    from bot.graph.async_age_graph import AsyncAGEGraph
     # from bot.graph.kuzu_graph import KuzuGraph
     from bot.graph.ontology.age import MetadataHelper
     # from bot.graph.ontology.kuzu import MetadataHelper
+    from bot.graph.query_governor import QueryGovernor, QueryGovernorError
     from bot.settings import Settings
 finally:
     pass
@@ -38,20 +39,30 @@ class MCPRetry(Exception):
     """Retry exception"""
 
 @asynccontextmanager
-async def app_lifespan(_server: Server) -> AsyncIterator[Dict[str, AGEGraph]]:
+async def app_lifespan(_server: Server) -> AsyncIterator[Dict[str, AsyncAGEGraph]]:
     """Manage application lifecycle with type-safe context"""
     # 资源初始化
     # _metadata_graph = \
     #     KuzuGraph(settings.get_setting("kuzu.database"))
     _metadata_graph = \
-        AGEGraph(settings.get_setting("age.graph"),
-                 settings.get_setting("age.dsn"))
-    yield {'metadata_graph': _metadata_graph}
+        AsyncAGEGraph(settings.get_setting("age.graph"),
+                      settings.get_setting("age.dsn"),
+                      pool_min_size=settings.get_value("age.pool.min_size", 1),
+                      pool_max_size=settings.get_value("age.pool.max_size", 10),
+                      pool_timeout=settings.get_value("age.pool.timeout", 30.0),
+                      prepare=settings.get_value("age.pool.prepare", True),
+                      itersize=settings.get_value("age.itersize", 2000))
+    await _metadata_graph.open()
+    try:
+        yield {'metadata_graph': _metadata_graph}
+    finally:
+        await _metadata_graph.close()
 
 # Pass lifespan to server
 sse = SseServerTransport("/messages/")
 server = Server("data_governance", lifespan=app_lifespan)
 metadata_helper : MetadataHelper = MetadataHelper()
+governor = QueryGovernor(metadata_helper, "mcp")
 
 def _wrap_cypher(cypher: str) -> str:
     c = cypher.replace("\\n", "\n")
@@ -76,6 +87,8 @@ f"""业务域、应用、数据实体、物理表、业务术语信息查询工
                 "properties": {
                     "cypher": {"type": "string", "description": "Cypher query"},
                     "explanation": {"type": "string", "description": "查询的解释，以 Markdown 格式呈现'"},
+                    "cursor": {"type": "string",
+                               "description": "读取下一页时填入上一页结果的 next_cursor，Cypher 保持不变"},
                 },
                 "required": ["cypher", "explanation"]
             }
@@ -86,12 +99,13 @@ f"""业务域、应用、数据实体、物理表、业务术语信息查询工
 async def call_tool(name: str, arguments: dict) -> list[types.TextContent | types.EmbeddedResource]:
     """Call tool"""
     if name == "cypher_query":
-        resp = cypher_query(CypherQuery(cypher=arguments["cypher"],
-                                        explanation=arguments["explanation"]))
+        resp = await cypher_query(CypherQuery(cypher=arguments["cypher"],
+                                        explanation=arguments["explanation"],
+                                        cursor=arguments.get("cursor")))
         return [types.TextContent(type="text", text=str(resp))]
     raise MCPRetry(f"Unknown tool name: {name}")
 
-def cypher_query(query: CypherQuery) -> DataGovResponse:
+async def cypher_query(query: CypherQuery) -> DataGovResponse:
     """Do cypher query       
     Args:
         query: cypher and explanation from agent to execute
@@ -104,18 +118,16 @@ def cypher_query(query: CypherQuery) -> DataGovResponse:
 
     try:
         _wraped_cypher = _wrap_cypher(query.cypher)
-        contents = metadata_helper.query(_wraped_cypher, _graph)
+        page = await governor.apage(_wraped_cypher, _graph, query.cursor)
+    except QueryGovernorError as e:
+        logfire.warn('查询被拒绝: {e}', e=e)
+        raise MCPRetry(str(e)) from e
     except Exception as e:
         logfire.warn('错误查询: {e}', e=e)
         logfire.warn('Cypher {q}', q=query.cypher)
         raise e
 
-    result : DataGovResponse = {
-        "contents":contents,
-        "description": query.explanation
-    }
-
-    return result
+    return page_response(page, query.explanation)
 
 async def handle_sse(request):
     # 定义异步函数handle_sse，处理SSE请求
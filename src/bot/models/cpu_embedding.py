@@ -0,0 +1,81 @@
+"""CPU 向量化后端
+直接用 transformers 加载 GTE 模型（modelscope 下载的目录与 BERT 格式兼容），
+可选 torch 动态 int8 量化；按文本长度分桶填充，短文本不再统一填充到 512。
+"""
+from __future__ import annotations
+
+from typing import List, Sequence
+
+import torch
+from transformers import AutoModel, AutoTokenizer
+
+# 填充长度的分桶
+BUCKETS = (32, 64, 128, 256, 512)
+
+
+class CPUEmbedder:
+    """
+    CPU 向量化
+
+    Args:
+        model_dir (str): 模型目录
+        max_length (int): 最大 token 数，超出截断
+        quantize (bool): 是否对 Linear 层做动态 int8 量化
+        normalize (bool): 是否对向量做 L2 归一化
+        batch_size (int): 单次前向的最大文本数
+        num_threads (int): torch 计算线程数，0 表示不修改
+    """
+
+    def __init__(self, model_dir: str, max_length: int = 512, quantize: bool = True,
+                 normalize: bool = True, batch_size: int = 32, num_threads: int = 0) -> None:
+        if num_threads > 0:
+            torch.set_num_threads(num_threads)
+        self.max_length = max_length
+        self.normalize = normalize
+        self.batch_size = batch_size
+        self.buckets = tuple(b for b in BUCKETS if b < max_length) + (max_length,)
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        model = AutoModel.from_pretrained(model_dir).eval()
+        if quantize:
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        self.model = model
+
+    def bucket(self, length: int) -> int:
+        """不小于 length 的最小分桶"""
+        for b in self.buckets:
+            if length <= b:
+                return b
+        return self.max_length
+
+    def _forward(self, texts: List[str], length: int) -> torch.Tensor:
+        encoded = self.tokenizer(texts, padding="max_length", truncation=True,
+                                 max_length=length, return_tensors="pt")
+        with torch.inference_mode():
+            # GTE 取 [CLS] 位置的向量
+            vectors = self.model(**encoded).last_hidden_state[:, 0]
+        if self.normalize:
+            vectors = torch.nn.functional.normalize(vectors, p=2, dim=1)
+        return vectors
+
+    def __call__(self, texts: Sequence[str]) -> List[List[float]]:
+        texts = list(texts)
+        if not texts:
+            return []
+        lengths = [len(ids) for ids in self.tokenizer(
+            texts, truncation=True, max_length=self.max_length)["input_ids"]]
+        # 按长度排序后分组，同一组使用同一个分桶长度
+        order = sorted(range(len(texts)), key=lambda i: lengths[i])
+        result: List[List[float]] = [[] for _ in texts]
+        start = 0
+        while start < len(order):
+            bucket = self.bucket(lengths[order[start]])
+            end = start
+            while end < len(order) and end - start < self.batch_size \
+                    and self.bucket(lengths[order[end]]) == bucket:
+                end += 1
+            group = order[start:end]
+            vectors = self._forward([texts[i] for i in group], bucket).tolist()
+            for i, vec in zip(group, vectors):
+                result[i] = vec
+            start = end
+        return result
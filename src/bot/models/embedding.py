@@ -1,18 +1,166 @@
-from modelscope.models import Model
-from modelscope.pipelines import pipeline
-from modelscope.utils.constant import Tasks
+"""GTE 向量化
+模型在第一次使用时加载（导入本模块不会加载 torch / modelscope），
+服务启动时可调用 warm_up() 在后台预先加载。
+
+推理后端由 settings.yaml 的 embedding.backend 选择：
+- modelscope: modelscope sentence_embedding pipeline（默认）
+- torch: transformers 直接推理，按文本长度分桶填充
+- quantized: 在 torch 的基础上对 Linear 层做动态 int8 量化
+"""
+import threading
+import time
+from typing import Callable
+
+import logfire
 from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
 
 from bot.settings import settings
+from bot.models.embedding_service import EmbeddingService
+from bot.models.embedding_cache import EmbeddingCache, DEFAULT_CACHE_PATH
+
+SEQUENCE_LENGTH = 512
+
+BACKENDS = ("modelscope", "torch", "quantized")
+
+_pipeline = None
+_pipeline_lock = threading.Lock()
+_embedder: Callable[[list[str]], list[list[float]]] | None = None
+_embedder_lock = threading.Lock()
+
+def embedding_model_id() -> str:
+    """向量化模型 id"""
+    return settings.get_setting("chromadb.embedding_model")
+
+def embedding_backend() -> str:
+    """向量化推理后端"""
+    backend = settings.get_value("embedding.backend", "modelscope")
+    if backend not in BACKENDS:
+        raise ValueError(f"Unsupported embedding backend: {backend}, expected one of {BACKENDS}")
+    return backend
+
+def get_pipeline():
+    """获取向量化 pipeline，首次调用时加载模型"""
+    global _pipeline # pylint: disable=global-statement
+    if _pipeline is None:
+        with _pipeline_lock:
+            if _pipeline is None:
+                start = time.perf_counter()
+                # pylint: disable=import-outside-toplevel
+                from modelscope.pipelines import pipeline
+                from modelscope.utils.constant import Tasks
+                _pipeline = pipeline(Tasks.sentence_embedding,
+                                     model=embedding_model_id(),
+                                     sequence_length=SEQUENCE_LENGTH
+                                     )
+                logfire.info("Embedding model loaded in {seconds:.1f}s",
+                             seconds=time.perf_counter() - start)
+    return _pipeline
+
+def pipeline_embed(inputs: list[str]) -> list[list[float]]:
+    """modelscope pipeline 向量化"""
+    result = get_pipeline()(input={"source_sentence":inputs})
+    return result['text_embedding'].tolist() # pyright: ignore[reportIndexIssue]
+
+def load_embedder(backend: str) -> Callable[[list[str]], list[list[float]]]:
+    """加载指定后端的向量化函数"""
+    if backend == "modelscope":
+        get_pipeline()
+        return pipeline_embed
+    start = time.perf_counter()
+    # pylint: disable=import-outside-toplevel
+    from modelscope.hub.snapshot_download import snapshot_download
+    from bot.models.cpu_embedding import CPUEmbedder
+    embedder = CPUEmbedder(snapshot_download(embedding_model_id()),
+                           max_length=SEQUENCE_LENGTH,
+                           quantize=backend == "quantized",
+                           normalize=settings.get_value("embedding.normalize", True),
+                           batch_size=settings.get_value("embedding.max_batch_size", 32),
+                           num_threads=settings.get_value("embedding.num_threads", 0))
+    logfire.info("Embedding backend {backend} loaded in {seconds:.1f}s",
+                 backend=backend, seconds=time.perf_counter() - start)
+    return embedder
 
-model_id = settings.get_setting("chromadb.embedding_model")
+def get_embedder() -> Callable[[list[str]], list[list[float]]]:
+    """获取当前后端的向量化函数，首次调用时加载模型"""
+    global _embedder # pylint: disable=global-statement
+    if _embedder is None:
+        with _embedder_lock:
+            if _embedder is None:
+                _embedder = load_embedder(embedding_backend())
+    return _embedder
 
-pipeline_se = pipeline(Tasks.sentence_embedding,
-                       model=model_id,
-                       sequence_length=512
-                       )
+def warm_up() -> None:
+    """加载模型并执行一次推理"""
+    embed_texts(["warm up"])
+
+def embed_texts(inputs: list[str]) -> list[list[float]]:
+    """向量化一批文本"""
+    return get_embedder()(inputs)
+
+_service: EmbeddingService | None = None
+_service_lock = threading.Lock()
+
+def get_embedding_service() -> EmbeddingService:
+    """按 settings.yaml 的 embedding 配置获取进程内共享的向量化服务"""
+    global _service # pylint: disable=global-statement
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = EmbeddingService(
+                    embed_texts,
+                    max_batch_size=settings.get_value("embedding.max_batch_size", 32),
+                    max_wait_ms=settings.get_value("embedding.max_wait_ms", 5.0))
+    return _service
+
+def shutdown_embedding_service() -> None:
+    """输出指标并停止共享的向量化服务（未启动时不做任何事）"""
+    global _service # pylint: disable=global-statement
+    with _service_lock:
+        service, _service = _service, None
+    if service is not None:
+        service.log_stats()
+        service.close()
+    if _cache is not None:
+        _cache.log_stats()
+
+_cache: EmbeddingCache | None = None
+_cache_lock = threading.Lock()
+
+def get_embedding_cache() -> EmbeddingCache:
+    """按 settings.yaml 的 embedding.cache 配置获取进程内共享的向量缓存"""
+    global _cache # pylint: disable=global-statement
+    with _cache_lock:
+        if _cache is None:
+            enabled = settings.get_value("embedding.cache.enabled", True)
+            backend = embedding_backend()
+            # 不同后端的向量存在差异，不共用缓存
+            model_key = embedding_model_id() if backend == "modelscope" \
+                else f"{embedding_model_id()}#{backend}"
+            _cache = EmbeddingCache(
+                model_key, SEQUENCE_LENGTH,
+                path=settings.get_value("embedding.cache.path", DEFAULT_CACHE_PATH) \
+                    if enabled else None,
+                memory_items=settings.get_value("embedding.cache.memory_items", 10000))
+    return _cache
 
 class GTEEmbeddingFunction(EmbeddingFunction):
+    """
+    GTE 向量化
+
+    Args:
+        batched: 为 True 时通过共享的向量化服务执行，并发请求会合并成批次
+        cached: 为 True 时先查向量缓存，只对未命中的文本推理
+    """
+    def __init__(self, batched: bool = False, cached: bool = True) -> None:
+        self.batched = batched
+        self.cached = cached
+
+    def _embed(self, inputs: list[str]) -> list[list[float]]:
+        if self.batched:
+            return get_embedding_service().embed(inputs)
+        return embed_texts(inputs)
+
     def __call__(self, inputs: Documents) -> Embeddings:
-        result = pipeline_se(input={"source_sentence":inputs})
-        return result['text_embedding'].tolist() # pyright: ignore[reportIndexIssue]
\ No newline at end of file
+        if self.cached:
+            return get_embedding_cache().embed(inputs, self._embed) # pyright: ignore[reportReturnType]
+        return self._embed(list(inputs)) # pyright: ignore[reportReturnType]
@@ -0,0 +1,181 @@
+"""向量缓存
+按 (模型 id, sequence_length, 文本 sha256) 缓存向量，SQLite 持久化，内存 LRU 在前。
+重复的节点名称和问题不再重复推理，names 集合全量重建时只对新增或变化的名称向量化。
+"""
+from __future__ import annotations
+
+import hashlib
+import sqlite3
+import threading
+from array import array
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Sequence
+
+import logfire
+from cachetools import LRUCache
+
+Vector = List[float]
+
+DEFAULT_CACHE_PATH = Path.home() / ".cache" / "dg_agent" / "embeddings.sqlite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    model_id TEXT NOT NULL,
+    seq_len INTEGER NOT NULL,
+    sha TEXT NOT NULL,
+    vec BLOB NOT NULL,
+    PRIMARY KEY (model_id, seq_len, sha)
+)"""
+
+# SQLite 单条语句的参数个数有上限
+_SQL_BATCH = 500
+
+
+def _as_f32(vec: Sequence[float]) -> Vector:
+    """按 float32 存储精度取值，缓存命中与否返回的向量一致"""
+    return array("f", vec).tolist()
+
+
+def text_sha(text: str) -> str:
+    """文本摘要"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class EmbeddingCacheStats:
+    """缓存指标"""
+    memory_hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        """命中率"""
+        total = self.memory_hits + self.disk_hits + self.misses
+        return (self.memory_hits + self.disk_hits) / total if total else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        """转换为字典，便于日志输出"""
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate,
+        }
+
+
+class EmbeddingCache:
+    """
+    向量缓存，线程安全
+
+    Args:
+        model_id (str): 模型 id
+        seq_len (int): 模型的 sequence_length，截断长度不同向量也不同
+        path: SQLite 文件路径，None 时只使用内存
+        memory_items (int): 内存 LRU 的条目数
+    """
+
+    def __init__(self, model_id: str, seq_len: int,
+                 path: str | Path | None = DEFAULT_CACHE_PATH,
+                 memory_items: int = 10000) -> None:
+        self.model_id = model_id
+        self.seq_len = seq_len
+        self._lock = threading.Lock()
+        self._memory: LRUCache = LRUCache(maxsize=memory_items)
+        self._stats = EmbeddingCacheStats()
+        self._db: sqlite3.Connection | None = None
+        if path is not None:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(path), check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(_SCHEMA)
+            self._db.commit()
+
+    def _load(self, shas: List[str]) -> Dict[str, Vector]:
+        found: Dict[str, Vector] = {}
+        if self._db is None:
+            return found
+        for i in range(0, len(shas), _SQL_BATCH):
+            part = shas[i:i + _SQL_BATCH]
+            rows = self._db.execute(
+                f"SELECT sha, vec FROM embeddings WHERE model_id = ? AND seq_len = ? "
+                f"AND sha IN ({', '.join('?' * len(part))})",
+                [self.model_id, self.seq_len, *part]).fetchall()
+            for sha, blob in rows:
+                found[sha] = array("f", blob).tolist()
+        return found
+
+    def get_many(self, texts: Sequence[str]) -> List[Vector | None]:
+        """按文本读取向量，未命中的位置为 None"""
+        shas = [text_sha(t) for t in texts]
+        result: Dict[str, Vector] = {}
+        with self._lock:
+            missing = []
+            for sha in dict.fromkeys(shas):
+                vec = self._memory.get(sha)
+                if vec is None:
+                    missing.append(sha)
+                else:
+                    result[sha] = vec
+                    self._stats.memory_hits += 1
+            loaded = self._load(missing)
+            for sha, vec in loaded.items():
+                self._memory[sha] = vec
+            result.update(loaded)
+            self._stats.disk_hits += len(loaded)
+            self._stats.misses += len(missing) - len(loaded)
+        return [result.get(sha) for sha in shas]
+
+    def put_many(self, texts: Sequence[str], vectors: Sequence[Vector]) -> None:
+        """写入向量"""
+        rows = []
+        with self._lock:
+            for text, vec in zip(texts, vectors):
+                sha = text_sha(text)
+                vec = _as_f32(vec)
+                self._memory[sha] = vec
+                rows.append((self.model_id, self.seq_len, sha, array("f", vec).tobytes()))
+            if self._db is not None and rows:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO embeddings (model_id, seq_len, sha, vec) "
+                    "VALUES (?, ?, ?, ?)", rows)
+                self._db.commit()
+
+    def embed(self, texts: Sequence[str],
+              embed_fn: Callable[[List[str]], Sequence[Vector]]) -> List[Vector]:
+        """
+        读取缓存，只对未命中的文本调用 embed_fn，结果写回缓存
+
+        Returns:
+            List[Vector]: 与 texts 同顺序的向量
+        """
+        texts = list(texts)
+        vectors = self.get_many(texts)
+        # 同一批次中重复的文本只推理一次
+        missing = list(dict.fromkeys(t for t, v in zip(texts, vectors) if v is None))
+        if missing:
+            computed = {t: _as_f32(v) for t, v in zip(missing, embed_fn(missing))}
+            self.put_many(missing, [computed[t] for t in missing])
+            vectors = [v if v is not None else computed[t] for t, v in zip(texts, vectors)]
+        return vectors # pyright: ignore[reportReturnType]
+
+    def stats(self) -> EmbeddingCacheStats:
+        """获取缓存指标快照"""
+        with self._lock:
+            return EmbeddingCacheStats(
+                memory_hits=self._stats.memory_hits,
+                disk_hits=self._stats.disk_hits,
+                misses=self._stats.misses,
+            )
+
+    def log_stats(self) -> None:
+        """通过 logfire 输出缓存指标"""
+        logfire.info("Embedding cache stats: {stats}", stats=self.stats().as_dict())
+
+    def close(self) -> None:
+        """关闭数据库连接"""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
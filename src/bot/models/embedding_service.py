@@ -0,0 +1,194 @@
+"""向量化服务
+将并发的向量化请求合并成小批次，在独立的工作线程中执行推理。
+请求方得到 Future，可同步等待或在事件循环中 await（asyncio.wrap_future）。
+"""
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+import logfire
+
+Vector = List[float]
+EmbedFn = Callable[[List[str]], List[Vector]]
+
+# 停止工作线程的哨兵
+_STOP = object()
+
+
+@dataclass
+class EmbeddingServiceStats:
+    """向量化服务指标"""
+    requests: int = 0
+    texts: int = 0
+    batches: int = 0
+    errors: int = 0
+    queue_depth: int = 0
+    max_queue_depth: int = 0
+    busy_time: float = 0.0
+    started_at: float = 0.0
+
+    @property
+    def avg_batch_size(self) -> float:
+        """平均批次大小（文本数）"""
+        return self.texts / self.batches if self.batches else 0.0
+
+    @property
+    def throughput(self) -> float:
+        """推理吞吐（文本数/秒，按推理耗时计）"""
+        return self.texts / self.busy_time if self.busy_time else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        """转换为字典，便于日志输出"""
+        return {
+            "requests": self.requests,
+            "texts": self.texts,
+            "batches": self.batches,
+            "errors": self.errors,
+            "avg_batch_size": self.avg_batch_size,
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "throughput": self.throughput,
+            "uptime": time.monotonic() - self.started_at,
+        }
+
+
+class EmbeddingService:
+    """
+    微批次向量化服务
+
+    Args:
+        embed_fn: 批量向量化函数，输入文本列表，返回同顺序的向量列表
+        max_batch_size (int): 单批次最多文本数
+        max_wait_ms (float): 第一个请求到达后最多等待多久凑批次（毫秒）
+
+    Example:
+        service = EmbeddingService(embed_texts)
+        vectors = service.embed(["财务", "客户"])
+        service.close()
+    """
+
+    def __init__(self, embed_fn: EmbedFn, max_batch_size: int = 32,
+                 max_wait_ms: float = 5.0) -> None:
+        if max_batch_size < 1:
+            raise ValueError(f"Invalid max_batch_size: {max_batch_size}")
+        self.embed_fn = embed_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: queue.Queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._stats = EmbeddingServiceStats(started_at=time.monotonic())
+        self._closed = False
+        self._worker = threading.Thread(target=self._run, name="embedding-service", daemon=True)
+        self._worker.start()
+
+    def submit(self, texts: Sequence[str]) -> Future:
+        """提交向量化请求，返回 Future[List[Vector]]"""
+        future: Future = Future()
+        texts = list(texts)
+        if not texts:
+            future.set_result([])
+            return future
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Embedding service is closed")
+            self._stats.requests += 1
+            self._queue.put((texts, future))
+            depth = self._queue.qsize()
+            self._stats.max_queue_depth = max(self._stats.max_queue_depth, depth)
+        return future
+
+    def embed(self, texts: Sequence[str]) -> List[Vector]:
+        """提交并等待结果"""
+        return self.submit(texts).result()
+
+    def _collect(self, first: Tuple[List[str], Future]) -> Tuple[List[Tuple[List[str], Future]], bool]:
+        """以第一个请求为起点凑批次，返回 (请求列表, 是否收到停止信号)"""
+        batch = [first]
+        size = len(first[0])
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 \
+                    else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            if size + len(item[0]) > self.max_batch_size:
+                # 放不下的请求留到下一批，保持先到先处理
+                self._run_batch(batch)
+                batch, size = [item], len(item[0])
+                deadline = time.monotonic() + self.max_wait
+                continue
+            batch.append(item)
+            size += len(item[0])
+        return batch, False
+
+    def _run_batch(self, batch: List[Tuple[List[str], Future]]) -> None:
+        texts = [t for item, _ in batch for t in item]
+        start = time.monotonic()
+        try:
+            vectors: List[Vector] = []
+            # 超过批次上限的单个请求分段推理
+            for i in range(0, len(texts), self.max_batch_size):
+                vectors.extend(self.embed_fn(texts[i:i + self.max_batch_size]))
+        except Exception as e: # pylint: disable=broad-except
+            with self._lock:
+                self._stats.errors += 1
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        finally:
+            with self._lock:
+                self._stats.busy_time += time.monotonic() - start
+
+        with self._lock:
+            self._stats.batches += 1
+            self._stats.texts += len(texts)
+        offset = 0
+        for item, future in batch:
+            future.set_result(vectors[offset:offset + len(item)])
+            offset += len(item)
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            batch, stop = self._collect(item)
+            self._run_batch(batch)
+            if stop:
+                return
+
+    def stats(self) -> EmbeddingServiceStats:
+        """获取服务指标快照"""
+        with self._lock:
+            return EmbeddingServiceStats(
+                requests=self._stats.requests,
+                texts=self._stats.texts,
+                batches=self._stats.batches,
+                errors=self._stats.errors,
+                queue_depth=self._queue.qsize(),
+                max_queue_depth=self._stats.max_queue_depth,
+                busy_time=self._stats.busy_time,
+                started_at=self._stats.started_at,
+            )
+
+    def log_stats(self) -> None:
+        """通过 logfire 输出服务指标"""
+        logfire.info("Embedding service stats: {stats}", stats=self.stats().as_dict())
+
+    def close(self) -> None:
+        """处理完已提交的请求后停止工作线程"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(_STOP)
+        self._worker.join()
@@ -0,0 +1,294 @@
+"""名称索引
+图节点名称的内存词法索引，与 names 集合的向量检索结果融合：
+- 字典树：找出问题中原样出现的节点名称，以及按前缀补全，不需要向量化；
+- 字符 n-gram 倒排索引 + BM25：名称与问题部分重合时按相关度排序。
+索引内容来自 names 集合（文档格式 `Label {name:名称}`），
+图或集合变化后按 id 比较，只更新变化的条目。
+"""
+from __future__ import annotations
+
+import asyncio
+import math
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, Tuple
+
+import logfire
+from chromadb.api.models.Collection import Collection
+
+from bot.graph.base_graph import AsyncBaseGraph, BaseGraph
+
+_DOC = re.compile(r"^(\S+) \{name:(.*)\}$", re.S)
+
+# 字典树节点中保存名称 id 的键
+_IDS = ""
+
+
+@dataclass(slots=True)
+class NameEntry:
+    """名称条目"""
+    id: str
+    label: str
+    name: str
+    doc: str
+
+
+def parse_doc(id_: str, doc: str) -> NameEntry:
+    """解析 names 集合的文档"""
+    m = _DOC.match(doc)
+    if m is None:
+        return NameEntry(id_, "", doc, doc)
+    return NameEntry(id_, m.group(1), m.group(2), doc)
+
+
+def _normalize(text: str) -> str:
+    return text.strip().lower()
+
+
+def ngrams(text: str, n: int = 2) -> List[str]:
+    """字符 n-gram，短于 n 的文本整体作为一个词"""
+    text = _normalize(text)
+    if len(text) <= n:
+        return [text] if text else []
+    return [text[i:i + n] for i in range(len(text) - n + 1)]
+
+
+def rrf(rankings: Iterable[List[str]], k: int = 60) -> List[str]:
+    """倒数排名融合（Reciprocal Rank Fusion）"""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores, key=lambda key: -scores[key])
+
+
+class NameIndex:
+    """
+    名称索引，线程安全
+
+    Args:
+        n (int): n-gram 长度
+        k1 (float): BM25 词频饱和参数
+        b (float): BM25 长度归一化参数
+    """
+
+    def __init__(self, n: int = 2, k1: float = 1.5, b: float = 0.75) -> None:
+        self.n = n
+        self.k1 = k1
+        self.b = b
+        # 索引对应的图/集合版本，由 refresh 更新
+        self.version: str | None = None
+        self._lock = threading.RLock()
+        self._entries: Dict[str, NameEntry] = {}
+        self._trie: Dict[str, Any] = {}
+        self._max_len = 0
+        # 词 -> {id: 词频}
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._lengths: Dict[str, int] = {}
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _trie_node(self, name: str, create: bool) -> Dict[str, Any] | None:
+        node = self._trie
+        for ch in name:
+            child = node.get(ch)
+            if child is None:
+                if not create:
+                    return None
+                child = node[ch] = {}
+            node = child
+        return node
+
+    def _add(self, entry: NameEntry) -> None:
+        name = _normalize(entry.name)
+        if name:
+            self._trie_node(name, True).setdefault(_IDS, set()).add(entry.id) # pyright: ignore[reportOptionalMemberAccess]
+            self._max_len = max(self._max_len, len(name))
+        terms = ngrams(entry.name, self.n)
+        for term in terms:
+            postings = self._postings.setdefault(term, {})
+            postings[entry.id] = postings.get(entry.id, 0) + 1
+        self._lengths[entry.id] = len(terms)
+        self._total_length += len(terms)
+        self._entries[entry.id] = entry
+
+    def _remove(self, id_: str) -> None:
+        entry = self._entries.pop(id_, None)
+        if entry is None:
+            return
+        node = self._trie_node(_normalize(entry.name), False)
+        if node is not None and _IDS in node:
+            node[_IDS].discard(id_)
+            if not node[_IDS]:
+                del node[_IDS]
+        for term in set(ngrams(entry.name, self.n)):
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(id_, None)
+                if not postings:
+                    del self._postings[term]
+        self._total_length -= self._lengths.pop(id_, 0)
+
+    def upsert(self, entries: Iterable[NameEntry]) -> None:
+        """新增或替换条目"""
+        with self._lock:
+            for entry in entries:
+                self._remove(entry.id)
+                self._add(entry)
+
+    def remove(self, ids: Iterable[str]) -> None:
+        """删除条目"""
+        with self._lock:
+            for id_ in ids:
+                self._remove(id_)
+
+    def sync(self, docs: Mapping[str, str]) -> Tuple[int, int, int]:
+        """
+        按 id 与 docs 比较，只更新变化的条目
+
+        Args:
+            docs: id -> names 集合文档
+
+        Returns:
+            Tuple[int, int, int]: (新增, 更新, 删除)
+        """
+        added = updated = 0
+        with self._lock:
+            changed = []
+            for id_, doc in docs.items():
+                old = self._entries.get(id_)
+                if old is None:
+                    added += 1
+                elif old.doc != doc:
+                    updated += 1
+                else:
+                    continue
+                changed.append(parse_doc(id_, doc))
+            removed = [id_ for id_ in self._entries if id_ not in docs]
+            self.remove(removed)
+            self.upsert(changed)
+        return added, updated, len(removed)
+
+    def get(self, name: str) -> List[NameEntry]:
+        """按名称精确查找"""
+        with self._lock:
+            node = self._trie_node(_normalize(name), False)
+            if node is None:
+                return []
+            return [self._entries[id_] for id_ in node.get(_IDS, ())]
+
+    def exact(self, text: str, min_length: int = 2) -> List[NameEntry]:
+        """找出 text 中原样出现的名称（不短于 min_length），较长的名称在前"""
+        text = _normalize(text)
+        found: Dict[str, Tuple[int, NameEntry]] = {}
+        with self._lock:
+            for start in range(len(text)):
+                node = self._trie
+                for end in range(start, min(len(text), start + self._max_len)):
+                    node = node.get(text[end])
+                    if node is None:
+                        break
+                    if end + 1 - start < min_length:
+                        continue
+                    for id_ in node.get(_IDS, ()):
+                        found[id_] = (end + 1 - start, self._entries[id_])
+        return [entry for _, entry in sorted(found.values(), key=lambda x: -x[0])]
+
+    def prefix(self, prefix: str, limit: int = 10) -> List[NameEntry]:
+        """按前缀补全名称，较短的名称在前"""
+        result: List[NameEntry] = []
+        with self._lock:
+            node = self._trie_node(_normalize(prefix), False)
+            if node is None:
+                return result
+            level = [node]
+            # 按层遍历，先返回较短的名称
+            while level and len(result) < limit:
+                next_level = []
+                for n in level:
+                    for key, child in n.items():
+                        if key == _IDS:
+                            result.extend(self._entries[id_] for id_ in child)
+                        else:
+                            next_level.append(child)
+                level = next_level
+        return result[:limit]
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[NameEntry, float]]:
+        """BM25 检索"""
+        scores: Dict[str, float] = {}
+        with self._lock:
+            count = len(self._entries)
+            if not count:
+                return []
+            avg_length = self._total_length / count or 1.0
+            for term in set(ngrams(query, self.n)):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for id_, tf in postings.items():
+                    norm = tf + self.k1 * (1 - self.b + self.b * self._lengths[id_] / avg_length)
+                    scores[id_] = scores.get(id_, 0.0) + idf * tf * (self.k1 + 1) / norm
+            top = sorted(scores.items(), key=lambda x: -x[1])[:k]
+            return [(self._entries[id_], score) for id_, score in top]
+
+    def refresh(self, docs: Mapping[str, str], version: str | None = None) -> None:
+        """按 docs 增量更新索引，并记录对应的版本"""
+        start = time.perf_counter()
+        added, updated, removed = self.sync(docs)
+        self.version = version
+        logfire.info("Name index refreshed: {entries} entries, +{added} ~{updated} -{removed} "
+                     "in {seconds:.2f}s", entries=len(self), added=added, updated=updated,
+                     removed=removed, seconds=time.perf_counter() - start)
+
+
+def collection_documents(collection: Collection, batch_size: int = 5000) -> Iterator[Tuple[str, str]]:
+    """分页读取集合的 (id, 文档)"""
+    offset = 0
+    while True:
+        page = collection.get(include=["documents"], # pyright: ignore[reportArgumentType]
+                              limit=batch_size, offset=offset)
+        if not page["ids"]:
+            return
+        yield from zip(page["ids"], page["documents"] or [])
+        offset += len(page["ids"])
+
+
+async def graph_version(graph: BaseGraph | AsyncBaseGraph, collection: Collection) -> str:
+    """图指纹 + 集合 id + 条目数；蓝绿交换后集合 id 变化"""
+    if isinstance(graph, AsyncBaseGraph):
+        fingerprint = await graph.fingerprint()
+    else:
+        fingerprint = await asyncio.to_thread(graph.fingerprint)
+    # count() 是同步调用（持久化客户端读 SQLite，HTTP 客户端发请求），放到线程池中
+    count = await asyncio.to_thread(collection.count)
+    return f"{fingerprint}:{collection.id}:{count}"
+
+
+async def watch_graph(index: NameIndex, graph: BaseGraph | AsyncBaseGraph,
+                      get_collection: Callable[[], Collection], interval: float = 60.0) -> None:
+    """
+    后台任务：版本变化时从 names 集合增量更新索引
+
+    Args:
+        index: 名称索引
+        graph: 元数据图
+        get_collection: 按名称解析 names 集合（每次重新解析，蓝绿交换后取到新集合）
+        interval (float): 检查间隔（秒）
+    """
+    while True:
+        try:
+            collection = await asyncio.to_thread(get_collection)
+            version = await graph_version(graph, collection)
+            if version != index.version:
+                docs = await asyncio.to_thread(lambda: dict(collection_documents(collection)))
+                await asyncio.to_thread(index.refresh, docs, version)
+        except Exception as e: # pylint: disable=broad-except
+            logfire.warning("Name index refresh failed: {error}", error=str(e))
+        await asyncio.sleep(interval)
+
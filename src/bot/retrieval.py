@@ -0,0 +1,119 @@
+"""提示词检索
+从 chromadb 检索与问题相关的 Cypher 示例和图节点名称，拼接到提示词中。
+问题只做一次向量化，两个集合共用同一个向量查询；集合每次检索时按名称解析，蓝绿交换后取到新集合。
+配置了名称索引时，问题中原样出现的名称排在最前，其余按 BM25 与向量检索结果融合；
+原样出现的名称已足够时不再查询 names 集合。
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List
+
+import logfire
+from chromadb.api import ClientAPI
+from chromadb.api.models.Collection import Collection
+from chromadb.api.types import EmbeddingFunction
+
+from bot.settings import settings
+from bot.name_index import NameIndex, rrf
+from make_vector.collection_sync import live_collection
+
+
+@dataclass
+class RetrievalResult:
+    """检索结果"""
+    cypher_docs: List[str] = field(default_factory=list)
+    name_docs: List[str] = field(default_factory=list)
+    # 各步骤耗时（秒）
+    timings: Dict[str, float] = field(default_factory=dict)
+
+
+class PromptRetriever:
+    """
+    提示词检索
+
+    Args:
+        cypher_collection: 解析 Cypher 示例集合，每次检索时调用
+        names_collection: 解析图节点名称集合，每次检索时调用
+        embedding_function: 向量化函数，需与建集合时使用的一致
+        cypher_results (int): 返回的 Cypher 示例数
+        names_results (int): 返回的节点名称数
+        name_index: 名称索引，None 时只使用向量检索
+    """
+
+    def __init__(self,
+                 cypher_collection: Callable[[], Collection],
+                 names_collection: Callable[[], Collection],
+                 embedding_function: EmbeddingFunction,
+                 cypher_results: int = 3,
+                 names_results: int = 10,
+                 name_index: NameIndex | None = None) -> None:
+        self.cypher_collection = cypher_collection
+        self.names_collection = names_collection
+        self.embedding_function = embedding_function
+        self.cypher_results = cypher_results
+        self.names_results = names_results
+        self.name_index = name_index
+
+    @classmethod
+    def from_client(cls, client: ClientAPI,
+                    embedding_function: EmbeddingFunction,
+                    name_index: NameIndex | None = None) -> "PromptRetriever":
+        """按 settings.yaml 的集合名称解析集合"""
+        cypher_name = settings.get_setting("chromadb.cypher_collection")
+        names_name = settings.get_setting("chromadb.names_collection")
+        return cls(
+            cypher_collection=lambda: live_collection(client, cypher_name, embedding_function),
+            names_collection=lambda: live_collection(client, names_name, embedding_function),
+            embedding_function=embedding_function,
+            name_index=name_index)
+
+    @staticmethod
+    def _documents(collection: Collection, embedding, n_results: int) -> List[str]:
+        relevant = collection.query(
+            query_embeddings=[embedding],
+            n_results=n_results,
+            include=['documents'], # pyright: ignore[reportArgumentType]
+        )
+        if relevant is not None and relevant.get("documents"):
+            return list(relevant["documents"][0]) # pyright: ignore[reportOptionalSubscript]
+        return []
+
+    def retrieve(self, prompt: str) -> RetrievalResult:
+        """检索（同步，会阻塞当前线程）"""
+        result = RetrievalResult()
+
+        exact: List[str] = []
+        lexical: List[str] = []
+        if self.name_index is not None:
+            start = time.perf_counter()
+            exact = [e.doc for e in self.name_index.exact(prompt)]
+            lexical = [e.doc for e, _ in self.name_index.search(prompt, self.names_results)]
+            result.timings["lexical"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        embedding = self.embedding_function([prompt])[0]
+        result.timings["embed"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        result.cypher_docs = self._documents(self.cypher_collection(), embedding,
+                                             self.cypher_results)
+        result.timings["cypher"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        if len(exact) >= self.names_results:
+            result.name_docs = exact[:self.names_results]
+        else:
+            vector = self._documents(self.names_collection(), embedding, self.names_results)
+            fused = rrf([lexical, vector]) if lexical else vector
+            result.name_docs = list(dict.fromkeys(exact + fused))[:self.names_results]
+        result.timings["names"] = time.perf_counter() - start
+
+        logfire.info("retrieval timings: {timings}", timings=result.timings)
+        return result
+
+    async def aretrieve(self, prompt: str) -> RetrievalResult:
+        """检索，在线程池中执行，不阻塞事件循环"""
+        return await asyncio.to_thread(self.retrieve, prompt)
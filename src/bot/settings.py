@@ -41,4 +41,13 @@ class Settings:
             return value
         raise ValueError(f"Expected a string value for key '{key}', but got {type(value).__name__} instead.")
 
+    def get_value(self, key: str, default: Any = None) -> Any:
+        """get setting of any type, return default if the key is missing"""
+        value = self.settings
+        for k in key.split('.'):
+            if not isinstance(value, dict) or k not in value:
+                return default
+            value = value[k]
+        return value
+
 settings = Settings()
@@ -9,9 +9,9 @@ const spinner = document.getElementById('spinner')
 const stopButton = document.getElementById('stop-button') as HTMLButtonElement
 
 // stream the response and render messages as each chunk is received
-// data is sent as newline-delimited JSON
+// data is sent as newline-delimited JSON, only complete lines are parsed
 async function onFetchResponse(response: Response): Promise<void> {
-  let text = ''
+  let pending = ''
   let decoder = new TextDecoder()
   if (response.ok) {
     if (!response.body) {
@@ -27,15 +27,19 @@ async function onFetchResponse(response: Response): Promise<void> {
       if (done) {
         break
       }
-      text += decoder.decode(value)
-      addMessages(text)
+      pending += decoder.decode(value, {stream: true})
+      const end = pending.lastIndexOf('\n')
+      if (end >= 0) {
+        addMessages(pending.slice(0, end))
+        pending = pending.slice(end + 1)
+      }
       if (spinner) {
         spinner.classList.remove('active')
       }
       // 如果接收到新的消息则重置控制器
       controller = new AbortController()
     }
-    addMessages(text)
+    addMessages(pending + decoder.decode())
     promptInput.disabled = false
     promptInput.focus()
     if (stopButton) {
@@ -50,13 +54,43 @@ async function onFetchResponse(response: Response): Promise<void> {
 
 // The format of messages, this matches pydantic-ai both for brevity and understanding
 // in production, you might not want to keep this format all the way to the frontend
+// snapshot messages carry the full `content`, delta messages carry a `delta` fragment
+// and a `seq` number starting at 1
 interface Message {
   role: string
-  content: string
   timestamp: string
+  content?: string
+  delta?: string
+  seq?: number
+}
+
+interface MessageState {
+  div: HTMLElement
+  content: string
+  seq: number
+}
+
+const messageStates = new Map<string, MessageState>()
+const dirty = new Set<MessageState>()
+let renderScheduled = false
+
+// render changed messages at most once per animation frame
+function scheduleRender() {
+  if (renderScheduled) {
+    return
+  }
+  renderScheduled = true
+  requestAnimationFrame(() => {
+    renderScheduled = false
+    for (const state of dirty) {
+      state.div.innerHTML = marked.parse(state.content)
+    }
+    dirty.clear()
+    window.scrollTo({ top: document.body.scrollHeight, behavior: 'smooth' })
+  })
 }
 
-// take raw response text and render messages into the `#conversation` element
+// render newline-delimited messages into the `#conversation` element
 // Message timestamp is assumed to be a unique identifier of a message, and is used to deduplicate
 // hence you can send data about the same message multiple times, and it will be updated
 // instead of creating a new message elements
@@ -65,21 +99,33 @@ function addMessages(responseText: string) {
   const messages: Message[] = lines.filter(line => line.length > 1).map(j => JSON.parse(j))
   for (const message of messages) {
     // we use the timestamp as a crude element id
-    const {timestamp, role, content} = message
+    const {timestamp, role} = message
     const id = `msg-${timestamp}`
-    let msgDiv = document.getElementById(id)
-    if (!msgDiv) {
-      msgDiv = document.createElement('div')
+    let state = messageStates.get(id)
+    if (!state) {
+      const msgDiv = document.createElement('div')
       msgDiv.id = id
       msgDiv.title = `${role} at ${timestamp}`
       msgDiv.classList.add('border-top', 'pt-2', role)
       if (convElement) {
         convElement.appendChild(msgDiv)
       }
+      state = {div: msgDiv, content: '', seq: 0}
+      messageStates.set(id, state)
+    }
+    if (message.delta !== undefined && message.seq !== undefined) {
+      if (message.seq !== state.seq + 1) {
+        console.warn(`Out of order fragment for ${id}: ${message.seq} after ${state.seq}`)
+        continue
+      }
+      state.seq = message.seq
+      state.content += message.delta
+    } else {
+      state.content = message.content ?? ''
     }
-    msgDiv.innerHTML = marked.parse(content)
+    dirty.add(state)
   }
-  window.scrollTo({ top: document.body.scrollHeight, behavior: 'smooth' })
+  scheduleRender()
 }
 
 function onError(error: any) {
@@ -102,6 +148,7 @@ async function onSubmit(e: SubmitEvent): Promise<void> {
     spinner.classList.add('active')
   }
   const body = new FormData(e.target as HTMLFormElement)
+  body.append('mode', 'delta')
   
   promptInput.value = ''
   promptInput.disabled = true
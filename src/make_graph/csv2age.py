@@ -1,16 +1,28 @@
 """
 读取指定目录下的CSV文件，并将数据写入AGE图数据库。
 "v_"开头的文件作为节点先导入，"e_"开头的文件作为边后导入。
+
+两种导入方式：
+- 逐行：每行执行一条 CREATE Cypher（import_csv_to_age）
+- 批量：COPY 直接写入label表，边的 nid→graphid 通过一次 hash join 解析（bulk_import_csv_to_age）
 """
-from typing import Sequence
+from typing import Iterator, Sequence
 
 
+import io
 import os
 import csv
+import json
+import time
 from pathlib import Path
 import age
+import click
+from psycopg2 import sql as pgsql
+from tqdm import tqdm
 
 from bot.settings import settings
+from bot.graph.schema_cache import get_schema_cache, age_schema_key
+from make_graph.graph_index import create_age_indexes
 
 SCRIPT_PAHT = Path(__file__).parent
 
@@ -110,6 +122,203 @@ def import_csv_to_age(directory:str, graph_name:str, dsn:str):
     # 关闭数据库连接
     graph.close()
 
+    # 图已变化，使缓存的schema失效；代次标记随之更新，各进程的元模型对象和查询结果缓存一并失效
+    get_schema_cache().invalidate(age_schema_key(graph_name, dsn))
+
+
+def _read_batches(reader: csv.DictReader, batch_size: int) -> Iterator[list[dict]]:
+    """按批次读取CSV行"""
+    batch = []
+    for row in reader:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _ensure_label(cursor, graph_name: str, label: str, kind: str) -> None:
+    """label 不存在时创建"""
+    cursor.execute("""SELECT count(*) FROM ag_catalog.ag_label l
+                      JOIN ag_catalog.ag_graph g ON g.graphid = l.graph
+                      WHERE g.name = %s AND l.name = %s""", (graph_name, label))
+    if cursor.fetchone()[0] == 0:
+        func = "create_vlabel" if kind == "v" else "create_elabel"
+        cursor.execute(f"SELECT ag_catalog.{func}(%s, %s)", (graph_name, label))
+
+
+def _label_table(graph_name: str, label: str) -> pgsql.Composed:
+    return pgsql.SQL("{}.{}").format(pgsql.Identifier(graph_name), pgsql.Identifier(label))
+
+
+def _report(desc: str, rows: int, skipped: int, started: float) -> None:
+    elapsed = max(time.monotonic() - started, 1e-6)
+    msg = f"{desc}: {rows} rows in {elapsed:.1f}s ({rows / elapsed:.0f} rows/s)"
+    if skipped:
+        msg += f", {skipped} skipped (nid not found)"
+    tqdm.write(msg)
+
+
+def _vertex_stage(batch: list[dict]) -> io.StringIO:
+    """节点批次转换为 COPY 的 CSV 输入，每行一列：属性的 JSON"""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for row in batch:
+        writer.writerow([json.dumps(row, ensure_ascii=False)])
+    buf.seek(0)
+    return buf
+
+
+def _edge_stage(batch: list[dict], fields: list[str]) -> io.StringIO:
+    """边批次转换为 COPY 到 _edge_stage 的 CSV 输入：起点 nid、终点 nid、属性的 JSON"""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for row in batch:
+        writer.writerow([row[fields[0]], row[fields[1]],
+                         json.dumps({p: row[p] for p in fields[2:]}, ensure_ascii=False)])
+    buf.seek(0)
+    return buf
+
+
+def _copy_vertices(conn, graph_name: str, label: str, path: str, batch_size: int) -> None:
+    """COPY 节点属性到label表，id 由label表的默认值生成"""
+    target = pgsql.SQL("COPY {} (properties) FROM STDIN WITH (FORMAT csv)").format(
+        _label_table(graph_name, label))
+    started = time.monotonic()
+    total = 0
+    with conn.cursor() as cursor, open(path, 'r', encoding='utf-8') as f:
+        _ensure_label(cursor, graph_name, label, "v")
+        conn.commit()
+        reader = csv.DictReader(f)
+        with tqdm(desc=f"v_{label}", unit="rows") as bar:
+            for batch in _read_batches(reader, batch_size):
+                cursor.copy_expert(target.as_string(conn), _vertex_stage(batch))
+                conn.commit()
+                total += len(batch)
+                bar.update(len(batch))
+        cursor.execute(pgsql.SQL("ANALYZE {}").format(_label_table(graph_name, label)))
+        conn.commit()
+    _report(f"v_{label}", total, 0, started)
+
+
+def _nid_map_sql(map_table: str, graph_name: str, label: str) -> pgsql.Composed:
+    """
+    建立 nid→graphid 临时映射表的 SQL
+
+    agtype 字符串的文本形式是带转义的 JSON 字面量，经 json 取出标量得到原始字符串，
+    nid 中含引号、反斜杠时也能与 CSV 中的值匹配
+    """
+    return pgsql.SQL("""CREATE TEMP TABLE {} AS
+        SELECT id, (ag_catalog.agtype_access_operator(properties, '"nid"'::agtype)::text)::json
+                   #>> '{{}}' AS nid
+        FROM {}""").format(pgsql.Identifier(map_table), _label_table(graph_name, label))
+
+
+def _build_nid_map(cursor, graph_name: str, label: str, index: int) -> str:
+    """
+    为节点label建立 nid→graphid 临时映射表
+
+    表名按建立顺序编号，不含label：仅大小写不同的label不会共用一张表
+    """
+    map_table = f"_nid_map_{index}"
+    cursor.execute(pgsql.SQL("DROP TABLE IF EXISTS {}").format(pgsql.Identifier(map_table)))
+    cursor.execute(_nid_map_sql(map_table, graph_name, label))
+    cursor.execute(pgsql.SQL("ANALYZE {}").format(pgsql.Identifier(map_table)))
+    return map_table
+
+
+def _edge_insert_sql(graph_name: str, label: str, from_map: str, to_map: str) -> pgsql.Composed:
+    """暂存的边通过 nid 映射表 hash join 写入边label表"""
+    return pgsql.SQL("""INSERT INTO {} (start_id, end_id, properties)
+            SELECT a.id, b.id, s.properties::agtype
+            FROM _edge_stage s
+            JOIN {} a ON a.nid = s.from_nid
+            JOIN {} b ON b.nid = s.to_nid""").format(
+                _label_table(graph_name, label), pgsql.Identifier(from_map),
+                pgsql.Identifier(to_map))
+
+
+def _unmatched_sql(from_map: str, to_map: str) -> pgsql.Composed:
+    """
+    暂存的边中起点或终点 nid 找不到的行数
+    以反连接计算，nid 重复导致 join 扇出时不影响计数
+    """
+    return pgsql.SQL("""SELECT count(*) FROM _edge_stage s
+            WHERE NOT EXISTS (SELECT 1 FROM {} a WHERE a.nid = s.from_nid)
+               OR NOT EXISTS (SELECT 1 FROM {} b WHERE b.nid = s.to_nid)""").format(
+                pgsql.Identifier(from_map), pgsql.Identifier(to_map))
+
+
+def _copy_edges(conn, graph_name: str, label: str, path: str,
+                nid_maps: dict[str, str], batch_size: int) -> None:
+    """COPY 边到临时表，再通过 nid 映射表 hash join 写入label表"""
+    started = time.monotonic()
+    total = 0
+    skipped = 0
+    with conn.cursor() as cursor, open(path, 'r', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        fields: list[str] = list(reader.fieldnames) if reader.fieldnames is not None else []
+        from_label = fields[0][len('from_'):]
+        to_label = fields[1][len('to_'):]
+
+        _ensure_label(cursor, graph_name, label, "e")
+        for v_label in (from_label, to_label):
+            if v_label not in nid_maps:
+                nid_maps[v_label] = _build_nid_map(cursor, graph_name, v_label, len(nid_maps))
+        cursor.execute("""CREATE TEMP TABLE IF NOT EXISTS _edge_stage
+                          (from_nid text, to_nid text, properties text)""")
+        conn.commit()
+
+        insert = _edge_insert_sql(graph_name, label, nid_maps[from_label], nid_maps[to_label])
+        unmatched = _unmatched_sql(nid_maps[from_label], nid_maps[to_label])
+
+        with tqdm(desc=f"e_{label}", unit="rows") as bar:
+            for batch in _read_batches(reader, batch_size):
+                cursor.execute("TRUNCATE _edge_stage")
+                cursor.copy_expert("COPY _edge_stage FROM STDIN WITH (FORMAT csv)",
+                                   _edge_stage(batch, fields))
+                cursor.execute(unmatched)
+                skipped += cursor.fetchone()[0]
+                cursor.execute(insert)
+                conn.commit()
+                total += len(batch)
+                bar.update(len(batch))
+        cursor.execute(pgsql.SQL("ANALYZE {}").format(_label_table(graph_name, label)))
+        conn.commit()
+    _report(f"e_{label}", total, skipped, started)
+
+
+def bulk_import_csv_to_age(directory:str, graph_name:str, dsn:str, batch_size:int=10000):
+    """
+    批量导入CSV到AGE图数据库
+
+    节点文件通过 COPY 直接写入label表；边文件先 COPY 到临时表，
+    再与各节点label的 nid→graphid 映射表做一次 hash join 写入边label表。
+    每 batch_size 行提交一次，并输出行数和 rows/s。
+    """
+    graph: age.Age = age.connect(graph=graph_name, dsn=dsn)
+    conn = graph.connection
+    assert conn is not None
+
+    csv_files = sorted(f for f in os.listdir(directory) if f.endswith('.csv'))
+
+    # 先导入节点文件
+    for node_file in [f for f in csv_files if f.startswith('v_')]:
+        _copy_vertices(conn, graph_name, node_file[2:-4],
+                       os.path.join(directory, node_file), batch_size)
+
+    # 后导入边文件，节点的 nid 映射表在同一会话内复用
+    nid_maps: dict[str, str] = {}
+    for edge_file in [f for f in csv_files if f.startswith('e_')]:
+        _copy_edges(conn, graph_name, edge_file[2:-4],
+                    os.path.join(directory, edge_file), nid_maps, batch_size)
+
+    graph.close()
+
+    # 图已变化，使缓存的schema失效；代次标记随之更新，各进程的元模型对象和查询结果缓存一并失效
+    get_schema_cache().invalidate(age_schema_key(graph_name, dsn))
+
 
 def clear_graph(graph_name:str, dsn:str):
     """清除图数据库"""
@@ -135,7 +344,11 @@ def clear_graph(graph_name:str, dsn:str):
         graph.commit()
     graph.close()
 
-if __name__ == '__main__':
+@click.command()
+@click.option('--bulk/--row-by-row', default=True, help='使用COPY批量导入或逐行CREATE导入')
+@click.option('--batch-size', default=10000, show_default=True, help='批量导入时每批提交的行数')
+def main(bulk:bool, batch_size:int):
+    """清空并重新导入AGE图数据库"""
     # 配置数据库连接信息
     graph_name = settings.get_setting("age.graph")
     dsn = settings.get_setting("age.dsn")
@@ -143,12 +356,13 @@ if __name__ == '__main__':
     # 指定CSV文件目录
     directory = SCRIPT_PAHT / 'files/data'
 
-    # 导入数据
-    # 确保 graph_name 是字符串类型
-    if isinstance(graph_name, list):
-        graph_name = graph_name[0] if graph_name else ""
-    if isinstance(dsn, list):
-        dsn = dsn[0] if dsn else ""
-
     clear_graph(graph_name, dsn)
-    import_csv_to_age(str(directory.absolute()), graph_name, dsn)
+    if bulk:
+        bulk_import_csv_to_age(str(directory.absolute()), graph_name, dsn, batch_size)
+    else:
+        import_csv_to_age(str(directory.absolute()), graph_name, dsn)
+    # 补齐常用属性索引并更新统计信息
+    create_age_indexes(graph_name, dsn)
+
+if __name__ == '__main__':
+    main()
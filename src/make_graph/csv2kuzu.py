@@ -12,6 +12,8 @@ from tqdm.rich import tqdm_rich
 import tqdm
 warnings.filterwarnings("ignore", category=tqdm.TqdmExperimentalWarning)
 
+from bot.graph.schema_cache import get_schema_cache, kuzu_schema_key
+
 
 SCRIPT_PAHT = Path(__file__).parent
 
@@ -106,6 +108,9 @@ def main() -> None:
         conn.execute(ddl)
     for ddl in tqdm_rich(ddl_set["insert_edge"], desc="Insert edge"):
         conn.execute(ddl)
+
+    # 图已变化，使缓存的schema失效；代次标记随之更新，各进程的元模型对象和查询结果缓存一并失效
+    get_schema_cache().invalidate(kuzu_schema_key(SCRIPT_PAHT / 'files/kuzu'))
     
 
 if __name__ == '__main__':
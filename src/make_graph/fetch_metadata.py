@@ -2,14 +2,19 @@
 from pathlib import Path
 import yaml
 import pandas as pd
-import age
 import click
 
 from sqlalchemy import create_engine, Engine
 from trino.auth import BasicAuthentication
-from . import GRAPH_NAME, DSN
+from bot.settings import settings
+from bot.graph.age_graph import AGEGraph
 
 SCRIPT_PAHT = Path(__file__).parent
+
+# 应用名以 Cypher 参数传入
+APP_ENTITIES_CYPHER = """
+    MATCH (a:Application {name: $app_name})-[r]->(e:DataEntity)
+    RETURN a.name AS app_name, e.name AS name"""
 def skip_table(t_name:str) -> bool:
     """过滤日志表、备份表"""
     if t_name.endswith("_log"):
@@ -32,8 +37,6 @@ def fetch_rawdata(schema:str, app_name:str,
                             "auth": BasicAuthentication(username, password),
                             "http_scheme": "https",
                         })
-    ag = age.connect(graph=GRAPH_NAME, dsn=DSN)
-
     df_tables = pd.read_sql(f"SHOW TABLES FROM {schema}", con=engine)
     df_tables["mark"] = df_tables["Table"].apply(skip_table)
     df_tables = df_tables[df_tables["mark"]]
@@ -44,22 +47,15 @@ def fetch_rawdata(schema:str, app_name:str,
         df["Table"] = t_name
         df_all_columns = pd.concat([df_all_columns, df])
 
-    _conn = ag.connection
-    with _conn.cursor() as _cursor:
-        sql = f"""
-        SELECT * FROM cypher('{GRAPH_NAME}', $$
-        MATCH (a:Application {{name: '{app_name}'}})-[r]->(e:DataEntity)
-        RETURN a,e
-        $$) AS (a agtype, e agtype);
-        """
-        _cursor.execute(sql)
-        result = _cursor.fetchall()
-        df_entities = pd.DataFrame([
-                                    dict(app_name=v[0].properties["name"],
-                                         name=v[1].properties["name"]) for v in result
-                                    ])
-        df_entities["schema"] = schema
-        df_entities["table_name"] = ""
+    graph = AGEGraph(settings.get_setting("age.graph"), settings.get_setting("age.dsn"),
+                     pool_max_size=1)
+    try:
+        result = graph.query(APP_ENTITIES_CYPHER, {"app_name": app_name})
+    finally:
+        graph.close()
+    df_entities = pd.DataFrame(result, columns=["app_name", "name"])
+    df_entities["schema"] = schema
+    df_entities["table_name"] = ""
 
     with pd.ExcelWriter(SCRIPT_PAHT / f'./files/db/{schema}.xlsx') as writer:
         df_tables.to_excel(writer, sheet_name='Tables', index=False)
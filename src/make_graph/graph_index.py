@@ -0,0 +1,203 @@
+"""
+图数据库属性索引
+常用查询都按属性过滤：MetadataHelper 按 full_table_name 取字段，检索到的示例 Cypher 按 name 匹配，
+边导入按 nid 匹配。AGE 的label表默认没有属性索引，这些过滤都是顺序扫描。
+
+- create: 为每个节点label创建 properties 的 GIN 索引（{name: 'x'} 形式的匹配）
+  和常用属性的表达式索引（WHERE n.name = 'x' 形式的匹配），为边label创建 start_id/end_id 索引
+- report: 对 make_vector.cypher_examples 中的示例执行 EXPLAIN，输出各查询的索引使用情况
+
+Kuzu 节点表的主键（nid）自带哈希索引，暂不支持其他属性的二级索引，因此 Kuzu 只做 report。
+"""
+import json
+import re
+from pathlib import Path
+from typing import Iterable
+
+import age
+import click
+import kuzu
+
+from bot.settings import settings
+from bot.graph.age_graph import AGEGraph
+from make_vector.cypher_examples import examples
+
+SCRIPT_PAHT = Path(__file__).parent
+
+# 需要建立表达式索引的常用过滤属性
+INDEXED_PROPERTIES = ("nid", "name", "full_table_name")
+
+_SEQ_SCAN = re.compile(r"Seq Scan on (\S+)")
+_INDEX_SCAN = re.compile(r"(?:Index Scan|Index Only Scan)(?: Backward)? using (\S+) on (\S+)")
+_BITMAP_SCAN = re.compile(r"Bitmap Index Scan on (\S+)")
+_KUZU_INDEX = re.compile(r"INDEX_LOOKUP|PRIMARY_KEY")
+
+
+def _index_name(label: str, suffix: str) -> str:
+    # PostgreSQL 标识符最长 63 字节
+    return f"{label}_{suffix}_idx"[:63]
+
+
+def _ident(name: str) -> str:
+    """双引号标识符，名称中的双引号加倍转义"""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _prop_key(prop: str) -> str:
+    """属性名的 agtype 字符串字面量，如 '"name"'::agtype"""
+    return "'" + json.dumps(prop, ensure_ascii=False).replace("'", "''") + "'::agtype"
+
+
+def age_index_statements(graph_name: str, label: str, kind: str,
+                         properties: Iterable[str] = ()) -> list[str]:
+    """
+    生成 AGE label表的索引DDL
+
+    Args:
+        graph_name (str): 图名称
+        label (str): label名称
+        kind (str): "v" 节点 / "e" 边
+        properties (Iterable[str]): 需要表达式索引的属性名
+
+    Returns:
+        list[str]: CREATE INDEX IF NOT EXISTS 语句
+    """
+    table = f"{_ident(graph_name)}.{_ident(label)}"
+    stmts = [f'CREATE INDEX IF NOT EXISTS {_ident(_index_name(label, "id"))} '
+             f'ON {table} USING btree (id)']
+    if kind == "e":
+        stmts.append(f'CREATE INDEX IF NOT EXISTS {_ident(_index_name(label, "start_id"))} '
+                     f'ON {table} USING btree (start_id)')
+        stmts.append(f'CREATE INDEX IF NOT EXISTS {_ident(_index_name(label, "end_id"))} '
+                     f'ON {table} USING btree (end_id)')
+        return stmts
+
+    stmts.append(f'CREATE INDEX IF NOT EXISTS {_ident(_index_name(label, "properties"))} '
+                 f'ON {table} USING gin (properties)')
+    for prop in properties:
+        stmts.append(
+            f'CREATE INDEX IF NOT EXISTS {_ident(_index_name(label, prop))} ON {table} USING btree '
+            f"(ag_catalog.agtype_access_operator(VARIADIC ARRAY[properties, {_prop_key(prop)}]))")
+    return stmts
+
+
+def create_age_indexes(graph_name: str, dsn: str,
+                       properties: Iterable[str] = INDEXED_PROPERTIES) -> None:
+    """为图中所有label创建（或补齐）索引并更新统计信息"""
+    properties = tuple(properties)
+    graph: age.Age = age.connect(graph=graph_name, dsn=dsn)
+    conn = graph.connection
+    assert conn is not None
+    with conn.cursor() as cursor:
+        cursor.execute("""SELECT l.name, l.kind FROM ag_catalog.ag_label l
+                          JOIN ag_catalog.ag_graph g ON g.graphid = l.graph
+                          WHERE g.name = %s AND NOT l.name LIKE '\\_ag\\_%%'""", (graph_name,))
+        labels = cursor.fetchall()
+        for label, kind in labels:
+            present: list[str] = []
+            if kind == "v":
+                # 同一label的节点来自同一个CSV，属性一致，取一行即可
+                cursor.execute(
+                    f'SELECT properties FROM {_ident(graph_name)}.{_ident(label)} LIMIT 1')
+                row = cursor.fetchone()
+                if row is not None and isinstance(row[0], dict):
+                    present = [p for p in properties if p in row[0]]
+            for stmt in age_index_statements(graph_name, label, kind, present):
+                cursor.execute(stmt)
+            cursor.execute(f'ANALYZE {_ident(graph_name)}.{_ident(label)}')
+            conn.commit()
+            print(f"{label}: indexed {['id'] + present if kind == 'v' else ['start_id', 'end_id']}")
+    graph.close()
+
+
+def example_cypher(example: str) -> str:
+    """从示例文本中取出可执行的 Cypher（去掉标题、说明和占位的 LIMIT n）"""
+    lines = example.strip().splitlines()[1:]
+    lines = [l for l in lines if l.strip() and not l.strip().startswith(("--", "查询"))]
+    return re.sub(r"\bLIMIT\s+n\b", "LIMIT 10", "\n".join(lines))
+
+
+def summarize_plan(plan: Iterable[str]) -> dict[str, list[str]]:
+    """
+    汇总 PostgreSQL 查询计划中的扫描方式
+
+    Returns:
+        dict: {"index": ["索引 on 表", ...], "seq": ["表", ...]}
+    """
+    summary: dict[str, list[str]] = {"index": [], "seq": []}
+    for line in plan:
+        if m := _INDEX_SCAN.search(line):
+            summary["index"].append(f"{m.group(1)} on {m.group(2)}")
+        elif m := _BITMAP_SCAN.search(line):
+            summary["index"].append(m.group(1))
+        elif m := _SEQ_SCAN.search(line):
+            summary["seq"].append(m.group(1))
+    return summary
+
+
+def plan_status(summary: dict[str, list[str]]) -> str:
+    """索引使用情况：OK 全部走索引，PARTIAL 部分表顺序扫描，SEQ 未使用索引"""
+    if summary["index"] and not summary["seq"]:
+        return "OK"
+    return "PARTIAL" if summary["index"] else "SEQ"
+
+
+def report_age(graph_name: str, dsn: str, verbose: bool) -> None:
+    """AGE 示例查询的索引使用报告"""
+    graph = AGEGraph(graph_name, dsn, pool_max_size=1)
+    try:
+        for example in examples:
+            title = example.strip().splitlines()[0]
+            cypher = example_cypher(example)
+            plan = graph.explain(cypher)
+            summary = summarize_plan(plan)
+            status = plan_status(summary)
+            print(f"[{status}] {title}")
+            print(f"    index: {', '.join(summary['index']) or '-'}")
+            print(f"    seq  : {', '.join(summary['seq']) or '-'}")
+            if verbose:
+                print("\n".join("      " + l for l in plan))
+    finally:
+        graph.close()
+
+
+def report_kuzu(db_path: str, verbose: bool) -> None:
+    """Kuzu 示例查询的索引使用报告"""
+    conn = kuzu.Connection(kuzu.Database(db_path, read_only=True))
+    for example in examples:
+        title = example.strip().splitlines()[0]
+        result = conn.execute("EXPLAIN " + example_cypher(example))
+        assert isinstance(result, kuzu.QueryResult)
+        plan = []
+        while result.has_next():
+            plan.extend(str(c) for c in result.get_next())
+        text = "\n".join(plan)
+        print(f"[{'INDEX' if _KUZU_INDEX.search(text) else 'SCAN'}] {title}")
+        if verbose:
+            print(text)
+
+
+@click.group()
+def main():
+    """图数据库属性索引维护"""
+
+
+@main.command()
+def create():
+    """为 AGE 图创建常用属性索引"""
+    create_age_indexes(settings.get_setting("age.graph"), settings.get_setting("age.dsn"))
+
+
+@main.command()
+@click.option('--graph', type=click.Choice(['age', 'kuzu']), default='age', show_default=True)
+@click.option('--verbose', is_flag=True, help='输出完整查询计划')
+def report(graph:str, verbose:bool):
+    """用 EXPLAIN 检查示例查询的索引使用情况"""
+    if graph == 'age':
+        report_age(settings.get_setting("age.graph"), settings.get_setting("age.dsn"), verbose)
+    else:
+        report_kuzu(str(SCRIPT_PAHT / 'files/kuzu'), verbose)
+
+
+if __name__ == '__main__':
+    main()
@@ -3,15 +3,17 @@
 
 import json
 import click
-import age
 from tqdm import tqdm
-from . import GRAPH_NAME, DSN
 
-def sql_decode(s):
-    """
-    将字符串转义，用于sql注入
-    """
-    return s.replace("'", "\\'")
+from bot.settings import settings
+from bot.graph.age_graph import AGEGraph
+from bot.graph.schema_cache import get_schema_cache
+
+# 关联描述以 Cypher 参数传入，所有关联共用一个预备语句
+SET_REL_CYPHER = """
+    MATCH ()-[l:RELATED_TO]->() WHERE id(l) = $id
+    SET l.rel = $rel
+    RETURN l"""
 
 @click.command()
 @click.argument('fname', type=click.Path(exists=True))
@@ -21,20 +23,17 @@ def main(fname:str=None):
     """
 
     print("加载数据实体关联信息")
-    ag = age.connect(graph=GRAPH_NAME, dsn=DSN)
-    conn = ag.connection
-
-    with open(fname, "r", encoding="utf-8") as _f:
-        links = json.load(_f)
-        with conn.cursor() as cur:
-            for lnk in tqdm(links):
-                cur.execute(f"""SELECT * FROM cypher(%s, $$
-                    MATCH ()-[l:RELATED_TO]->() WHERE ID(l)=%s
-                    SET l.rel = '{sql_decode(lnk["rel"])}'
-                    RETURN l
-                $$) AS (l agtype);
-                """, (GRAPH_NAME, lnk["id"]))
-    ag.commit()
+    graph = AGEGraph(settings.get_setting("age.graph"), settings.get_setting("age.dsn"),
+                     pool_max_size=1)
+    try:
+        with open(fname, "r", encoding="utf-8") as _f:
+            links = json.load(_f)
+        graph.execute_many(SET_REL_CYPHER,
+                           ({"id": lnk["id"], "rel": lnk["rel"]} for lnk in tqdm(links)))
+        # 图已变化，更新代次标记，各进程的元模型对象和查询结果缓存随之失效
+        get_schema_cache().invalidate(graph.schema_cache_key)
+    finally:
+        graph.close()
 
 if __name__ == '__main__':
     main()
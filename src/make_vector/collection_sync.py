@@ -0,0 +1,336 @@
+"""
+chroma 集合增量同步
+源文档按分块流式输入，每块按 id 与集合中的文档比较，只对新增或变化的文档向量化并 upsert，
+最后删除源中已不存在的 id。内存中只保留在途的分块和全部源 id。
+向量化在线程池中并行，写入按分块顺序进行，每块写完记录断点，中断后从最后提交的分块继续。
+蓝绿模式在暂存集合中构建新版本，未变化的文档直接复制原向量，完成后再与正式集合交换名称。
+"""
+from __future__ import annotations
+
+import json
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Mapping, Set
+
+from chromadb.api import ClientAPI
+from chromadb.api.models.Collection import Collection
+from chromadb.api.types import EmbeddingFunction
+from chromadb.errors import NotFoundError
+
+DEFAULT_BATCH_SIZE = 1000
+
+STAGING_SUFFIX = "-staging"
+PREVIOUS_SUFFIX = "-previous"
+
+
+@dataclass
+class Chunk:
+    """源文档分块"""
+    source: str
+    index: int
+    docs: Dict[str, str]
+
+
+@dataclass
+class SyncStats:
+    """同步结果"""
+    added: int = 0
+    updated: int = 0
+    deleted: int = 0
+    unchanged: int = 0
+    # 按断点跳过的分块数
+    resumed: int = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        """转换为字典，便于日志输出"""
+        return {
+            "added": self.added,
+            "updated": self.updated,
+            "deleted": self.deleted,
+            "unchanged": self.unchanged,
+            "resumed": self.resumed,
+        }
+
+
+@dataclass
+class _Prepared:
+    """已向量化、待写入的分块"""
+    chunk: Chunk
+    ids: List[str] = field(default_factory=list)
+    documents: List[str] = field(default_factory=list)
+    embeddings: List[Any] = field(default_factory=list)
+    stats: SyncStats = field(default_factory=SyncStats)
+
+
+class SyncCheckpoint:
+    """
+    同步断点，记录每个来源已提交的分块数
+
+    Args:
+        path: 断点文件，None 时不持久化
+        target (str): 目标集合名称，与断点文件中记录的不一致时忽略断点
+    """
+
+    def __init__(self, path: str | Path | None, target: str) -> None:
+        self.path = Path(path) if path is not None else None
+        self.target = target
+        self.progress: Dict[str, int] = {}
+        if self.path is not None and self.path.exists():
+            saved = json.loads(self.path.read_text(encoding="utf-8"))
+            if saved.get("target") == target:
+                self.progress = saved.get("progress", {})
+
+    def __bool__(self) -> bool:
+        return bool(self.progress)
+
+    def committed(self, chunk: Chunk) -> bool:
+        """分块是否已提交"""
+        return chunk.index < self.progress.get(chunk.source, 0)
+
+    def commit(self, chunk: Chunk) -> None:
+        """记录分块已提交"""
+        self.progress[chunk.source] = chunk.index + 1
+        if self.path is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(".tmp")
+            tmp.write_text(json.dumps({"target": self.target, "progress": self.progress}),
+                           encoding="utf-8")
+            tmp.replace(self.path)
+
+    def clear(self) -> None:
+        """同步完成后删除断点"""
+        self.progress = {}
+        if self.path is not None:
+            self.path.unlink(missing_ok=True)
+
+
+def _chunks(items: List[Any], size: int) -> Iterator[List[Any]]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def bounded_batch_size(client: ClientAPI, batch_size: int) -> int:
+    """不超过 chroma 单次写入上限的批次大小"""
+    return max(1, min(batch_size, client.get_max_batch_size()))
+
+
+def dict_chunks(docs: Mapping[str, str], size: int, source: str = "docs") -> Iterator[Chunk]:
+    """把内存中的 id -> 文档切分为分块"""
+    for index, part in enumerate(_chunks(list(docs), size)):
+        yield Chunk(source, index, {id_: docs[id_] for id_ in part})
+
+
+def existing_ids(collection: Collection, batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[str]:
+    """分页读取集合中全部 id"""
+    offset = 0
+    while True:
+        ids = collection.get(include=[], limit=batch_size, offset=offset)["ids"] # pyright: ignore[reportArgumentType]
+        if not ids:
+            return
+        yield from ids
+        offset += len(ids)
+
+
+class _ChunkSync:
+    """
+    分块同步
+
+    Args:
+        target: 写入的集合
+        source: 用于比较和复用向量的集合，与 target 相同时为原地同步，None 表示全部新增
+        embedding_function: 向量化函数
+        batch_size (int): 单次读写 chroma 的条数
+        workers (int): 并行向量化的线程数
+        checkpoint: 断点
+    """
+
+    def __init__(self, target: Collection, source: Collection | None,
+                 embedding_function: EmbeddingFunction, batch_size: int,
+                 workers: int, checkpoint: SyncCheckpoint) -> None:
+        self.target = target
+        self.source = source
+        self.embedding_function = embedding_function
+        self.batch_size = batch_size
+        self.workers = max(1, workers)
+        self.checkpoint = checkpoint
+        self.in_place = source is not None and source.id == target.id
+
+    def _prepare(self, chunk: Chunk) -> _Prepared:
+        """比较并向量化一个分块（在工作线程中执行）"""
+        prepared = _Prepared(chunk)
+        old_docs: Dict[str, str] = {}
+        old_vectors: Dict[str, Any] = {}
+        if self.source is not None:
+            include = ["documents"] if self.in_place else ["documents", "embeddings"]
+            for part in _chunks(list(chunk.docs), self.batch_size):
+                page = self.source.get(ids=part, include=include) # pyright: ignore[reportArgumentType]
+                old_docs.update(zip(page["ids"], page["documents"] or []))
+                if not self.in_place:
+                    old_vectors.update(zip(page["ids"], page["embeddings"])) # pyright: ignore[reportArgumentType]
+
+        changed = []
+        for id_, doc in chunk.docs.items():
+            old = old_docs.get(id_)
+            if old == doc:
+                prepared.stats.unchanged += 1
+                if not self.in_place:
+                    # 暂存集合中直接复用原向量
+                    prepared.ids.append(id_)
+                    prepared.documents.append(doc)
+                    prepared.embeddings.append(old_vectors[id_])
+                continue
+            if old is None:
+                prepared.stats.added += 1
+            else:
+                prepared.stats.updated += 1
+            changed.append(id_)
+        for part in _chunks(changed, self.batch_size):
+            documents = [chunk.docs[id_] for id_ in part]
+            prepared.ids.extend(part)
+            prepared.documents.extend(documents)
+            prepared.embeddings.extend(self.embedding_function(documents))
+        return prepared
+
+    def _write(self, prepared: _Prepared, stats: SyncStats) -> None:
+        """写入一个分块并记录断点"""
+        for start in range(0, len(prepared.ids), self.batch_size):
+            end = start + self.batch_size
+            self.target.upsert(ids=prepared.ids[start:end],
+                               documents=prepared.documents[start:end],
+                               embeddings=prepared.embeddings[start:end])
+        self.checkpoint.commit(prepared.chunk)
+        stats.added += prepared.stats.added
+        stats.updated += prepared.stats.updated
+        stats.unchanged += prepared.stats.unchanged
+
+    def run(self, chunks: Iterable[Chunk]) -> tuple[SyncStats, Set[str]]:
+        """
+        同步全部分块
+
+        Returns:
+            tuple[SyncStats, Set[str]]: (同步结果, 全部源 id)
+        """
+        stats = SyncStats()
+        seen: Set[str] = set()
+        pending: Deque[Future] = deque()
+        with ThreadPoolExecutor(self.workers, thread_name_prefix="collection-sync") as pool:
+            for chunk in chunks:
+                seen.update(chunk.docs)
+                if self.checkpoint.committed(chunk):
+                    stats.resumed += 1
+                    continue
+                pending.append(pool.submit(self._prepare, chunk))
+                # 按提交顺序写入；在途分块数有上限，内存不随源文档总数增长
+                while len(pending) > self.workers:
+                    self._write(pending.popleft().result(), stats)
+            while pending:
+                self._write(pending.popleft().result(), stats)
+        return stats, seen
+
+
+def sync_collection(collection: Collection, chunks: Iterable[Chunk],
+                    embedding_function: EmbeddingFunction,
+                    batch_size: int = DEFAULT_BATCH_SIZE, workers: int = 1,
+                    checkpoint_path: str | Path | None = None) -> SyncStats:
+    """
+    原地增量同步
+
+    Args:
+        collection: 目标集合
+        chunks: 源文档分块，同一来源的分块按 index 递增
+        embedding_function: 向量化函数
+        batch_size (int): 单次读写的条数，不应超过 bounded_batch_size 的结果
+        workers (int): 并行向量化的线程数
+        checkpoint_path: 断点文件，None 时不记录
+
+    Returns:
+        SyncStats: 同步结果
+    """
+    checkpoint = SyncCheckpoint(checkpoint_path, collection.name)
+    stats, seen = _ChunkSync(collection, collection, embedding_function,
+                             batch_size, workers, checkpoint).run(chunks)
+    removed = [id_ for id_ in existing_ids(collection, batch_size) if id_ not in seen]
+    for part in _chunks(removed, batch_size):
+        collection.delete(ids=part)
+    stats.deleted = len(removed)
+    checkpoint.clear()
+    return stats
+
+
+def swap_collection(client: ClientAPI, name: str, chunks: Iterable[Chunk],
+                    embedding_function: EmbeddingFunction,
+                    batch_size: int = DEFAULT_BATCH_SIZE, workers: int = 1,
+                    checkpoint_path: str | Path | None = None) -> SyncStats:
+    """
+    蓝绿同步：在 `{name}-staging` 中构建新版本，然后交换名称
+
+    正式集合改名为 `{name}-previous` 后保留到下一次同步时删除。集合对象按 id 访问，
+    长期运行的读者不应缓存集合对象，而应每次查询时通过 live_collection 按名称解析，
+    交换过程中正式名称暂不存在的间隙也由 live_collection 处理。
+
+    Args:
+        client: chroma 客户端
+        name: 正式集合名称
+        chunks: 源文档分块
+        embedding_function: 向量化函数
+        batch_size (int): 单次读写的条数
+        workers (int): 并行向量化的线程数
+        checkpoint_path: 断点文件，存在有效断点时沿用已有的暂存集合
+
+    Returns:
+        SyncStats: 相对正式集合的变化
+    """
+    batch_size = bounded_batch_size(client, batch_size)
+    staging_name = name + STAGING_SUFFIX
+    previous_name = name + PREVIOUS_SUFFIX
+    checkpoint = SyncCheckpoint(checkpoint_path, staging_name)
+    if not checkpoint:
+        try:
+            client.delete_collection(staging_name)
+        except NotFoundError:
+            pass
+    staging = client.get_or_create_collection(
+        staging_name, embedding_function=embedding_function) # pyright: ignore[reportArgumentType]
+    try:
+        live = client.get_collection(
+            name, embedding_function=embedding_function) # pyright: ignore[reportArgumentType]
+    except NotFoundError:
+        live = None
+
+    stats, seen = _ChunkSync(staging, live, embedding_function,
+                             batch_size, workers, checkpoint).run(chunks)
+    if live is not None:
+        stats.deleted = sum(1 for id_ in existing_ids(live, batch_size) if id_ not in seen)
+        try:
+            client.delete_collection(previous_name)
+        except NotFoundError:
+            pass
+        live.modify(name=previous_name)
+    staging.modify(name=name)
+    checkpoint.clear()
+    return stats
+
+
+def live_collection(client: ClientAPI, name: str,
+                    embedding_function: EmbeddingFunction | None = None) -> Collection:
+    """
+    按名称解析正式集合，供长期运行的读者每次查询时调用
+
+    swap_collection 先把正式集合改名为 `{name}-previous` 再把暂存集合改为正式名称，
+    两步之间正式名称不存在，此时返回仍保存旧版本的 `{name}-previous`
+    """
+    try:
+        return client.get_collection(
+            name, embedding_function=embedding_function) # pyright: ignore[reportArgumentType]
+    except NotFoundError:
+        pass
+    try:
+        return client.get_collection(
+            name + PREVIOUS_SUFFIX,
+            embedding_function=embedding_function) # pyright: ignore[reportArgumentType]
+    except NotFoundError:
+        # 两次解析之间交换已经完成
+        return client.get_collection(
+            name, embedding_function=embedding_function) # pyright: ignore[reportArgumentType]
@@ -4,7 +4,9 @@
 import os
 import sys
 from pathlib import Path
+from typing import Iterator
 import chromadb
+import click
 import pandas as pd
 from tqdm import tqdm
 
@@ -12,7 +14,9 @@ SCRIPT_PAHT = Path(__file__).parent
 sys.path.append(str(SCRIPT_PAHT.parent))
 
 from bot.settings import settings
-from bot.models.embedding import GTEEmbeddingFunction
+from bot.models.embedding import GTEEmbeddingFunction, get_embedding_cache
+from make_vector.collection_sync import (DEFAULT_BATCH_SIZE, Chunk, bounded_batch_size,
+                                         swap_collection, sync_collection)
 
 skip_csv =["v_Column.csv"]
 SOURCE_DIR = str(SCRIPT_PAHT.parent / r"make_graph\files\data")
@@ -21,16 +25,6 @@ def get_client():
     client = chromadb.PersistentClient(path=settings.get_setting("chromadb.persist_directory"))
     return client
 
-def get_collection():
-    client = get_client()
-    cn = settings.get_setting("chromadb.names_collection")
-    if cn in client.list_collections():
-        client.delete_collection(cn)
-
-    collection = client.create_collection(cn, 
-                          embedding_function=GTEEmbeddingFunction())
-    return collection
-
 def list_all_csv():
     # 遍历SOURCE_DIR下所有文件
     for root, _, files in os.walk(SOURCE_DIR):
@@ -40,26 +34,48 @@ def list_all_csv():
                 file_path = os.path.join(root, file)
                 yield file_path, file[2:-4]
 
-def main():
-    docs = []
-    ids = []
-    # 读取CSV文件
-    for file_path, node_name in tqdm(list_all_csv()):
+def read_chunks(chunk_size: int) -> Iterator[Chunk]:
+    """分块读取全部名称，每块为 nid -> 文档"""
+    for file_path, node_name in list_all_csv():
         tqdm.write(f"Processing {file_path}...")
-        df = pd.read_csv(file_path)
-        # 提取name列
-        names = df['name'].tolist()
-        nid = df['nid'].tolist()
+        source = os.path.basename(file_path)
+        for index, df in enumerate(pd.read_csv(file_path, usecols=['nid', 'name'],
+                                               chunksize=chunk_size)):
+            yield Chunk(source, index,
+                        {str(nid): f"{node_name} {{name:{name}}}"
+                         for nid, name in zip(df['nid'].tolist(), df['name'].tolist())})
 
-        docs.extend([ f"{node_name} {{name:{name}}}" for name in names])
-        ids.extend(nid)
-
-    # 连接到ChromaDB
-    collection = get_collection()
-    collection.add(
-        documents=docs,
-        ids= ids
-    )
+@click.command()
+@click.option("--blue-green/--in-place", default=False,
+              help="在暂存集合中构建后交换名称，同步期间读者始终有完整的集合")
+@click.option("--batch-size", default=DEFAULT_BATCH_SIZE, show_default=True,
+              help="单次读写 chroma 的条数")
+@click.option("--chunk-size", default=5000, show_default=True, help="每次读取的 CSV 行数")
+@click.option("--workers", default=2, show_default=True, help="并行向量化的线程数")
+@click.option("--checkpoint", type=click.Path(dir_okay=False), default=None,
+              help="断点文件，默认为 chroma 目录下的 <集合名>.sync.json")
+@click.option("--restart", is_flag=True, help="忽略已有断点，从头同步")
+def main(blue_green: bool, batch_size: int, chunk_size: int, workers: int,
+         checkpoint: str | None, restart: bool):
+    """将图节点名称增量同步到 names 集合"""
+    client = get_client()
+    cn = settings.get_setting("chromadb.names_collection")
+    checkpoint_path = Path(checkpoint) if checkpoint else \
+        Path(settings.get_setting("chromadb.persist_directory")) / f"{cn}.sync.json"
+    if restart:
+        checkpoint_path.unlink(missing_ok=True)
+    emb_fn = GTEEmbeddingFunction(batched=True)
+    chunks = tqdm(read_chunks(chunk_size), unit="chunk")
+    if blue_green:
+        stats = swap_collection(client, cn, chunks, emb_fn, batch_size, workers, checkpoint_path)
+    else:
+        collection = client.get_or_create_collection(
+            cn, embedding_function=emb_fn) # pyright: ignore[reportArgumentType]
+        stats = sync_collection(collection, chunks, emb_fn, bounded_batch_size(client, batch_size),
+                                workers, checkpoint_path)
+    tqdm.write(f"Sync {cn}: {stats.as_dict()}")
+    # 向量缓存命中的名称没有重新推理
+    tqdm.write(f"Embedding cache: {get_embedding_cache().stats().as_dict()}")
 
 if __name__ == "__main__":
     main()
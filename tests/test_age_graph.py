@@ -1,10 +1,17 @@
 """AGEGraph tests"""
+from contextlib import contextmanager
+
+import psycopg2
 import pytest
+from psycopg2 import extensions as ext
 
 import logfire
 
 # pylint: disable=E0401
-from bot.graph.age_graph import AGEGraph, AGEQueryException
+from bot.graph.age_graph import (AGEGraph, AGEQueryException, agtype_params, compile_query,
+                                 plan_rows)
+from bot.graph.age_pool import PreparedStatements
+from bot.graph.pool import ConnectionPool
 from bot.graph.ontology.age import (
     BusinessDomain, 
     Application, 
@@ -42,6 +49,26 @@ class TestAGEGraph:
                                       params=("财务", ))
         assert result[0]["n"]["name"] == "财务"
 
+    def test_query_with_cypher_params(self, graph):
+        """Cypher 参数查询"""
+        result = graph.query("MATCH (n:BusinessDomain {name: $name}) RETURN n",
+                             params={"name": "财务"})
+        assert result[0]["n"]["name"] == "财务"
+
+    def test_execute_many_rolls_back_batch(self, graph):
+        """批次中途出错时整个批次回滚，不提交已执行的语句"""
+        with pytest.raises(AGEQueryException):
+            graph.execute_many("CREATE (:ExecuteManyTest {v: 1 / $d})",
+                               [{"d": 1}, {"d": 1}, {"d": 0}])
+        assert graph.query("MATCH (n:ExecuteManyTest) RETURN count(n) AS c")[0]["c"] == 0
+
+    def test_iter_query(self, graph):
+        """服务端游标流式读取，提前关闭时释放连接"""
+        it = graph.iter_query("MATCH (c:Column) RETURN c")
+        assert next(it)["c"]["label"] == "Column"
+        it.close()
+        assert graph.pool_stats().in_use == 0
+
     @pytest.mark.skip()
     def test_query_with_error(self, graph):
         """错误查询"""
@@ -53,6 +80,11 @@ class TestAGEGraph:
         """执行计划"""
         graph.explain("MATCH (n) RETURN n")
 
+    def test_estimate_rows(self, graph):
+        """按执行计划估计行数，查询自带的 LIMIT 计入估计"""
+        assert graph.estimate_rows("MATCH (c:Column) RETURN c") > 0
+        assert graph.estimate_rows("MATCH (c:Column) RETURN c LIMIT 1") == 1
+
 
     def test_get_relates(self, graph):
         """获取relate_to"""
@@ -141,3 +173,225 @@ class TestAGEGraph:
                 (e2)-[:IMPLEMENTS]->(t2:PhysicalTable)
             RETURN e1, e2, r, t1, t2""", graph)
         print(result)
+
+
+def test_properties_sql():
+    """批量属性采样SQL"""
+    sql, params = AGEGraph._properties_sql("g", ["BusinessDomain", 'A"B'], 10)
+    assert params == ["BusinessDomain", 'A"B']
+    assert sql.count("UNION ALL") == 1
+    assert '"g"."BusinessDomain"' in sql
+    assert '"g"."A""B"' in sql
+
+
+def test_triples_sql():
+    """批量三元组SQL"""
+    sql, params = AGEGraph._triples_sql("g", 1, ["CONTAINS", "USES"])
+    assert params == ["CONTAINS", 1, 1, "USES", 1, 1]
+    assert sql.count("UNION ALL") == 1
+    assert AGEGraph._triples_sql("g", 1, []) == ("", [])
+
+
+def test_rows_to_properties():
+    """按label汇总属性，无数据的label也保留"""
+    rows = [("BusinessDomain", {"name": "财务", "code": "FIN"}),
+            ("BusinessDomain", {"name": "银行"})]
+    result = AGEGraph._rows_to_properties(["BusinessDomain", "Application"], rows, "labels")
+    assert result[0]["labels"] == "BusinessDomain"
+    assert sorted(p["property"] for p in result[0]["properties"]) == ["code", "name"]
+    assert result[1] == {"properties": [], "labels": "Application"}
+
+
+def test_compile_query_cached():
+    """相同的 Cypher 只翻译一次，语句名由 SQL 决定"""
+    compiled = compile_query("MATCH (n:Application) RETURN n.name AS name", "g")
+    hits = compile_query.cache_info().hits
+    assert compile_query("MATCH (n:Application) RETURN n.name AS name", "g") is compiled
+    assert compile_query.cache_info().hits == hits + 1
+    assert compiled.fields == ("name",)
+    assert compiled.name.startswith("dg_")
+    assert compile_query("MATCH (n:Application) RETURN n.name AS name", "h").name != compiled.name
+    assert AGEGraph._wrap_query("MATCH (n:Application) RETURN n.name AS name", "g") \
+        == (compiled.sql, ["name"])
+
+
+def test_compile_query_parameterized():
+    """Cypher 参数以 agtype map 作为 cypher() 的第三个参数传入"""
+    compiled = compile_query("MATCH (n:Application {name: $name}) RETURN n", "g", True)
+    assert "$$, $1) AS (n agtype)" in compiled.sql
+    assert compiled.arg_types == "(agtype)"
+    assert compiled.execute_sql == f"EXECUTE {compiled.name}(%s)"
+    assert compiled.name != compile_query("MATCH (n:Application {name: $name}) RETURN n", "g").name
+    assert agtype_params({"names": ["财务", "a'b"]}) == '{"names": ["财务", "a\'b"]}'
+
+
+def test_plan_rows():
+    """取执行计划顶层节点的 rows"""
+    assert plan_rows(["Limit  (cost=0.00..0.27 rows=10 width=32)",
+                      "  ->  Seq Scan on \"Column\" c  (cost=0.00..22.70 rows=1270 width=32)"]) == 10
+    assert plan_rows([]) is None
+
+
+class _InvalidName(psycopg2.Error):
+    """预备语句不存在"""
+    pgcode = "26000"
+
+
+class _FakeConnection:
+    """记录执行语句的 psycopg2 连接，fail(sql) 返回需要抛出的异常"""
+    def __init__(self, fail=lambda sql: None, rows=()):
+        self.prepared = PreparedStatements()
+        self.rows = list(rows)
+        self.status = ext.TRANSACTION_STATUS_IDLE
+        self.fail = fail
+        self.executed = []
+        self.rollbacks = 0
+        self.commits = 0
+
+    def get_transaction_status(self):
+        return self.status
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.status = ext.TRANSACTION_STATUS_IDLE
+
+    def commit(self):
+        self.commits += 1
+        self.status = ext.TRANSACTION_STATUS_IDLE
+
+    def cursor(self, name=None): # pylint: disable=unused-argument
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def execute(self, sql, args=None):
+        self.status = ext.TRANSACTION_STATUS_INTRANS
+        error = self.fail(sql)
+        if error is not None:
+            raise error
+        self.executed.append(sql)
+
+    def fetchmany(self, size):
+        rows, self.rows = self.rows[:size], self.rows[size:]
+        return rows
+
+    def fetchall(self):
+        return self.fetchmany(len(self.rows))
+
+
+def _fake_graph(conn):
+    """使用假连接的 AGEGraph，连接池只有这一个连接"""
+    graph = object.__new__(AGEGraph)
+    graph.graph_name, graph.prepare, graph.itersize = "g", True, 2
+    graph.pool = ConnectionPool(lambda: conn, max_size=1, timeout=0.2, close=lambda c: None)
+    return graph
+
+
+def _fail_once(prefix, error, skip=0):
+    """跳过 skip 条后，第一次执行以 prefix 开头的语句时抛出 error"""
+    seen = []
+    def _fail(sql):
+        if sql.startswith(prefix):
+            seen.append(sql)
+            if len(seen) == skip + 1:
+                return error
+        return None
+    return _fail
+
+
+def test_execute_prepared_reuses_statement():
+    """同一连接上只 PREPARE 一次"""
+    conn = _FakeConnection()
+    compiled = compile_query("MATCH (n) RETURN n", "g")
+    AGEGraph._execute_prepared(conn, conn, compiled)
+    conn.status = ext.TRANSACTION_STATUS_IDLE
+    AGEGraph._execute_prepared(conn, conn, compiled)
+    assert [s.split()[0] for s in conn.executed] == ["PREPARE", "EXECUTE", "EXECUTE"]
+
+
+def test_execute_prepared_retries_when_idle():
+    """语句已不存在且事务中没有之前的操作时，回滚后重新 PREPARE 一次"""
+    conn = _FakeConnection(_fail_once("EXECUTE", _InvalidName()))
+    compiled = compile_query("MATCH (n) RETURN n", "g")
+    conn.prepared.prepare(compiled.name, compiled.sql)
+    AGEGraph._execute_prepared(conn, conn, compiled)
+    assert conn.rollbacks == 1
+    assert [s.split()[0] for s in conn.executed] == ["PREPARE", "EXECUTE"]
+
+
+def test_execute_prepared_no_retry_in_transaction():
+    """事务中已有操作时不回滚重试，由调用方回滚整个事务"""
+    conn = _FakeConnection(_fail_once("EXECUTE", _InvalidName()))
+    compiled = compile_query("MATCH (n) RETURN n", "g")
+    conn.prepared.prepare(compiled.name, compiled.sql)
+    conn.status = ext.TRANSACTION_STATUS_INTRANS
+    with pytest.raises(_InvalidName):
+        AGEGraph._execute_prepared(conn, conn, compiled)
+    assert conn.rollbacks == 0
+    assert compiled.name not in conn.prepared
+
+
+def test_execute_prepared_error_keeps_statements():
+    """执行出错不释放其他预备语句；PREPARE 失败时不记录该语句"""
+    conn = _FakeConnection(_fail_once("EXECUTE", psycopg2.DataError()))
+    other = compile_query("MATCH (n:A) RETURN n", "g")
+    compiled = compile_query("MATCH (n) RETURN n", "g")
+    conn.prepared.prepare(other.name, other.sql)
+    with pytest.raises(psycopg2.DataError):
+        AGEGraph._execute_prepared(conn, conn, compiled)
+    assert other.name in conn.prepared and compiled.name in conn.prepared
+    assert not any(s.startswith("DEALLOCATE") for s in conn.executed)
+
+    conn = _FakeConnection(_fail_once("PREPARE", psycopg2.ProgrammingError()))
+    with pytest.raises(psycopg2.ProgrammingError):
+        AGEGraph._execute_prepared(conn, conn, compiled)
+    assert compiled.name not in conn.prepared
+
+
+def test_execute_many_no_partial_commit():
+    """第 N+1 条语句出错时不提交前 N 条，也不重试"""
+    conn = _FakeConnection(_fail_once("EXECUTE", psycopg2.DataError(), skip=3))
+    graph = _fake_graph(conn)
+    with pytest.raises(AGEQueryException):
+        graph.execute_many("CREATE (:T {i: $i})", [{"i": i} for i in range(5)])
+    assert conn.commits == 0 and conn.rollbacks == 1
+    assert sum(s.startswith("EXECUTE") for s in conn.executed) == 3
+
+
+def test_session_nested_error_keeps_stream():
+    """session() 中嵌套的语句出错只回滚到保存点，不结束外层命名游标所在的事务"""
+    def fail(sql):
+        return psycopg2.ProgrammingError() if "MATCH (c:Column)" in sql else None
+
+    conn = _FakeConnection(fail, rows=[(i,) for i in range(5)])
+    graph = _fake_graph(conn)
+    rows = []
+    with graph.session():
+        for row in graph.iter_query("MATCH (n) RETURN n"):
+            rows.append(row["n"])
+            if len(rows) == 1:
+                with pytest.raises(AGEQueryException):
+                    graph.query("MATCH (c:Column) RETURN c")
+                graph.execuate("CREATE (:T)")
+        assert conn.rollbacks == 0 and conn.commits == 0
+    assert rows == [0, 1, 2, 3, 4]
+    assert conn.commits == 1
+    nested = [s for s in conn.executed if "SAVEPOINT" in s]
+    assert nested == ["SAVEPOINT dg_nested", "RELEASE SAVEPOINT dg_nested",
+                      "SAVEPOINT dg_nested", "ROLLBACK TO SAVEPOINT dg_nested",
+                      "SAVEPOINT dg_nested", "RELEASE SAVEPOINT dg_nested"]
+
+
+def test_session_error_rolls_back():
+    """session() 因异常退出时不提交"""
+    conn = _FakeConnection()
+    graph = _fake_graph(conn)
+    with pytest.raises(RuntimeError):
+        with graph.session():
+            graph.execuate("CREATE (:T)")
+            raise RuntimeError()
+    assert conn.commits == 0
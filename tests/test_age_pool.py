@@ -0,0 +1,104 @@
+"""AGEConnectionPool tests"""
+import threading
+import time
+
+import pytest
+from psycopg2 import extensions as ext
+
+# pylint: disable=E0401
+from bot.graph.age_pool import AGEConnectionPool, AGEPoolTimeout, PreparedStatements
+
+
+class _FakeConnection:
+    """模拟 psycopg2 连接"""
+    def __init__(self):
+        self.closed = 0
+        self.status = ext.TRANSACTION_STATUS_IDLE
+        self.rollbacks = 0
+
+    def get_transaction_status(self):
+        return self.status
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.status = ext.TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = 1
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    """不连接数据库的连接池"""
+    monkeypatch.setattr(AGEConnectionPool, "_connect", lambda self: _FakeConnection())
+    p = AGEConnectionPool("g", "dsn", min_size=1, max_size=2, timeout=0.2)
+    yield p
+    p.close()
+
+
+def test_reuse(pool):
+    """连接复用"""
+    with pool.connection() as c1:
+        pass
+    with pool.connection() as c2:
+        pass
+    assert c1 is c2
+    stats = pool.stats()
+    assert stats.size == 1
+    assert stats.checkouts == 2
+    assert stats.in_use == 0
+
+
+def test_rollback_on_release(pool):
+    """归还时回滚未结束的事务"""
+    with pool.connection() as c:
+        c.status = ext.TRANSACTION_STATUS_INTRANS
+    assert c.rollbacks == 1
+
+
+def test_closed_connection_replaced(pool):
+    """已关闭的连接不会被再次取出"""
+    with pool.connection() as c1:
+        c1.close()
+    with pool.connection() as c2:
+        assert c2 is not c1
+    assert pool.stats().discarded == 1
+
+
+def test_timeout_and_wait(pool):
+    """连接耗尽时等待，超时抛出异常"""
+    with pool.connection(), pool.connection():
+        assert pool.stats().in_use == 2
+        with pytest.raises(AGEPoolTimeout):
+            with pool.connection():
+                pass
+    assert pool.stats().waits == 1
+
+
+def test_waiter_wakes_up(pool):
+    """归还连接后唤醒等待者"""
+    acquired = []
+    with pool.connection(), pool.connection():
+        def _worker():
+            with pool.connection() as c:
+                acquired.append(c)
+        t = threading.Thread(target=_worker)
+        t.start()
+        time.sleep(0.05)
+    t.join()
+    assert len(acquired) == 1
+    assert pool.stats().size == 2
+
+
+def test_prepared_statements():
+    """超出上限时 DEALLOCATE 最久未用的语句"""
+    prepared = PreparedStatements(max_size=2)
+    assert prepared.prepare("a", "SELECT 1") == ["PREPARE a AS SELECT 1"]
+    assert prepared.prepare("a", "SELECT 1") == []
+    prepared.prepare("b", "SELECT 2")
+    prepared.prepare("a", "SELECT 1")
+    assert prepared.prepare("c", "SELECT 3") == ["DEALLOCATE b", "PREPARE c AS SELECT 3"]
+    assert "a" in prepared and "b" not in prepared
+    assert prepared.prepare("d", "SELECT $1", "(agtype)")[-1] == "PREPARE d(agtype) AS SELECT $1"
+    prepared.clear()
+    assert "a" not in prepared
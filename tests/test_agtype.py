@@ -0,0 +1,66 @@
+"""agtype 解码 tests"""
+from decimal import Decimal
+
+import pytest
+from age import parseAgeValue
+from age.models import Edge, Path, Vertex
+
+# pylint: disable=E0401
+from bot.graph.age_graph import AGEGraph
+from bot.graph.agtype import decode_agtype, from_age
+
+T = '{"id": 1, "label": "PhysicalTable", "properties": {"name": "t1", "full_table_name": "s.t1"}}::vertex'
+C = '{"id": 2, "label": "Column", "properties": {"name": "c1"}}::vertex'
+R = '{"id": 3, "label": "HAS_COLUMN", "end_id": 2, "start_id": 1, "properties": {}}::edge'
+
+
+def test_vertex_and_edge():
+    """顶点属性展开到同一层，边保留起止 id"""
+    assert decode_agtype(T) == {"id": 1, "label": "PhysicalTable", "type": "vertex",
+                                "name": "t1", "full_table_name": "s.t1"}
+    assert decode_agtype(R) == {"id": 3, "label": "HAS_COLUMN", "properties": {},
+                                "from_id": 1, "to_id": 2, "type": "edge"}
+
+
+def test_path():
+    """路径解码为顶点/边字典的列表，与 parseAgeValue 的结果一致"""
+    text = f"[{T}, {R}, {C}]::path"
+    path = decode_agtype(text)
+    assert [e["type"] for e in path] == ["vertex", "edge", "vertex"]
+    assert path[1]["from_id"] == path[0]["id"] and path[1]["to_id"] == path[2]["id"]
+    assert path == from_age(parseAgeValue(text))
+    # collect(p) 得到路径的列表
+    assert decode_agtype(f"[[{T}, {R}, {C}]::path, [{C}]::path]") == [path, [path[2]]]
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("1", 1),
+    ('"a::b"', "a::b"),
+    ("1.5::numeric", Decimal("1.5")),
+    ('[1, "x", null, true]', [1, "x", None, True]),
+    ('{"k": [1.5]}', {"k": [1.5]}),
+    (None, None),
+])
+def test_scalars(text, expected):
+    """标量、列表、映射"""
+    assert decode_agtype(text) == expected
+
+
+def test_annotation_inside_string():
+    """字符串中出现的类型注解与转义引号原样保留"""
+    text = ('[{"id": 1, "label": "A", "properties": {"name": "x}::vertex \\"q\\" ]::path"}}::vertex]'
+            '::path')
+    assert decode_agtype(text) == [{"id": 1, "label": "A", "type": "vertex",
+                                    "name": 'x}::vertex "q" ]::path'}]
+
+
+def test_record_to_dict():
+    """parseAgeValue 得到的对象（包括 Path）一次转换，已解码的值原样保留"""
+    t, r, c = parseAgeValue(T), parseAgeValue(R), parseAgeValue(C)
+    assert isinstance(t, Vertex) and isinstance(r, Edge)
+    record = AGEGraph._record_to_dict((t, Path([t, r, c]), decode_agtype(C), "x"),
+                                      ["t", "p", "c", "s"])
+    assert record["t"]["name"] == "t1"
+    assert [e["id"] for e in record["p"]] == [1, 3, 2]
+    assert record["c"] == decode_agtype(C)
+    assert record["s"] == "x"
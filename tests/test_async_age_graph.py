@@ -0,0 +1,51 @@
+"""AsyncAGEGraph tests"""
+import asyncio
+
+import logfire
+
+# pylint: disable=E0401
+from bot.graph.async_age_graph import AsyncAGEGraph
+from bot.graph.ontology.age import BusinessDomain, PhysicalTable, MetadataHelper
+from bot.settings import settings
+
+# 配置日志
+logfire.configure(environment='local', send_to_logfire=False)
+
+
+def _graph() -> AsyncAGEGraph:
+    return AsyncAGEGraph(graph_name=settings.get_setting("age.graph"),
+                         dsn=settings.get_setting("age.dsn"))
+
+
+def test_query():
+    """查询"""
+    async def _run():
+        async with _graph() as graph:
+            assert graph.schema
+            return await graph.query("MATCH (n:BusinessDomain {name:%s}) RETURN n",
+                                     params=("财务", ))
+    result = asyncio.run(_run())
+    assert result[0]["n"]["name"] == "财务"
+
+
+def test_concurrent_queries():
+    """并发查询共享连接池"""
+    async def _run():
+        async with _graph() as graph:
+            return await asyncio.gather(*[
+                graph.query("MATCH (n:BusinessDomain) RETURN n LIMIT 1") for _ in range(8)])
+    results = asyncio.run(_run())
+    assert all(r[0]["n"]["label"] == "BusinessDomain" for r in results)
+
+
+def test_metadata_helper():
+    """元模型查询"""
+    async def _run():
+        async with _graph() as graph:
+            helper = MetadataHelper()
+            domains = await helper.aquery("MATCH (n:BusinessDomain) RETURN n LIMIT 1", graph)
+            tables = await helper.aquery("MATCH (n:PhysicalTable) RETURN n LIMIT 1", graph)
+            return domains, tables
+    domains, tables = asyncio.run(_run())
+    assert isinstance(domains[0][0], BusinessDomain)
+    assert isinstance(tables[0][0], PhysicalTable)
@@ -0,0 +1,70 @@
+"""chat_app tests"""
+import asyncio
+import json
+
+import kuzu
+
+# pylint: disable=E0401
+from bot import chat_app
+from bot.chat_app import ModelMessageStream
+from bot.models import embedding
+from bot.settings import settings
+
+TIMESTAMP = "2025-01-01T00:00:00+00:00"
+FRAGMENTS = ["表 ", "\"s.t1\"", " 有 3 列", "\n\n [Tools] 'cypher_query' 开始 \n\n", "",
+             "完成。"]
+
+
+def _lines(mode):
+    stream = ModelMessageStream(TIMESTAMP, mode)
+    lines = [stream.push(f) for f in FRAGMENTS]
+    assert all(l.endswith(b"\n") and l.count(b"\n") == 1 for l in lines)
+    return [json.loads(l) for l in lines]
+
+
+def test_snapshot_mode():
+    """每行是截至当前的完整回复，最后一行为全文"""
+    events = _lines("snapshot")
+    assert [e["content"] for e in events] == \
+        ["".join(FRAGMENTS[:i + 1]) for i in range(len(FRAGMENTS))]
+    assert events[-1] == {"role": "model", "timestamp": TIMESTAMP, "content": "".join(FRAGMENTS)}
+
+
+def test_delta_mode():
+    """seq 从 1 连续递增，片段按序拼接还原全文"""
+    events = _lines("delta")
+    assert [e["seq"] for e in events] == list(range(1, len(FRAGMENTS) + 1))
+    assert all(e["role"] == "model" and e["timestamp"] == TIMESTAMP for e in events)
+    assert "".join(e["delta"] for e in sorted(events, key=lambda e: e["seq"])) == "".join(FRAGMENTS)
+
+
+def test_delta_matches_snapshots():
+    """每个增量等于相邻两次快照之差"""
+    snapshots = [""] + [e["content"] for e in _lines("snapshot")]
+    deltas = _lines("delta")
+    for prev, cur, event in zip(snapshots, snapshots[1:], deltas):
+        assert cur == prev + event["delta"]
+
+
+def test_no_embedding_skips_model(monkeypatch, tmp_path):
+    """--no-embedding 启动和关闭服务都不构建向量化模型"""
+    loads = []
+    monkeypatch.setattr(embedding, "_embedder", None)
+    monkeypatch.setattr(embedding, "_pipeline", None)
+    monkeypatch.setattr(embedding, "load_embedder", loads.append)
+    monkeypatch.setattr(embedding, "get_pipeline", lambda: loads.append("pipeline"))
+    monkeypatch.setattr(chat_app, "NO_EMBEDDING", True)
+    db_path = str(tmp_path / "kuzu")
+    kuzu.Database(db_path).close()
+    monkeypatch.setattr(settings, "settings", {
+        "current_graph": "kuzu",
+        "kuzu": {"database": db_path},
+        "chromadb": {"persist_directory": str(tmp_path / "chroma")},
+    })
+
+    async def serve():
+        async with chat_app.lifespan(chat_app.app) as state:
+            assert state["retriever"] is None
+
+    asyncio.run(serve())
+    assert not loads
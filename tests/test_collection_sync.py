@@ -0,0 +1,107 @@
+"""chroma 集合增量同步 tests"""
+import uuid
+
+import chromadb
+import pytest
+from chromadb.api.types import EmbeddingFunction
+
+# pylint: disable=E0401
+from make_vector.collection_sync import (Chunk, SyncCheckpoint, dict_chunks, live_collection,
+                                         swap_collection, sync_collection)
+
+
+class _Embedding(EmbeddingFunction):
+    """记录向量化文本的函数"""
+    def __init__(self):
+        self.texts = []
+
+    def __call__(self, input): # pylint: disable=redefined-builtin
+        self.texts.extend(input)
+        return [[float(len(t)), 1.0] for t in input]
+
+
+@pytest.fixture(name="client")
+def fixture_client():
+    """内存 chroma 客户端"""
+    return chromadb.EphemeralClient()
+
+
+@pytest.fixture(name="name")
+def fixture_name():
+    """每个用例独立的集合名称"""
+    return f"names-{uuid.uuid4().hex[:8]}"
+
+
+def test_sync_in_place(client, name):
+    """只对新增和变化的文档向量化，删除不存在的 id"""
+    emb = _Embedding()
+    collection = client.create_collection(name, embedding_function=emb)
+    docs = {"1": "a", "2": "b", "3": "c"}
+    stats = sync_collection(collection, dict_chunks(docs, 2), emb, batch_size=2)
+    assert stats.added == 3 and collection.count() == 3
+
+    emb.texts.clear()
+    docs = {"1": "a", "2": "bb", "4": "d"}
+    stats = sync_collection(collection, dict_chunks(docs, 1), emb, batch_size=2, workers=2)
+    assert stats.as_dict() == {"added": 1, "updated": 1, "deleted": 1, "unchanged": 1, "resumed": 0}
+    assert sorted(emb.texts) == ["bb", "d"]
+    got = collection.get(include=["documents"])
+    assert dict(zip(got["ids"], got["documents"])) == {"1": "a", "2": "bb", "4": "d"}
+
+
+def test_swap(client, name):
+    """蓝绿同步复制未变化的向量，旧集合保留并可继续查询"""
+    emb = _Embedding()
+    stats = swap_collection(client, name, dict_chunks({"1": "a", "2": "b"}, 10), emb)
+    assert stats.added == 2
+    live = client.get_collection(name, embedding_function=emb)
+
+    emb.texts.clear()
+    stats = swap_collection(client, name, dict_chunks({"1": "a", "3": "ccc"}, 1), emb)
+    assert stats.as_dict() == {"added": 1, "updated": 0, "deleted": 1, "unchanged": 1, "resumed": 0}
+    assert emb.texts == ["ccc"]
+    current = client.get_collection(name, embedding_function=emb)
+    assert sorted(current.get()["ids"]) == ["1", "3"]
+    # 已持有的旧集合对象仍然可用
+    assert sorted(live.get()["ids"]) == ["1", "2"]
+    assert name + "-staging" not in [c.name for c in client.list_collections()]
+
+
+def test_live_collection(client, name):
+    """按名称解析正式集合，交换名称的间隙中取到 -previous 的旧版本"""
+    emb = _Embedding()
+    swap_collection(client, name, dict_chunks({"1": "a"}, 10), emb)
+    swap_collection(client, name, dict_chunks({"2": "b"}, 10), emb)
+    assert live_collection(client, name).get()["ids"] == ["2"]
+    # 模拟交换过程：旧 -previous 已删除，正式集合已改名，暂存集合尚未改名
+    client.delete_collection(name + "-previous")
+    live_collection(client, name).modify(name=name + "-previous")
+    assert live_collection(client, name).get()["ids"] == ["2"]
+    # 第三次交换删除上一轮的 -previous 后，按名称解析仍然可用
+    swap_collection(client, name, dict_chunks({"3": "c"}, 10), emb)
+    assert live_collection(client, name).get()["ids"] == ["3"]
+
+
+def test_resume(client, name, tmp_path):
+    """中断后从最后提交的分块继续，已提交分块的 id 不会被当作删除"""
+    emb = _Embedding()
+    collection = client.create_collection(name, embedding_function=emb)
+    path = tmp_path / "sync.json"
+    chunks = [Chunk("v_A.csv", 0, {"1": "a"}), Chunk("v_A.csv", 1, {"2": "b"}),
+              Chunk("v_A.csv", 2, {"3": "c"})]
+
+    def crash():
+        yield from chunks[:2]
+        raise RuntimeError("crash")
+
+    with pytest.raises(RuntimeError):
+        sync_collection(collection, crash(), emb, checkpoint_path=path)
+    # 第二块仍在途，没有提交
+    assert SyncCheckpoint(path, name).progress == {"v_A.csv": 1}
+
+    emb.texts.clear()
+    stats = sync_collection(collection, chunks, emb, checkpoint_path=path)
+    assert stats.resumed == 1 and stats.added == 2 and stats.deleted == 0
+    assert emb.texts == ["b", "c"]
+    assert collection.count() == 3
+    assert not path.exists()
@@ -0,0 +1,84 @@
+"""CPUEmbedder 分桶批处理 tests (模型替换为按 token 计算向量的假模型)"""
+import math
+from types import SimpleNamespace
+
+import pytest
+import torch
+
+# pylint: disable=E0401
+from bot.models import cpu_embedding
+from bot.models.cpu_embedding import CPUEmbedder
+
+DIM = 8
+MAX_LENGTH = 64
+
+
+class _Tokenizer:
+    """每个词一个 token，id 为词长加一，首位 1 代表 [CLS]，0 为填充"""
+
+    def __call__(self, texts, truncation=True, max_length=512, padding=None,
+                 return_tensors=None):
+        assert truncation
+        ids = [([1] + [len(w) + 1 for w in t.split()])[:max_length] for t in texts]
+        if return_tensors is None:
+            return {"input_ids": ids}
+        assert padding == "max_length"
+        return {"input_ids": torch.tensor([i + [0] * (max_length - len(i)) for i in ids])}
+
+
+class _Model:
+    """[CLS] 位置输出 (id 之和, 非填充 token 数, 填充长度, 0...)，记录每次前向的形状"""
+
+    def __init__(self):
+        self.shapes = []
+
+    def eval(self):
+        return self
+
+    def __call__(self, input_ids):
+        self.shapes.append(tuple(input_ids.shape))
+        batch, length = input_ids.shape
+        hidden = torch.zeros(batch, length, DIM)
+        hidden[:, 0, 0] = input_ids.sum(dim=1).float()
+        hidden[:, 0, 1] = (input_ids > 0).sum(dim=1).float()
+        hidden[:, 0, 2] = float(length)
+        return SimpleNamespace(last_hidden_state=hidden)
+
+
+@pytest.fixture(name="model")
+def _model(monkeypatch):
+    model = _Model()
+    monkeypatch.setattr(cpu_embedding, "AutoTokenizer",
+                        SimpleNamespace(from_pretrained=lambda _: _Tokenizer()))
+    monkeypatch.setattr(cpu_embedding, "AutoModel",
+                        SimpleNamespace(from_pretrained=lambda _: model))
+    return model
+
+
+def _expected(text):
+    ids = ([1] + [len(w) + 1 for w in text.split()])[:MAX_LENGTH]
+    bucket = 32 if len(ids) <= 32 else 64
+    return [float(sum(ids)), float(len(ids)), float(bucket)] + [0.0] * (DIM - 3)
+
+
+def test_bucketed_order(model):
+    """长短文本交错输入，按长度分组推理后仍按输入顺序返回"""
+    embedder = CPUEmbedder("gte", max_length=MAX_LENGTH, quantize=False, normalize=False,
+                           batch_size=2)
+    texts = ["a " * 40, "表", "bb " * 10, "c " * 100, "dd ee", "f " * 45, "g"]
+    vectors = embedder(texts)
+    assert vectors == [_expected(t) for t in texts]
+    assert all(len(v) == DIM for v in vectors)
+    # 不超过 32 个 token 的填充到 32，其余填充到 64（超长截断），每次前向不超过 batch_size
+    assert model.shapes == [(2, 32), (2, 32), (2, 64), (1, 64)]
+    assert embedder([]) == []
+
+
+def test_normalized(model):
+    """归一化后为单位向量，维度不变"""
+    embedder = CPUEmbedder("gte", max_length=MAX_LENGTH, quantize=False, batch_size=4)
+    vectors = embedder(["a b c", "表 字段"])
+    assert [len(v) for v in vectors] == [DIM, DIM]
+    assert all(math.isclose(math.sqrt(sum(x * x for x in v)), 1.0, rel_tol=1e-6)
+               for v in vectors)
+    assert len(model.shapes) == 1
@@ -0,0 +1,70 @@
+"""向量化模型延迟加载 tests"""
+import sys
+import threading
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor
+
+# pylint: disable=E0401
+from bot.models import embedding
+
+THREADS = 8
+
+
+def _slow(loads, value):
+    """记录构建次数，构建耗时足以让并发的首次调用重叠"""
+    def build(*args, **kwargs):
+        loads.append((args, kwargs))
+        time.sleep(0.05)
+        return value
+    return build
+
+
+def _concurrently(fn):
+    barrier = threading.Barrier(THREADS)
+
+    def call(_):
+        barrier.wait()
+        return fn()
+
+    with ThreadPoolExecutor(THREADS) as pool:
+        return list(pool.map(call, range(THREADS)))
+
+
+def test_embedder_built_once(monkeypatch):
+    """并发的首次调用只构建一次向量化函数"""
+    loads = []
+    monkeypatch.setattr(embedding, "_embedder", None)
+    monkeypatch.setattr(embedding, "embedding_backend", lambda: "torch")
+    monkeypatch.setattr(embedding, "load_embedder",
+                        _slow(loads, lambda texts: [[float(len(t))] for t in texts]))
+    results = _concurrently(lambda: embedding.embed_texts(["ab"]))
+    assert len(loads) == 1 and loads[0][0] == ("torch",)
+    assert results == [[[2.0]]] * THREADS
+
+
+def test_pipeline_built_once(monkeypatch):
+    """modelscope pipeline 同样只构建一次，导入 modelscope 推迟到首次调用"""
+    loads = []
+    pipeline = object()
+    pipelines = types.ModuleType("modelscope.pipelines")
+    pipelines.pipeline = _slow(loads, pipeline)  # type: ignore[attr-defined]
+    constant = types.ModuleType("modelscope.utils.constant")
+    constant.Tasks = types.SimpleNamespace(  # type: ignore[attr-defined]
+        sentence_embedding="sentence-embedding")
+    monkeypatch.setitem(sys.modules, "modelscope.pipelines", pipelines)
+    monkeypatch.setitem(sys.modules, "modelscope.utils.constant", constant)
+    monkeypatch.setattr(embedding, "_pipeline", None)
+    monkeypatch.setattr(embedding, "embedding_model_id", lambda: "gte")
+    assert _concurrently(embedding.get_pipeline) == [pipeline] * THREADS
+    assert loads == [(("sentence-embedding",), {"model": "gte",
+                                               "sequence_length": embedding.SEQUENCE_LENGTH})]
+
+
+def test_service_created_once(monkeypatch):
+    """并发的首次调用只创建一个向量化服务（及其工作线程）"""
+    created = []
+    monkeypatch.setattr(embedding, "_service", None)
+    monkeypatch.setattr(embedding, "EmbeddingService", _slow(created, object()))
+    services = _concurrently(embedding.get_embedding_service)
+    assert len(created) == 1 and all(s is services[0] for s in services)
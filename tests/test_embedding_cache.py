@@ -0,0 +1,62 @@
+"""EmbeddingCache tests"""
+# pylint: disable=E0401
+from bot.models.embedding_cache import EmbeddingCache
+
+
+class _Model:
+    """记录推理文本的模型"""
+    def __init__(self):
+        self.seen = []
+
+    def __call__(self, texts):
+        self.seen.extend(texts)
+        return [[float(len(t)), 0.5] for t in texts]
+
+
+def test_only_misses_embedded(tmp_path):
+    """只对未命中的文本推理，重复文本只推理一次"""
+    model = _Model()
+    cache = EmbeddingCache("m", 512, path=tmp_path / "e.sqlite")
+    assert cache.embed(["a", "bb", "a"], model) == [[1.0, 0.5], [2.0, 0.5], [1.0, 0.5]]
+    assert model.seen == ["a", "bb"]
+    assert cache.embed(["bb", "ccc"], model) == [[2.0, 0.5], [3.0, 0.5]]
+    assert model.seen == ["a", "bb", "ccc"]
+    stats = cache.stats()
+    assert stats.memory_hits == 1
+    assert stats.misses == 3
+    cache.close()
+
+
+def test_persistent(tmp_path):
+    """重新打开后从磁盘命中"""
+    path = tmp_path / "e.sqlite"
+    first = EmbeddingCache("m", 512, path=path)
+    first.embed(["财务"], _Model())
+    first.close()
+
+    model = _Model()
+    second = EmbeddingCache("m", 512, path=path)
+    assert second.embed(["财务"], model) == [[2.0, 0.5]]
+    assert not model.seen
+    assert second.stats().disk_hits == 1
+    second.close()
+
+
+def test_key_includes_model_and_seq_len(tmp_path):
+    """模型或截断长度不同不共用缓存"""
+    path = tmp_path / "e.sqlite"
+    EmbeddingCache("m", 512, path=path).embed(["x"], _Model())
+    for model_id, seq_len in (("other", 512), ("m", 128)):
+        model = _Model()
+        EmbeddingCache(model_id, seq_len, path=path).embed(["x"], model)
+        assert model.seen == ["x"]
+
+
+def test_memory_only():
+    """不落盘"""
+    model = _Model()
+    cache = EmbeddingCache("m", 512, path=None, memory_items=1)
+    cache.embed(["a"], model)
+    cache.embed(["b"], model)
+    cache.embed(["a"], model)
+    assert model.seen == ["a", "b", "a"]
@@ -0,0 +1,71 @@
+"""EmbeddingService tests"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+# pylint: disable=E0401
+from bot.models.embedding_service import EmbeddingService
+
+
+class _Model:
+    """记录每批文本的模型"""
+    def __init__(self):
+        self.batches = []
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def __call__(self, texts):
+        self.gate.wait()
+        self.batches.append(list(texts))
+        return [[float(len(t))] for t in texts]
+
+
+def test_results_in_order():
+    """结果与输入顺序一致"""
+    service = EmbeddingService(_Model(), max_batch_size=4, max_wait_ms=1)
+    assert service.embed(["a", "bb", "ccc"]) == [[1.0], [2.0], [3.0]]
+    assert service.embed([]) == []
+    service.close()
+
+
+def test_concurrent_requests_coalesced():
+    """并发请求合并为批次"""
+    model = _Model()
+    model.gate.clear()
+    service = EmbeddingService(model, max_batch_size=8, max_wait_ms=50)
+    # 第一个请求阻塞在推理中，其余请求排队后合并
+    first = service.submit(["x"])
+    futures = [service.submit(["y" * (i + 1)]) for i in range(6)]
+    model.gate.set()
+    assert first.result() == [[1.0]]
+    assert [f.result() for f in futures] == [[[float(i + 1)]] for i in range(6)]
+    service.close()
+    stats = service.stats()
+    assert stats.requests == 7
+    assert stats.texts == 7
+    assert stats.batches < 7
+    assert max(len(b) for b in model.batches) <= 8
+
+
+def test_large_request_split():
+    """超过批次上限的请求分段推理"""
+    model = _Model()
+    service = EmbeddingService(model, max_batch_size=3, max_wait_ms=1)
+    assert len(service.embed([str(i) for i in range(10)])) == 10
+    service.close()
+    assert [len(b) for b in model.batches] == [3, 3, 3, 1]
+
+
+def test_error_propagated():
+    """推理异常传给同批次的所有请求"""
+    def _fail(_texts):
+        raise RuntimeError("boom")
+    service = EmbeddingService(_fail, max_batch_size=4, max_wait_ms=1)
+    with ThreadPoolExecutor(max_workers=2) as ex:
+        futures = [ex.submit(service.embed, ["a"]) for _ in range(2)]
+        for f in futures:
+            with pytest.raises(RuntimeError):
+                f.result()
+    service.close()
+    assert service.stats().errors >= 1
@@ -0,0 +1,76 @@
+"""graph_index tests (不连接数据库)"""
+import pytest
+
+# pylint: disable=E0401
+from make_graph.graph_index import age_index_statements, plan_status, summarize_plan
+
+
+def test_vertex_statements():
+    """节点label：id、properties GIN 和属性表达式索引"""
+    stmts = age_index_statements("graph", "PhysicalTable", "v", ["nid", "full_table_name"])
+    assert stmts == [
+        'CREATE INDEX IF NOT EXISTS "PhysicalTable_id_idx" '
+        'ON "graph"."PhysicalTable" USING btree (id)',
+        'CREATE INDEX IF NOT EXISTS "PhysicalTable_properties_idx" '
+        'ON "graph"."PhysicalTable" USING gin (properties)',
+        'CREATE INDEX IF NOT EXISTS "PhysicalTable_nid_idx" ON "graph"."PhysicalTable" '
+        "USING btree (ag_catalog.agtype_access_operator(VARIADIC ARRAY[properties, "
+        "'\"nid\"'::agtype]))",
+        'CREATE INDEX IF NOT EXISTS "PhysicalTable_full_table_name_idx" '
+        'ON "graph"."PhysicalTable" USING btree (ag_catalog.agtype_access_operator('
+        "VARIADIC ARRAY[properties, '\"full_table_name\"'::agtype]))",
+    ]
+
+
+def test_edge_statements():
+    """边label：id、start_id、end_id 索引，不建属性索引"""
+    stmts = age_index_statements("graph", "HAS_COLUMN", "e", ["name"])
+    assert [s.split(" USING ")[1] for s in stmts] == \
+        ["btree (id)", "btree (start_id)", "btree (end_id)"]
+
+
+def test_statements_idempotent():
+    """所有语句都可重复执行"""
+    for kind in ("v", "e"):
+        for stmt in age_index_statements("graph", "Column", kind, ["name"]):
+            assert stmt.startswith("CREATE INDEX IF NOT EXISTS ")
+
+
+def test_identifier_quoting():
+    """名称中的引号转义，索引名不超过 63 字节"""
+    stmts = age_index_statements('my"graph', "Col", "v", ["it's"])
+    assert stmts[0] == 'CREATE INDEX IF NOT EXISTS "Col_id_idx" ON "my""graph"."Col" USING btree (id)'
+    assert stmts[-1].endswith("""ARRAY[properties, '"it''s"'::agtype]))""")
+    long_label = "L" * 80
+    stmt = age_index_statements("graph", long_label, "e")[1]
+    assert f'EXISTS "{"L" * 63}" ON' in stmt
+
+
+PLAN = [
+    "Nested Loop  (cost=0.56..16.61 rows=1 width=32)",
+    '  ->  Index Scan using "PhysicalTable_full_table_name_idx" on "PhysicalTable" t  (cost=...)',
+    "  ->  Bitmap Heap Scan on \"HAS_COLUMN\" r  (cost=...)",
+    "        ->  Bitmap Index Scan on \"HAS_COLUMN_start_id_idx\"  (cost=...)",
+    '  ->  Index Only Scan Backward using "Column_id_idx" on "Column" c  (cost=...)',
+]
+
+
+def test_summarize_plan():
+    """区分索引扫描与顺序扫描"""
+    assert summarize_plan(PLAN) == {
+        "index": ['"PhysicalTable_full_table_name_idx" on "PhysicalTable"',
+                  '"HAS_COLUMN_start_id_idx"',
+                  '"Column_id_idx" on "Column"'],
+        "seq": [],
+    }
+
+
+@pytest.mark.parametrize("plan, status", [
+    (PLAN, "OK"),
+    (PLAN + ['  ->  Parallel Seq Scan on "Column" c  (cost=...)'], "PARTIAL"),
+    (['Seq Scan on "PhysicalTable" t  (cost=0.00..1.10 rows=1 width=32)'], "SEQ"),
+    (["Result  (cost=0.00..0.01 rows=1 width=32)"], "SEQ"),
+])
+def test_plan_status(plan, status):
+    """全部走索引为 OK，混有顺序扫描为 PARTIAL"""
+    assert plan_status(summarize_plan(plan)) == status
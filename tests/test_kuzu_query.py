@@ -0,0 +1,82 @@
+"""KuzuGraph 查询结果读取 tests (本地临时数据库)"""
+from concurrent.futures import ThreadPoolExecutor
+
+import kuzu
+import pytest
+
+# pylint: disable=E0401
+from bot.graph.kuzu_graph import KuzuGraph, KuzuQueryException
+from bot.graph.kuzu_pool import KuzuConnectionPool, KuzuPoolTimeout
+from bot.graph.schema_cache import SchemaCache
+
+
+@pytest.fixture(scope="module")
+def graph(tmp_path_factory):
+    """两个节点一条边的临时数据库"""
+    path = str(tmp_path_factory.mktemp("kuzu") / "db")
+    db = kuzu.Database(path)
+    conn = kuzu.Connection(db)
+    conn.execute("CREATE NODE TABLE PhysicalTable(nid STRING, name STRING, PRIMARY KEY (nid))")
+    conn.execute("CREATE REL TABLE FLOWS_TO(FROM PhysicalTable TO PhysicalTable, nid STRING)")
+    conn.execute("CREATE (:PhysicalTable {nid: 't1', name: 'a'}), (:PhysicalTable {nid: 't2', name: 'b'})")
+    conn.execute("""MATCH (a:PhysicalTable {nid: 't1'}), (b:PhysicalTable {nid: 't2'})
+                    CREATE (a)-[:FLOWS_TO {nid: 'f1'}]->(b)""")
+    conn.close()
+    db.close()
+    g = KuzuGraph(path, schema_cache=SchemaCache(enabled=False), pool_max_size=2)
+    yield g
+    g.close()
+
+
+def test_query_rows(graph):
+    """节点、边、路径按列名返回"""
+    rows = graph.query("MATCH p = (a)-[r]->(b) RETURN a, r, p, b.name AS name")
+    assert len(rows) == 1
+    row = rows[0]
+    assert list(row) == ["a", "r", "p", "name"]
+    assert row["a"]["_label"] == "PhysicalTable"
+    assert row["r"]["nid"] == "f1"
+    assert [n["nid"] for n in row["p"]["_nodes"]] == ["t1", "t2"]
+    assert row["name"] == "b"
+
+
+def test_iter_query_is_lazy(graph):
+    """iter_query 逐行返回"""
+    it = graph.iter_query("MATCH (n:PhysicalTable) RETURN n.nid AS nid ORDER BY nid")
+    assert next(it) == {"nid": "t1"}
+    assert [r["nid"] for r in it] == ["t2"]
+
+
+def test_query_params(graph):
+    """参数化查询"""
+    rows = graph.query("MATCH (n:PhysicalTable {nid: $nid}) RETURN n.name AS name", {"nid": "t2"})
+    assert rows == [{"name": "b"}]
+
+
+def test_query_error(graph):
+    """查询错误"""
+    with pytest.raises(KuzuQueryException):
+        graph.query("MATCH (n:Missing) RETURN n")
+
+
+def test_concurrent_queries(graph):
+    """多线程并发查询，各自取出独立连接"""
+    with ThreadPoolExecutor(max_workers=8) as ex:
+        results = list(ex.map(
+            lambda _: graph.query("MATCH (n:PhysicalTable) RETURN count(n) AS c"), range(16)))
+    assert all(r == [{"c": 2}] for r in results)
+    stats = graph.pool_stats()
+    assert stats.in_use == 0
+    assert stats.size <= graph.pool.max_size
+
+
+def test_pool_timeout(graph):
+    """连接耗尽时等待，超时抛出异常"""
+    pool = KuzuConnectionPool(graph.db, max_size=1, timeout=0.1)
+    with pool.connection():
+        with pytest.raises(KuzuPoolTimeout):
+            with pool.connection():
+                pass
+    assert pool.stats().waits == 1
+    assert pool.stats().wait_time_total > 0
+    pool.close()
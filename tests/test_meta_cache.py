@@ -0,0 +1,111 @@
+"""MetaObjectCache tests"""
+import asyncio
+import threading
+
+# pylint: disable=E0401
+from bot.graph import meta_cache
+from bot.graph.meta_cache import MetaObjectCache, sizeof_meta
+from bot.graph.schema_cache import SchemaCache
+from bot.graph.ontology.age import BusinessDomain
+
+
+def _domain(i: int) -> BusinessDomain:
+    return BusinessDomain(id=str(i), name=f"域{i}", code=f"D{i}", node="BusinessDomain")
+
+
+def test_hit_miss():
+    """命中与未命中计数"""
+    cache = MetaObjectCache()
+    scope = ("g", "v1")
+    assert cache.get(scope, "BusinessDomain", "1") is None
+    cache.put(scope, "BusinessDomain", "1", _domain(1))
+    assert cache.get(scope, "BusinessDomain", "1") == _domain(1)
+    stats = cache.stats()
+    assert (stats.hits, stats.misses, stats.entries) == (1, 1, 1)
+    assert stats.bytes == sizeof_meta(_domain(1))
+
+
+def test_lru_eviction_by_bytes():
+    """超出字节上限时淘汰最久未使用的对象"""
+    size = sizeof_meta(_domain(1))
+    cache = MetaObjectCache(max_bytes=size * 2)
+    scope = ("g", "v1")
+    cache.put(scope, "BusinessDomain", "1", _domain(1))
+    cache.put(scope, "BusinessDomain", "2", _domain(2))
+    cache.get(scope, "BusinessDomain", "1")
+    cache.put(scope, "BusinessDomain", "3", _domain(3))
+    assert cache.get(scope, "BusinessDomain", "2") is None
+    assert cache.get(scope, "BusinessDomain", "1") is not None
+    assert cache.stats().evictions == 1
+    assert cache.stats().bytes <= size * 2
+
+
+class _Graph:
+    """只提供标识与指纹的图"""
+    graph_key = "g"
+
+    def __init__(self):
+        self.version = "v1"
+        self.calls = 0
+
+    def fingerprint(self):
+        self.calls += 1
+        return self.version
+
+
+def test_version_change_invalidates():
+    """指纹变化时丢弃该图的旧对象"""
+    cache = MetaObjectCache(check_interval=0)
+    graph = _Graph()
+    scope = cache.scope(graph)
+    cache.put(scope, "BusinessDomain", "1", _domain(1))
+    cache.put(("other", "v1"), "BusinessDomain", "1", _domain(1))
+    graph.version = "v2"
+    assert cache.scope(graph) != scope
+    stats = cache.stats()
+    assert stats.entries == 1
+    assert stats.invalidations == 1
+
+
+def test_version_check_throttled():
+    """检查间隔内不重复获取指纹"""
+    cache = MetaObjectCache(check_interval=60)
+    graph = _Graph()
+    cache.scope(graph)
+    cache.scope(graph)
+    assert graph.calls == 1
+
+
+def test_generation_bump_invalidates(tmp_path, monkeypatch):
+    """导入脚本使 schema 缓存失效后，检查间隔内也立即丢弃旧对象"""
+    schema_cache = SchemaCache(tmp_path)
+    monkeypatch.setattr(meta_cache, "get_schema_cache", lambda: schema_cache)
+    cache = MetaObjectCache(check_interval=60)
+    graph = _Graph()
+    scope = cache.scope(graph)
+    cache.put(scope, "BusinessDomain", "1", _domain(1))
+    schema_cache.invalidate("g")
+    assert cache.scope(graph) != scope
+    assert graph.calls == 2
+    assert cache.stats().entries == 0
+
+
+def test_ascope_reads_generation_in_thread(monkeypatch):
+    """异步版本在线程池中读取代次标记，不阻塞事件循环"""
+    threads = []
+
+    class _SchemaCache:
+        def generation(self, key):
+            threads.append(threading.current_thread())
+            return "1"
+
+    class _AsyncGraph:
+        graph_key = "g"
+
+        async def fingerprint(self):
+            return "v1"
+
+    monkeypatch.setattr(meta_cache, "get_schema_cache", _SchemaCache)
+    cache = MetaObjectCache(check_interval=60)
+    assert asyncio.run(cache.ascope(_AsyncGraph())) == ("g", "1:v1")
+    assert threads and threading.main_thread() not in threads
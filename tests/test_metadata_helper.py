@@ -0,0 +1,181 @@
+"""MetadataHelper tests (不连接数据库)"""
+import asyncio
+
+import pytest
+
+# pylint: disable=E0401
+from bot.graph.base_graph import AsyncMetadataHelper, BaseGraph
+from bot.graph.pool import ConnectionPool
+from bot.graph.meta_cache import MetaObjectCache
+from bot.graph.result_cache import QueryResultCache
+from bot.graph.ontology import age as ontology
+from bot.graph.ontology.age import PhysicalTable, MetadataHelper
+from bot.graph.ontology.kuzu import MetadataHelper as KuzuMetadataHelper
+
+
+def _table(i: int) -> dict:
+    return {"id": 1000 + i, "label": "PhysicalTable", "name": f"t{i}", "schema": "s",
+            "table_name": f"t{i}", "full_table_name": f"s.t{i}"}
+
+
+class _FakeGraph(BaseGraph):
+    """记录查询次数的图"""
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = []
+        self.params = []
+        self.version = "v1"
+
+    def fingerprint(self) -> str:
+        return self.version
+
+    @property
+    def schema(self) -> str:
+        return ""
+
+    def refresh_schema(self) -> None:
+        pass
+
+    def query(self, query, params=None):
+        self.queries.append(query)
+        self.params.append(params)
+        if "HAS_COLUMN" in query:
+            return [{"tn": f"s.t{i}",
+                     "c": {"id": 2000 + i * 10 + j, "label": "Column", "name": f"c{j}"}}
+                    for i in range(3) for j in range(2) if f"s.t{i}" in params["names"]]
+        return self.rows
+
+
+def test_columns_loaded_in_one_query():
+    """多张物理表的字段一次查询加载"""
+    graph = _FakeGraph([{"t": _table(i)} for i in range(3)] + [{"t": _table(0)}])
+    result = MetadataHelper(MetaObjectCache()).query("MATCH (t:PhysicalTable) RETURN t", graph)
+    assert len(graph.queries) == 2
+    assert all(isinstance(r[0], PhysicalTable) for r in result)
+    assert [c.name for c in result[1][0].columns] == ["c0", "c1"]
+    # 同一结果中重复的表共用实例，字段不重复挂载
+    assert result[0][0] is result[3][0]
+    assert len(result[0][0].columns) == 2
+
+
+def test_cached_tables_skip_column_query():
+    """缓存命中的物理表不再查询字段"""
+    graph = _FakeGraph([{"t": _table(0)}])
+    helper = MetadataHelper(MetaObjectCache())
+    helper.query("MATCH (t:PhysicalTable) RETURN t", graph)
+    helper.query("MATCH (t:PhysicalTable) RETURN t", graph)
+    assert sum("HAS_COLUMN" in q for q in graph.queries) == 1
+
+
+def test_graph_version_change_reloads():
+    """图重新导入（指纹变化）后不再使用旧对象"""
+    graph = _FakeGraph([{"t": _table(0)}])
+    helper = MetadataHelper(MetaObjectCache(check_interval=0))
+    first = helper.query("MATCH (t:PhysicalTable) RETURN t", graph)
+    graph.version = "v2"
+    second = helper.query("MATCH (t:PhysicalTable) RETURN t", graph)
+    assert first[0][0] is not second[0][0]
+    assert sum("HAS_COLUMN" in q for q in graph.queries) == 2
+
+
+def test_column_query_parameterized(monkeypatch):
+    """分批加载字段时各批次的语句相同，表名以参数传入"""
+    monkeypatch.setattr(ontology, "COLUMNS_BATCH_SIZE", 2)
+    graph = _FakeGraph([{"t": _table(i)} for i in range(3)])
+    MetadataHelper(MetaObjectCache()).query("MATCH (t:PhysicalTable) RETURN t", graph)
+    column_queries = [q for q in graph.queries if "HAS_COLUMN" in q]
+    assert len(column_queries) == 2 and len(set(column_queries)) == 1
+    assert "s.t0" not in column_queries[0]
+    assert [p["names"] for p in graph.params[1:]] == [["s.t0", "s.t1"], ["s.t2"]]
+
+
+def test_limit_and_stream(monkeypatch):
+    """限定行数时只读取所需的行，流式查询按块加载字段"""
+    monkeypatch.setattr(ontology, "STREAM_CHUNK_SIZE", 2)
+    graph = _FakeGraph([{"t": _table(i)} for i in range(3)])
+    helper = MetadataHelper(MetaObjectCache(), results=None)
+    assert [r[0].name for r in helper.query("MATCH (t:PhysicalTable) RETURN t", graph, limit=2)] \
+        == ["t0", "t1"]
+
+    graph = _FakeGraph([{"t": _table(i)} for i in range(3)])
+    rows = list(MetadataHelper(MetaObjectCache()).iter_query("MATCH (t:PhysicalTable) RETURN t",
+                                                             graph))
+    assert [len(r[0].columns) for r in rows] == [2, 2, 2]
+    assert [p["names"] for p in graph.params[1:] if p] == [["s.t0", "s.t1"], ["s.t2"]]
+
+
+class _PooledGraph(_FakeGraph):
+    """每次查询从连接池取连接，流式读取期间一直占用连接"""
+    def __init__(self, rows, max_size=1):
+        super().__init__(rows)
+        self.pool = ConnectionPool(object, max_size=max_size, timeout=0.2, close=lambda c: None)
+        self.streams = 0
+
+    def session(self):
+        return self.pool.pinned()
+
+    def query(self, query, params=None):
+        with self.pool.connection():
+            return super().query(query, params)
+
+    def iter_query(self, query, params=None):
+        self.streams += 1
+        with self.pool.connection():
+            yield from super().query(query, params)
+
+
+def test_stream_on_single_connection(monkeypatch):
+    """连接池只有一个连接时，流式查询在同一连接上加载字段，不会等待超时"""
+    monkeypatch.setattr(ontology, "STREAM_CHUNK_SIZE", 2)
+    graph = _PooledGraph([{"t": _table(i)} for i in range(3)])
+    rows = list(MetadataHelper(MetaObjectCache()).iter_query("MATCH (t:PhysicalTable) RETURN t",
+                                                             graph))
+    assert [len(r[0].columns) for r in rows] == [2, 2, 2]
+    assert graph.pool.stats().in_use == 0 and graph.pool.stats().checkouts == 1
+
+
+def test_query_without_limit_skips_cursor():
+    """不限定行数的查询一次取回结果，不使用流式读取"""
+    graph = _PooledGraph([{"t": _table(i)} for i in range(3)])
+    helper = MetadataHelper(MetaObjectCache())
+    helper.query("MATCH (t:PhysicalTable) RETURN t", graph)
+    assert graph.streams == 0
+    helper.query("MATCH (t:PhysicalTable) RETURN t", graph, limit=2)
+    assert graph.streams == 1
+
+
+def test_async_helper_is_explicit():
+    """只支持同步图的 Kuzu helper 不提供 aquery，异步 helper 必须实现 aquery"""
+    assert not isinstance(KuzuMetadataHelper(), AsyncMetadataHelper)
+    assert not hasattr(KuzuMetadataHelper, "aquery")
+    assert issubclass(MetadataHelper, AsyncMetadataHelper)
+
+    class _SyncOnly(AsyncMetadataHelper):
+        def query(self, cypher, graph, params=None, limit=None):
+            return []
+
+    with pytest.raises(TypeError):
+        _SyncOnly()  # pylint: disable=abstract-class-instantiated
+
+
+def test_aquery_resolves_scope_once():
+    """异步查询只解析一次缓存范围（代次标记读取一次）"""
+    calls = []
+
+    class _Cache(MetaObjectCache):
+        async def ascope(self, graph):
+            calls.append(graph)
+            return await super().ascope(graph)
+
+    class _AsyncGraph:
+        graph_key = "async-g"
+
+        async def fingerprint(self):
+            return "v1"
+
+        async def query(self, query, params=None):
+            return [{"n": 1}]
+
+    helper = MetadataHelper(_Cache(), results=QueryResultCache())
+    assert asyncio.run(helper.aquery("MATCH (n) RETURN n.x", _AsyncGraph())) == [[1]]
+    assert len(calls) == 1
@@ -0,0 +1,80 @@
+"""NameIndex tests"""
+import asyncio
+import threading
+
+# pylint: disable=E0401
+from bot.name_index import NameIndex, graph_version, parse_doc, rrf
+
+
+def _index():
+    index = NameIndex()
+    index.sync({
+        "1": "Application {name:财务系统}",
+        "2": "Application {name:财务共享平台}",
+        "3": "DataEntity {name:客户}",
+        "4": "BusinessDomain {name:人力资源}",
+    })
+    return index
+
+
+def test_parse_doc():
+    """解析 names 集合文档"""
+    entry = parse_doc("1", "PhysicalTable {name:ods.t_customer}")
+    assert (entry.label, entry.name) == ("PhysicalTable", "ods.t_customer")
+    assert parse_doc("2", "raw").name == "raw"
+
+
+def test_exact_and_prefix():
+    """问题中原样出现的名称，较长的在前；前缀补全"""
+    index = _index()
+    assert [e.id for e in index.exact("财务共享平台和客户有哪些表")] == ["2", "3"]
+    assert [e.id for e in index.get("财务系统")] == ["1"]
+    assert [e.id for e in index.prefix("财务")] == ["1", "2"]
+    assert not index.prefix("销售")
+
+
+def test_search():
+    """BM25 按 n-gram 重合度排序"""
+    index = _index()
+    hits = index.search("财务平台", k=2)
+    assert [e.id for e, _ in hits] == ["2", "1"]
+    assert not index.search("zzz")
+
+
+def test_sync_incremental():
+    """只更新变化的条目，删除的条目不再命中"""
+    index = _index()
+    assert index.sync({
+        "1": "Application {name:财务系统}",
+        "2": "Application {name:费控平台}",
+        "5": "DataEntity {name:供应商}",
+    }) == (1, 1, 2)
+    assert len(index) == 3
+    assert not index.exact("客户")
+    assert not index.get("财务共享平台")
+    assert [e.id for e in index.exact("费控平台的供应商")] == ["2", "5"]
+
+
+def test_rrf():
+    """两路排名都靠前的结果排在最前"""
+    assert rrf([["a", "b", "c"], ["b", "d"]])[:2] == ["b", "a"]
+
+
+def test_graph_version_off_loop():
+    """指纹和集合条目数都在线程池中读取，不阻塞事件循环"""
+    threads = []
+
+    class _Graph:
+        def fingerprint(self):
+            threads.append(threading.current_thread())
+            return "f1"
+
+    class _Collection:
+        id = "c1"
+
+        def count(self):
+            threads.append(threading.current_thread())
+            return 3
+
+    assert asyncio.run(graph_version(_Graph(), _Collection())) == "f1:c1:3"
+    assert len(threads) == 2 and threading.main_thread() not in threads
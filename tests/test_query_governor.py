@@ -0,0 +1,188 @@
+"""QueryGovernor tests (不连接数据库)"""
+import asyncio
+import re
+
+import pytest
+
+# pylint: disable=E0401
+from bot.graph import query_governor as qg
+from bot.graph.base_graph import AsyncBaseGraph, AsyncMetadataHelper, BaseGraph
+from bot.graph.query_governor import (GovernorLimits, InvalidCursor, QueryGovernor, decode_cursor,
+                                      encode_cursor, limits_for, paginate)
+from bot.settings import settings
+
+CYPHER = "MATCH (t:PhysicalTable) RETURN t"
+
+
+@pytest.mark.parametrize("cypher, offset, size, expected", [
+    (CYPHER, 0, 5, (CYPHER + "\nLIMIT 5", 5)),
+    (CYPHER + ";", 10, 5, (CYPHER + "\nSKIP 10\nLIMIT 5", 5)),
+    # 已有的 SKIP/LIMIT 合并到分页范围内
+    (CYPHER + " SKIP 2 LIMIT 12", 10, 5, (CYPHER + "\nSKIP 12\nLIMIT 2", 2)),
+    (CYPHER + " limit 3", 5, 5, (CYPHER + "\nSKIP 5\nLIMIT 0", 0)),
+    # 字符串和注释中的关键字不影响改写
+    ("MATCH (t {name: 'x LIMIT 1'}) RETURN t // LIMIT 9", 0, 5,
+     ("MATCH (t {name: 'x LIMIT 1'}) RETURN t // LIMIT 9\nLIMIT 5", 5)),
+])
+def test_paginate(cypher, offset, size, expected):
+    """追加或合并 SKIP/LIMIT"""
+    assert paginate(cypher, offset, size) == expected
+
+
+@pytest.mark.parametrize("cypher", [
+    "MATCH (a:A) RETURN a.name AS n UNION MATCH (b:B) RETURN b.name AS n",
+    CYPHER + " LIMIT $n",
+    CYPHER + " LIMIT 3 // 注释",
+    "MATCH (t:PhysicalTable) DETACH DELETE t",
+])
+def test_paginate_unsupported(cypher):
+    """无法安全改写的查询"""
+    assert paginate(cypher, 0, 5) is None
+
+
+def test_cursor():
+    """游标绑定查询语句和参数"""
+    cursor = encode_cursor(CYPHER, {"n": 1}, 20)
+    assert decode_cursor(cursor, "  " + CYPHER + ";", {"n": 1}) == 20
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor, CYPHER, {"n": 2})
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor, "MATCH (c:Column) RETURN c", {"n": 1})
+    with pytest.raises(InvalidCursor):
+        decode_cursor("not a cursor!", CYPHER, None)
+
+
+def test_limits_for(monkeypatch):
+    """后端配置覆盖全局配置，工具配置覆盖后端配置"""
+    monkeypatch.setattr(settings, "settings", {"governor": {
+        "max_rows": 100,
+        "age": {"max_estimated_rows": 10, "page_size": 7},
+        "agent": {"page_size": 5, "kuzu": {"page_size": 2}},
+    }})
+    assert limits_for("agent", "age") == GovernorLimits(page_size=5, max_rows=100,
+                                                        max_estimated_rows=10)
+    assert limits_for("agent", "kuzu").page_size == 2
+    assert limits_for("mcp", "age").page_size == 7
+
+
+class _Graph(BaseGraph):
+    """按 backend 选择限制，估计行数固定"""
+    backend = "test"
+
+    def __init__(self, estimated=None):
+        self.estimated = estimated
+
+    @property
+    def schema(self) -> str:
+        return ""
+
+    def refresh_schema(self) -> None:
+        pass
+
+    def query(self, query, params=None):
+        raise NotImplementedError
+
+    def estimate_rows(self, query, params=None):
+        return self.estimated
+
+
+class _AsyncGraph(AsyncBaseGraph):
+    backend = "test"
+
+    @property
+    def schema(self) -> str:
+        return ""
+
+    async def refresh_schema(self) -> None:
+        pass
+
+    async def query(self, query, params=None):
+        raise NotImplementedError
+
+
+class _Helper(AsyncMetadataHelper):
+    """按 SKIP/LIMIT 截取固定结果的元模型查询"""
+    def __init__(self, count):
+        self.rows = [[i] for i in range(count)]
+        self.calls = []
+
+    def query(self, cypher, graph, params=None, limit=None):
+        self.calls.append((cypher, limit))
+        skip = re.search(r"\nSKIP (\d+)", cypher)
+        take = re.search(r"\nLIMIT (\d+)$", cypher)
+        rows = self.rows[int(skip.group(1)) if skip else 0:]
+        if take:
+            rows = rows[:int(take.group(1))]
+        return rows[:limit]
+
+    async def aquery(self, cypher, graph, params=None, limit=None):
+        return self.query(cypher, graph, params, limit)
+
+
+@pytest.fixture(name="small_pages")
+def _small_pages(monkeypatch):
+    monkeypatch.setattr(qg, "DEFAULT_LIMITS",
+                        {"test": GovernorLimits(page_size=3, max_rows=7, max_estimated_rows=50)})
+
+
+def _read_all(governor, graph, cypher=CYPHER):
+    pages = [governor.page(cypher, graph)]
+    while pages[-1].next_cursor is not None:
+        pages.append(governor.page(cypher, graph, pages[-1].next_cursor))
+    return pages
+
+
+@pytest.mark.usefixtures("small_pages")
+def test_pages():
+    """逐页读取，累计行数达到上限后不再提供游标"""
+    helper = _Helper(20)
+    pages = _read_all(QueryGovernor(helper, "test"), _Graph(estimated=20))
+    assert [p.rows for p in pages] == [[[0], [1], [2]], [[3], [4], [5]], [[6]]]
+    assert pages[0].estimated_rows == 20 and pages[1].estimated_rows is None
+    assert pages[-1].truncated and pages[-1].next_cursor is None
+    # 每页多读一行判断是否还有下一页
+    assert helper.calls[0] == (CYPHER + "\nLIMIT 4", 4)
+
+
+@pytest.mark.usefixtures("small_pages")
+def test_last_page():
+    """结果读完时没有游标，也不标记截断"""
+    pages = _read_all(QueryGovernor(_Helper(5), "test"), _Graph())
+    assert [len(p.rows) for p in pages] == [3, 2]
+    assert not pages[-1].truncated
+    # 查询自带的 LIMIT 限定了分页范围
+    pages = _read_all(QueryGovernor(_Helper(20), "test"), _Graph(), CYPHER + " LIMIT 4")
+    assert [len(p.rows) for p in pages] == [3, 1]
+
+
+@pytest.mark.usefixtures("small_pages")
+def test_unsupported_query_reads_until_page_end():
+    """无法改写的查询由 limit 只读取到当前页末尾"""
+    helper = _Helper(20)
+    governor = QueryGovernor(helper, "test")
+    cypher = CYPHER + " LIMIT $n"
+    first = governor.page(cypher, _Graph())
+    second = governor.page(cypher, _Graph(), first.next_cursor)
+    assert second.rows == [[3], [4], [5]]
+    assert helper.calls == [(cypher, 4), (cypher, 7)]
+
+
+@pytest.mark.usefixtures("small_pages")
+def test_estimate_is_hint():
+    """估计行数超过上限（如 AGE 的默认估计）时仍执行查询，行数由分页限制"""
+    helper = _Helper(2)
+    page = QueryGovernor(helper, "test").page(CYPHER, _Graph(estimated=1000))
+    assert page.rows == [[0], [1]] and page.estimated_rows == 1000
+    assert not page.truncated and page.next_cursor is None
+    # 实际结果较多时同样只返回一页
+    page = QueryGovernor(_Helper(100), "test").page(CYPHER, _Graph(estimated=1000))
+    assert len(page.rows) == 3 and page.next_cursor is not None
+
+
+@pytest.mark.usefixtures("small_pages")
+def test_async_page():
+    """异步图，默认不估计行数"""
+    helper = _Helper(5)
+    page = asyncio.run(QueryGovernor(helper, "test").apage(CYPHER, _AsyncGraph()))
+    assert page.rows == [[0], [1], [2]] and page.next_cursor is not None
+    assert page.estimated_rows is None
@@ -0,0 +1,110 @@
+"""QueryResultCache tests"""
+import asyncio
+import threading
+import time
+
+import pytest
+
+# pylint: disable=E0401
+from bot.graph.result_cache import QueryResultCache, cache_params, normalize_cypher
+
+
+def test_normalize():
+    """合并空白，保留字面量"""
+    assert normalize_cypher("MATCH  (n)\n  WHERE n.name = 'a  b'\tRETURN n;") \
+        == "MATCH (n) WHERE n.name = 'a  b' RETURN n"
+
+
+def test_cache_params_limit():
+    """限定行数不同的同一查询分别缓存"""
+    cache = QueryResultCache()
+    loads = {5: lambda: [1] * 5, None: lambda: [1] * 9}
+    for limit, load in loads.items():
+        assert cache.get_or_load(("g", "v1"), "MATCH (n) RETURN n",
+                                 cache_params({"x": 1}, limit), load) == load()
+    assert cache_params({"x": 1}) == {"x": 1}
+    assert cache.stats().entries == 2
+
+
+def test_hit_and_version():
+    """空白不同的相同查询命中；图版本变化后重新查询"""
+    cache = QueryResultCache()
+    calls = []
+
+    def load():
+        calls.append(1)
+        return [len(calls)]
+
+    assert cache.get_or_load(("g", "v1"), "MATCH (n) RETURN n", None, load) == [1]
+    assert cache.get_or_load(("g", "v1"), "MATCH (n)\n RETURN n", None, load) == [1]
+    assert cache.get_or_load(("g", "v1"), "MATCH (n) RETURN n", {"x": 1}, load) == [2]
+    assert cache.get_or_load(("g", "v2"), "MATCH (n) RETURN n", None, load) == [3]
+    stats = cache.stats()
+    assert (stats.hits, stats.misses, stats.invalidations, stats.entries) == (1, 3, 1, 1)
+
+
+def test_ttl():
+    """超过存活时间后重新查询"""
+    cache = QueryResultCache(ttl=0.05)
+    values = iter([1, 2])
+    assert cache.get_or_load(("g", "v"), "q", None, lambda: next(values)) == 1
+    time.sleep(0.1)
+    assert cache.get_or_load(("g", "v"), "q", None, lambda: next(values)) == 2
+
+
+def test_error_not_cached():
+    """查询失败不缓存"""
+    cache = QueryResultCache()
+
+    def fail():
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_load(("g", "v"), "q", None, fail)
+    assert cache.get_or_load(("g", "v"), "q", None, lambda: 1) == 1
+
+
+def test_single_flight_threads():
+    """并发的相同查询只执行一次"""
+    cache = QueryResultCache()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def load():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "rows"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(
+        cache.get_or_load(("g", "v"), "q", None, load))) for _ in range(4)]
+    threads[0].start()
+    started.wait(5)
+    for t in threads[1:]:
+        t.start()
+    time.sleep(0.05)
+    release.set()
+    for t in threads:
+        t.join()
+    assert calls == [1] and results == ["rows"] * 4
+    assert cache.stats().coalesced == 3
+
+
+def test_single_flight_async():
+    """同一事件循环中的相同查询只执行一次"""
+    cache = QueryResultCache()
+    calls = []
+
+    async def load():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "rows"
+
+    async def run():
+        return await asyncio.gather(
+            *(cache.aget_or_load(("g", "v"), "q", None, load) for _ in range(5)))
+
+    assert asyncio.run(run()) == ["rows"] * 5
+    assert calls == [1]
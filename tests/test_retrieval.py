@@ -0,0 +1,94 @@
+"""PromptRetriever tests"""
+import asyncio
+import uuid
+
+import chromadb
+from chromadb.api.types import EmbeddingFunction
+
+# pylint: disable=E0401
+from bot.name_index import NameIndex
+from bot.retrieval import PromptRetriever
+from bot.settings import settings
+from make_vector.collection_sync import dict_chunks, swap_collection
+
+
+class _Embedding:
+    """记录调用次数的向量化函数"""
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, inputs):
+        self.calls += 1
+        return [[float(len(t)), 1.0] for t in inputs]
+
+
+class _Collection:
+    """记录查询参数的集合"""
+    def __init__(self, docs):
+        self.docs = docs
+        self.kwargs = None
+
+    def query(self, **kwargs):
+        self.kwargs = kwargs
+        return {"documents": [self.docs[:kwargs["n_results"]]]}
+
+
+def test_embed_once():
+    """问题只向量化一次，两个集合用同一个向量查询"""
+    emb = _Embedding()
+    cypher, names = _Collection(["c1", "c2", "c3", "c4"]), _Collection(["n1"])
+    retriever = PromptRetriever(lambda: cypher, lambda: names, emb)
+    result = asyncio.run(retriever.aretrieve("财务"))
+    assert emb.calls == 1
+    assert result.cypher_docs == ["c1", "c2", "c3"]
+    assert result.name_docs == ["n1"]
+    assert cypher.kwargs["query_embeddings"] == names.kwargs["query_embeddings"] == [[2.0, 1.0]]
+    assert set(result.timings) == {"embed", "cypher", "names"}
+
+
+def test_empty_documents():
+    """集合无结果"""
+    retriever = PromptRetriever(lambda: _Collection([]), lambda: _Collection([]), _Embedding())
+    result = retriever.retrieve("x")
+    assert result.cypher_docs == [] and result.name_docs == []
+
+
+def test_name_index_fusion():
+    """原样出现的名称在前，足够时不查询 names 集合"""
+    index = NameIndex()
+    index.sync({"1": "Application {name:财务系统}", "2": "DataEntity {name:客户}"})
+    names = _Collection(["DataEntity {name:客户}", "DataEntity {name:供应商}"])
+    retriever = PromptRetriever(lambda: _Collection(["c1"]), lambda: names, _Embedding(),
+                                names_results=3, name_index=index)
+    result = retriever.retrieve("财务系统的客户")
+    assert result.name_docs == ["Application {name:财务系统}", "DataEntity {name:客户}",
+                                "DataEntity {name:供应商}"]
+    assert "lexical" in result.timings
+
+    names.kwargs = None
+    retriever.names_results = 2
+    result = retriever.retrieve("财务系统的客户")
+    assert len(result.name_docs) == 2 and names.kwargs is None
+
+
+class _ChromaEmbedding(EmbeddingFunction):
+    """可用于建集合的向量化函数"""
+    def __call__(self, input): # pylint: disable=redefined-builtin
+        return [[float(len(t)), 1.0] for t in input]
+
+
+def test_follows_swap(monkeypatch):
+    """蓝绿交换后检索新集合，多次交换删除旧集合后仍可检索"""
+    client = chromadb.EphemeralClient()
+    cypher, names = f"cypher-{uuid.uuid4().hex[:8]}", f"names-{uuid.uuid4().hex[:8]}"
+    monkeypatch.setattr(settings, "settings", {"chromadb": {"cypher_collection": cypher,
+                                                            "names_collection": names}})
+    emb = _ChromaEmbedding()
+    swap_collection(client, cypher, dict_chunks({"c": "v1"}, 10), emb)
+    swap_collection(client, names, dict_chunks({"n": "n1"}, 10), emb)
+    retriever = PromptRetriever.from_client(client, emb)
+    assert retriever.retrieve("x").cypher_docs == ["v1"]
+    for version in ("v2", "v3"):
+        swap_collection(client, cypher, dict_chunks({"c": version}, 10), emb)
+        result = retriever.retrieve("x")
+        assert result.cypher_docs == [version] and result.name_docs == ["n1"]
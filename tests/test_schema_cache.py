@@ -0,0 +1,53 @@
+"""SchemaCache tests"""
+# pylint: disable=E0401
+from bot.graph.schema_cache import (
+    SchemaCache,
+    make_fingerprint,
+    age_schema_key,
+    kuzu_schema_key,
+)
+
+
+def test_load_save(tmp_path):
+    """指纹一致时命中"""
+    cache = SchemaCache(tmp_path)
+    fp = make_fingerprint([("BusinessDomain", "v", 10, 0, 0)])
+    assert cache.load("g", fp) is None
+    cache.save("g", fp, "## schema")
+    assert cache.load("g", fp) == "## schema"
+    # 另一个进程使用同一目录
+    assert SchemaCache(tmp_path).load("g", fp) == "## schema"
+
+
+def test_fingerprint_changed(tmp_path):
+    """指纹变化时未命中"""
+    cache = SchemaCache(tmp_path)
+    cache.save("g", make_fingerprint([("A", "v", 1, 0, 0)]), "old")
+    assert cache.load("g", make_fingerprint([("A", "v", 2, 0, 0)])) is None
+
+
+def test_invalidate(tmp_path):
+    """失效"""
+    cache = SchemaCache(tmp_path)
+    cache.save("a", "fp", "1")
+    cache.save("b", "fp", "2")
+    cache.invalidate("a")
+    assert cache.load("a", "fp") is None
+    assert cache.load("b", "fp") == "2"
+    cache.invalidate()
+    assert cache.load("b", "fp") is None
+
+
+def test_disabled(tmp_path):
+    """关闭缓存"""
+    cache = SchemaCache(tmp_path, enabled=False)
+    cache.save("g", "fp", "schema")
+    assert cache.load("g", "fp") is None
+    assert not list(tmp_path.iterdir())
+
+
+def test_keys():
+    """缓存键"""
+    assert age_schema_key("dg", "dsn1") != age_schema_key("dg", "dsn2")
+    assert age_schema_key("dg", "dsn1").startswith("age-dg-")
+    assert kuzu_schema_key("a/../db") == kuzu_schema_key("db")